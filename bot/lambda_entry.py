@@ -1,14 +1,14 @@
 import json
 import logging
-import sys
-import traceback
 
-from telegram import Update, Bot
+from telegram import Update
 from telegram.ext import Dispatcher
 import pinject
 
-from sutd.trivia_bot.bot.handlers import GameStateCommands, AnsweringHandlers
+from sutd.trivia_bot.bot.batch import UpdateBatchProcessor
+from sutd.trivia_bot.bot.dispatcher import build_dispatcher, process_update
 from sutd.trivia_bot.common.bindings import ALL_BINDINGS as COMMON_BINDINGS
+from sutd.trivia_bot.common.metrics import emits_metrics
 import sutd.trivia_bot.common.database
 import sutd.trivia_bot.common.quizzer
 
@@ -21,32 +21,25 @@ OBJ_GRAPH = pinject.new_object_graph(
     binding_specs=COMMON_BINDINGS,
 )
 
+# built once per container and reused by every warm invocation
+DISPATCHER: Dispatcher = build_dispatcher(OBJ_GRAPH)
+BATCH_PROCESSOR = UpdateBatchProcessor(DISPATCHER)
 
-def lambda_handler(event, context):
-    # Create bot, update queue and dispatcher instances
-    bot: Bot = OBJ_GRAPH.provide(Bot)
-
-    dispatcher: Dispatcher = Dispatcher(bot, None, workers=0, use_context=True)
-    dispatcher.bot_data = {"event": event}
-
-    gsc: GameStateCommands = OBJ_GRAPH.provide(GameStateCommands)
-    gsc.register_handlers(dispatcher)
-    ah: AnsweringHandlers = OBJ_GRAPH.provide(AnsweringHandlers)
-    ah.register_handlers(dispatcher)
 
-    def error_callback(update, context):
-        error: Exception = context.error
-        traceback.print_exception(type(error), error, error.__traceback__)
-        traceback.print_tb(error.__traceback__)
-        context.bot.send_message(
-            chat_id=update.effective_chat.id, text=f"An error occurred: {context.error}"
-        )
-
-    dispatcher.add_error_handler(error_callback)
+@emits_metrics
+def lambda_handler(event, context):
+    if "Records" in event:
+        # a batch of updates from a queue, failed ones are left on it to be retried
+        failed = BATCH_PROCESSOR.process(event["Records"])
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": message_id} for message_id in failed
+            ]
+        }
 
     input_data = json.loads(event["body"])
 
-    update = Update.de_json(input_data, bot)
-    dispatcher.process_update(update)
+    update = Update.de_json(input_data, DISPATCHER.bot)
+    process_update(DISPATCHER, update, event=event)
 
     return {"statusCode": 200, "body": ""}
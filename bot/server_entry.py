@@ -0,0 +1,85 @@
+"""
+Serves the Telegram webhook from one long lived process instead of API Gateway and
+Lambda, see sutd.trivia_bot.bot.server.WebhookServer.
+
+    PYTHONPATH=common:bot python bot/server_entry.py
+
+It takes the same environment as the Lambdas, and SERVER_HOST, SERVER_PORT and
+WEBHOOK_PATH. Games are played by the Step Functions state machine, or with
+GAME_RUNTIME=worker by a GameScheduler in this process, like bot/worker_entry.py.
+"""
+import asyncio
+import logging
+import os
+import signal
+
+import pinject
+
+from sutd.trivia_bot.bot.dispatcher import build_dispatcher
+from sutd.trivia_bot.bot.server import WebhookServer
+from sutd.trivia_bot.common.bindings import (
+    ALL_BINDINGS as COMMON_BINDINGS,
+    TelegramBotBinding,
+    DynamoDBBinding,
+    QuestionPackBinding,
+    LockClientBinding,
+)
+from sutd.trivia_bot.common.worker import GameScheduler, GameSchedulerBindings
+import sutd.trivia_bot.common.database
+import sutd.trivia_bot.common.quizzer
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+
+if os.environ.get("GAME_RUNTIME", "stepfunctions").lower() == "worker":
+    GAME_SCHEDULER = GameScheduler()
+    BINDINGS = [
+        TelegramBotBinding(),
+        DynamoDBBinding(),
+        QuestionPackBinding(),
+        LockClientBinding(),
+        GameSchedulerBindings(GAME_SCHEDULER),
+    ]
+else:
+    GAME_SCHEDULER = None
+    BINDINGS = COMMON_BINDINGS
+
+OBJ_GRAPH = pinject.new_object_graph(
+    modules=[sutd.trivia_bot.common.database, sutd.trivia_bot.common.quizzer],
+    binding_specs=BINDINGS,
+)
+if GAME_SCHEDULER is not None:
+    GAME_SCHEDULER.use(OBJ_GRAPH)
+
+SERVER = WebhookServer(
+    build_dispatcher(OBJ_GRAPH), webhook_path=os.environ.get("WEBHOOK_PATH", "/")
+)
+
+
+async def main():
+    scheduler = None
+    if GAME_SCHEDULER is not None:
+        # running before any update can start a game on it
+        scheduler = asyncio.ensure_future(GAME_SCHEDULER.run())
+    server = asyncio.ensure_future(
+        SERVER.serve(
+            os.environ.get("SERVER_HOST", "0.0.0.0"),
+            int(os.environ.get("SERVER_PORT", "8080")),
+        )
+    )
+    # stop taking updates on SIGTERM, and finish the ones already queued
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, server.cancel)
+    loop.add_signal_handler(signal.SIGINT, server.cancel)
+    try:
+        await server
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if scheduler is not None:
+            scheduler.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+
+from sutd.trivia_bot.bot.dispatcher import process_update, ordering_key
+from sutd.trivia_bot.common.database import coalesced_reads
+from sutd.trivia_bot.common.metrics import in_current_context
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, Hashable, List, Tuple
+    from telegram.ext import Dispatcher
+
+logger = logging.getLogger()
+
+BATCH_WORKERS = 16
+
+
+class UpdateBatchProcessor:
+    """
+    Processes a batch of updates from a queue, one SQS record per update, in a single
+    invocation.
+
+    Updates are grouped by chat. Groups are processed concurrently, and the updates of
+    a group one after the other in the order they were queued, with the reads that
+    repeat within a group coalesced. Once an update of a chat fails, the chat's
+    later updates are not processed and are reported failed with it, so that the
+    queue redelivers them in order.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, workers: int = BATCH_WORKERS):
+        self.dispatcher = dispatcher
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="batch"
+        )
+
+    def process(self, records: List[dict]) -> List[str]:
+        """
+        Returns the message ids of the records that failed
+        """
+        failed = []
+        groups: Dict[Hashable, List[Tuple[dict, Update]]] = dict()
+        for record in records:
+            try:
+                update = Update.de_json(json.loads(record["body"]), self.dispatcher.bot)
+            except (ValueError, TypeError, KeyError):
+                update = None
+            if update is None:
+                logger.error(f"Record {record['messageId']} is not an update")
+                failed.append(record["messageId"])
+                continue
+            groups.setdefault(ordering_key(update), []).append((record, update))
+        futures = [
+            self.executor.submit(in_current_context(self.process_group), group)
+            for group in groups.values()
+        ]
+        for future in futures:
+            failed.extend(future.result())
+        return failed
+
+    def process_group(self, group: List[Tuple[dict, Update]]) -> List[str]:
+        failed = []
+        with coalesced_reads():
+            for record, update in group:
+                if failed:
+                    failed.append(record["messageId"])
+                    continue
+                try:
+                    error = process_update(self.dispatcher, update, event=record)
+                except Exception as ex:
+                    error = ex
+                if error is not None:
+                    logger.error(f"Update {update.update_id} failed: {error}")
+                    failed.append(record["messageId"])
+        return failed
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import traceback
+from contextvars import ContextVar
+
+from telegram import Bot, Update
+from telegram.ext import Dispatcher
+
+from sutd.trivia_bot.bot.handlers import GameStateCommands, AnsweringHandlers
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, List, Hashable
+    from pinject.object_graph import ObjectGraph
+
+# the raw event of the update currently being processed
+current_event: ContextVar[Optional[dict]] = ContextVar("current_event", default=None)
+# what the handlers of the update currently being processed raised
+current_errors: ContextVar[Optional[List[Exception]]] = ContextVar(
+    "current_errors", default=None
+)
+
+
+def error_callback(update, context):
+    error: Exception = context.error
+    errors = current_errors.get()
+    if errors is not None:
+        errors.append(error)
+    traceback.print_exception(type(error), error, error.__traceback__)
+    traceback.print_tb(error.__traceback__)
+    context.bot.send_message(
+        chat_id=update.effective_chat.id, text=f"An error occurred: {context.error}"
+    )
+
+
+def build_dispatcher(obj_graph: ObjectGraph) -> Dispatcher:
+    bot: Bot = obj_graph.provide(Bot)
+
+    dispatcher: Dispatcher = Dispatcher(bot, None, workers=0, use_context=True)
+
+    gsc: GameStateCommands = obj_graph.provide(GameStateCommands)
+    gsc.register_handlers(dispatcher)
+    ah: AnsweringHandlers = obj_graph.provide(AnsweringHandlers)
+    ah.register_handlers(dispatcher)
+
+    dispatcher.add_error_handler(error_callback)
+    return dispatcher
+
+
+def process_update(
+    dispatcher: Dispatcher, update: Update, event: Optional[dict] = None
+) -> Optional[Exception]:
+    """
+    Processes the update, and returns the first error its handlers raised, which the
+    dispatcher only hands to the error handlers
+    """
+    event_token = current_event.set(event)
+    errors_token = current_errors.set([])
+    try:
+        dispatcher.process_update(update)
+        errors = current_errors.get()
+        return errors[0] if errors else None
+    finally:
+        current_errors.reset(errors_token)
+        current_event.reset(event_token)
+
+
+def ordering_key(update: Update) -> Hashable:
+    # updates outside of a chat have nothing to be ordered against
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return ("update", update.update_id)
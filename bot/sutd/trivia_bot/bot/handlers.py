@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 from datetime import datetime
 
+from sutd.trivia_bot.common.callback_data import CallbackDataCodec
 from sutd.trivia_bot.common.database import CallbackRepository
 from sutd.trivia_bot.common.models import GameInfo
 from sutd.trivia_bot.common.quizzer import GameMasterFactory, QuestionResponderFactory
@@ -63,24 +64,38 @@ class AnsweringHandlers:
         self,
         question_responder_factory: QuestionResponderFactory,
         callback_repository: CallbackRepository,
+        callback_data_codec: CallbackDataCodec,
     ):
         self.question_responder_factory = question_responder_factory
         self.callback_repository = callback_repository
+        self.callback_data_codec = callback_data_codec
 
     def answer_mcq_callback_query(self, update: Update, context: CallbackContext):
         chat: Chat = update.effective_chat
         callback_query: CallbackQuery = update.callback_query
         user: User = callback_query.from_user
         original_question_message: Message = callback_query.message
-        # see if context data still exists
-        callback_data = self.callback_repository.retrieve(
-            callback_id=callback_query.data, chat_id=chat.id
+        callback_token = self.callback_data_codec.decode(
+            chat_id=chat.id, callback_data=callback_query.data
         )
-        if callback_data is None:
-            context.bot.answer_callback_query(
-                callback_query_id=callback_query.id, text="Expired", cache_time=100
+        answer = None
+        if callback_token is not None:
+            # the pressed button's label, to announce the answer without a read
+            for row in original_question_message.reply_markup.inline_keyboard:
+                for button in row:
+                    if button.callback_data == callback_query.data:
+                        answer = button.text
+        else:
+            # buttons sent before callback data was signed point to a stored callback
+            callback_data = self.callback_repository.retrieve(
+                callback_id=callback_query.data, chat_id=chat.id
             )
-            return
+            if callback_data is None:
+                context.bot.answer_callback_query(
+                    callback_query_id=callback_query.id, text="Expired", cache_time=100
+                )
+                return
+            answer = str(callback_data["answer"]).lower()
         question_responder = self.question_responder_factory.create(
             chat_id=chat.id, message_id=original_question_message.message_id
         )
@@ -93,11 +108,13 @@ class AnsweringHandlers:
             user_data["username"] = user.username
         print(user_data)
         question_responder.attempt(
-            answer=str(callback_data["answer"]).lower(),
+            answer=answer,
             answer_time=int(datetime.utcnow().timestamp()),
             answer_callback_query_id=callback_query.id,
+            question_sent_at=int(original_question_message.date.timestamp()),
             user_id=user.id,
             user_data=user_data,
+            callback_token=callback_token,
         )
 
     def answer_reply_message(self, update: Update, context: CallbackContext):
@@ -120,6 +137,7 @@ class AnsweringHandlers:
             user_id=user.id,
             user_data=user_data,
             answer_message_id=message.message_id,
+            question_sent_at=int(message.reply_to_message.date.timestamp()),
         )
 
     def warn_non_privacy_mode(self, update: Update, context: CallbackContext):
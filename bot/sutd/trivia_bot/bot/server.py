@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+
+from sutd.trivia_bot.bot.dispatcher import process_update, ordering_key
+from sutd.trivia_bot.common.metrics import invocation_metrics
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Deque, Dict, Hashable, Optional, Tuple
+    from telegram.ext import Dispatcher
+
+logger = logging.getLogger()
+
+SERVER_WORKERS = 32
+MAX_QUEUED_UPDATES = 2000
+MAX_CHAT_QUEUE_DEPTH = 100
+MAX_BODY_BYTES = 1024 * 1024
+RETRY_AFTER_SECONDS = 1
+THROUGHPUT_WINDOW_SECONDS = 60
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class WebhookServer:
+    """
+    Receives Telegram webhook updates over HTTP and processes them with the dispatcher.
+
+    Updates of the same chat go through a queue of their own and are processed one
+    after the other, in the order they came in, while different chats are processed
+    in parallel on a thread pool. An update is acknowledged as soon as it is queued.
+    Past MAX_QUEUED_UPDATES in total, or MAX_CHAT_QUEUE_DEPTH for one chat, updates
+    are refused with a 503, which Telegram retries later.
+
+    GET /metrics returns the throughput and queue depth counters as JSON.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        webhook_path: str = "/",
+        workers: int = SERVER_WORKERS,
+        max_queued_updates: int = MAX_QUEUED_UPDATES,
+        max_chat_queue_depth: int = MAX_CHAT_QUEUE_DEPTH,
+    ):
+        self.dispatcher = dispatcher
+        self.webhook_path = webhook_path
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="update"
+        )
+        self.max_queued_updates = max_queued_updates
+        self.max_chat_queue_depth = max_chat_queue_depth
+        self.chat_queues: Dict[Hashable, Deque[Update]] = dict()
+        self.chat_tasks: Dict[Hashable, asyncio.Task] = dict()
+        self.queued_updates = 0
+        self.max_queue_depth_seen = 0
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        # (second, updates processed in that second), for the last minute
+        self.processed_per_second: Deque[Tuple[int, int]] = deque()
+
+    async def serve(self, host: str, port: int):
+        """
+        Serves until cancelled, then waits for the queued updates to be processed
+        """
+        server = await asyncio.start_server(self.__handle_connection, host, port)
+        logger.info(f"Serving webhook on {host}:{port}{self.webhook_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            server.close()
+            if self.chat_tasks:
+                await asyncio.wait(list(self.chat_tasks.values()))
+
+    def counters(self) -> dict:
+        self.__expire_throughput()
+        return {
+            "updates_received": self.received,
+            "updates_processed": self.processed,
+            "updates_failed": self.failed,
+            "updates_rejected": self.rejected,
+            "updates_per_second": round(
+                sum(count for _, count in self.processed_per_second)
+                / THROUGHPUT_WINDOW_SECONDS,
+                2,
+            ),
+            "queued_updates": self.queued_updates,
+            "active_chats": len(self.chat_queues),
+            "max_chat_queue_depth": max(
+                (len(queue) for queue in self.chat_queues.values()), default=0
+            ),
+            "max_chat_queue_depth_seen": self.max_queue_depth_seen,
+        }
+
+    def enqueue(self, update: Update) -> bool:
+        """
+        Queues the update behind the others of its chat, False if it has to be refused
+        """
+        self.received += 1
+        key = ordering_key(update)
+        queue = self.chat_queues.get(key)
+        if self.queued_updates >= self.max_queued_updates or (
+            queue is not None and len(queue) >= self.max_chat_queue_depth
+        ):
+            self.rejected += 1
+            return False
+        if queue is None:
+            queue = self.chat_queues[key] = deque()
+            self.chat_tasks[key] = asyncio.get_running_loop().create_task(
+                self.__drain(key, queue)
+            )
+        queue.append(update)
+        self.queued_updates += 1
+        self.max_queue_depth_seen = max(self.max_queue_depth_seen, len(queue))
+        return True
+
+    async def __drain(self, key: Hashable, queue: Deque[Update]):
+        loop = asyncio.get_running_loop()
+        try:
+            while queue:
+                # left in the queue while it is processed, so that it counts towards
+                # the chat's depth
+                update = queue[0]
+                try:
+                    error = await loop.run_in_executor(
+                        self.executor, self.__process, update
+                    )
+                    if error is not None:
+                        self.failed += 1
+                except Exception:
+                    self.failed += 1
+                    logger.exception(f"Update {update.update_id} failed")
+                finally:
+                    queue.popleft()
+                    self.queued_updates -= 1
+                    self.__count_processed(loop)
+        finally:
+            del self.chat_queues[key]
+            del self.chat_tasks[key]
+
+    def __process(self, update: Update) -> Optional[Exception]:
+        with invocation_metrics("server.update"):
+            return process_update(self.dispatcher, update)
+
+    def __count_processed(self, loop: asyncio.AbstractEventLoop):
+        self.processed += 1
+        second = int(loop.time())
+        if self.processed_per_second and self.processed_per_second[-1][0] == second:
+            _, count = self.processed_per_second[-1]
+            self.processed_per_second[-1] = (second, count + 1)
+        else:
+            self.processed_per_second.append((second, 1))
+        self.__expire_throughput()
+
+    def __expire_throughput(self):
+        oldest = int(asyncio.get_running_loop().time()) - THROUGHPUT_WINDOW_SECONDS
+        while self.processed_per_second and self.processed_per_second[0][0] <= oldest:
+            self.processed_per_second.popleft()
+
+    def __route(
+        self, method: str, path: str, body: bytes
+    ) -> Tuple[int, Optional[dict]]:
+        if path == "/metrics":
+            if method != "GET":
+                return 405, None
+            return 200, self.counters()
+        if path != self.webhook_path:
+            return 404, None
+        if method != "POST":
+            return 405, None
+        try:
+            update = Update.de_json(json.loads(body), self.dispatcher.bot)
+        except (ValueError, TypeError, KeyError):
+            return 400, None
+        if update is None:
+            return 400, None
+        if not self.enqueue(update):
+            return 503, None
+        return 200, None
+
+    async def __handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        # just enough HTTP/1.1 for Telegram's webhook requests, with keep-alive
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, path, version = request_line.decode("latin-1").split()
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                content_length = int(headers.get("content-length", "0"))
+                if content_length > MAX_BODY_BYTES:
+                    await self.__respond(writer, 413, None, keep_alive=False)
+                    return
+                body = await reader.readexactly(content_length)
+                status, payload = self.__route(method, path.split("?", 1)[0], body)
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                await self.__respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            # malformed request or the client went away
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __respond(
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Optional[dict],
+        keep_alive: bool,
+    ):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if payload is not None:
+            headers.append("Content-Type: application/json")
+        if status == 503:
+            headers.append(f"Retry-After: {RETRY_AFTER_SECONDS}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
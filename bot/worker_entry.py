@@ -0,0 +1,91 @@
+"""
+Runs the bot as one long lived process instead of on Lambda and Step Functions:
+updates are long polled from Telegram, and games are played by the GameScheduler on
+a timer wheel.
+
+    PYTHONPATH=common:bot python bot/worker_entry.py
+
+It takes the same environment as the Lambdas. Games are only ever played by the
+process that started them, so run one worker per bot.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.error import TelegramError
+import pinject
+
+from sutd.trivia_bot.bot.dispatcher import build_dispatcher
+from sutd.trivia_bot.common.bindings import (
+    TelegramBotBinding,
+    DynamoDBBinding,
+    QuestionPackBinding,
+    LockClientBinding,
+)
+from sutd.trivia_bot.common.metrics import invocation_metrics
+from sutd.trivia_bot.common.worker import GameScheduler, GameSchedulerBindings
+import sutd.trivia_bot.common.database
+import sutd.trivia_bot.common.quizzer
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+
+POLL_TIMEOUT_SECONDS = 30
+POLL_RETRY_SECONDS = 1
+
+GAME_SCHEDULER = GameScheduler()
+
+OBJ_GRAPH = pinject.new_object_graph(
+    modules=[sutd.trivia_bot.common.database, sutd.trivia_bot.common.quizzer],
+    binding_specs=[
+        TelegramBotBinding(),
+        DynamoDBBinding(),
+        QuestionPackBinding(),
+        LockClientBinding(),
+        GameSchedulerBindings(GAME_SCHEDULER),
+    ],
+)
+GAME_SCHEDULER.use(OBJ_GRAPH)
+
+DISPATCHER = build_dispatcher(OBJ_GRAPH)
+
+
+def process_update(update):
+    with invocation_metrics("worker.update"):
+        DISPATCHER.process_update(update)
+
+
+async def poll_updates():
+    loop = asyncio.get_running_loop()
+    # one at a time, in the order Telegram hands them out
+    updates_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="updates")
+    bot = DISPATCHER.bot
+    # Telegram refuses getUpdates while a webhook is set
+    await loop.run_in_executor(None, bot.delete_webhook)
+    offset = None
+    while True:
+        try:
+            updates = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    bot.get_updates, offset=offset, timeout=POLL_TIMEOUT_SECONDS
+                ),
+            )
+        except TelegramError as ex:
+            logging.warning(f"Could not get updates: {ex}")
+            await asyncio.sleep(POLL_RETRY_SECONDS)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            await loop.run_in_executor(updates_executor, process_update, update)
+
+
+async def main():
+    # the scheduler task runs first, and has its loop before any update comes in
+    await asyncio.gather(GAME_SCHEDULER.run(), poll_updates())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
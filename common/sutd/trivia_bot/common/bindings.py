@@ -2,31 +2,92 @@ import os
 import boto3
 
 from telegram import Bot
+from telegram.utils.request import Request
 from python_dynamodb_lock.python_dynamodb_lock import DynamoDBLockClient
 import pinject
 
+from sutd.trivia_bot.common.callback_data import CallbackDataCodec
+from sutd.trivia_bot.common.database import QuestionRepository, PackedQuestionRepository
+from sutd.trivia_bot.common.metrics import (
+    instrument_dynamodb_client,
+    InstrumentedLockClient,
+)
+from sutd.trivia_bot.common.pack import QuestionPack, DEFAULT_QUESTION_PACK_PATH
+from sutd.trivia_bot.common.sender import TelegramSender, TELEGRAM_CONNECTION_POOL_SIZE
+from sutd.trivia_bot.common.storage import shared_table, shared_lock_client
+
+
+def use_in_memory_storage() -> bool:
+    # STORAGE_ENGINE=memory keeps the game and lock tables in process, for load tests
+    return os.environ.get("STORAGE_ENGINE", "dynamodb").lower() == "memory"
+
+
+def use_question_pack() -> bool:
+    # QUESTION_SOURCE=pack reads questions from the pack built into the layer
+    return os.environ.get("QUESTION_SOURCE", "dynamodb").lower() == "pack"
+
+
+def question_repository_class():
+    return PackedQuestionRepository if use_question_pack() else QuestionRepository
+
 
 class TelegramBotBinding(pinject.BindingSpec):
     def provide_token(self):
         return os.environ["BOT_TOKEN"]
 
     def provide_bot(self):
-        return Bot(token=self.provide_token())
+        return Bot(
+            token=self.provide_token(),
+            request=Request(con_pool_size=TELEGRAM_CONNECTION_POOL_SIZE),
+        )
+
+    def provide_telegram_sender(self, bot):
+        return TelegramSender(bot)
+
+    def provide_callback_data_codec(self):
+        return CallbackDataCodec(bot_token=self.provide_token())
 
 
 class DynamoDBBinding(pinject.BindingSpec):
     def provide_table(self):
-        return boto3.resource(
+        if use_in_memory_storage():
+            return shared_table(
+                os.environ.get("TABLE_NAME", "trivia"),
+                transaction_latency=float(
+                    os.environ.get("STORAGE_TRANSACTION_LATENCY_MS", "0")
+                )
+                / 1000,
+            )
+        resource = boto3.resource(
             "dynamodb", endpoint_url=os.environ.get("DDB_ENDPOINT")
-        ).Table(os.environ["TABLE_NAME"])
+        )
+        instrument_dynamodb_client(resource.meta.client)
+        return resource.Table(os.environ["TABLE_NAME"])
+
+
+class QuestionPackBinding(pinject.BindingSpec):
+    def provide_question_pack(self):
+        return QuestionPack(
+            os.environ.get("QUESTION_PACK_PATH", DEFAULT_QUESTION_PACK_PATH)
+        )
 
 
 class LockClientBinding(pinject.BindingSpec):
     def provide_lock_client(self):
+        if use_in_memory_storage():
+            return InstrumentedLockClient(
+                shared_lock_client(os.environ.get("LOCK_TABLE_NAME", "trivia-lock"))
+            )
         resource = boto3.resource(
             "dynamodb", endpoint_url=os.environ.get("DDB_ENDPOINT")
         )
-        return DynamoDBLockClient(resource, table_name=os.environ["LOCK_TABLE_NAME"])
+        instrument_dynamodb_client(resource.meta.client)
+        return InstrumentedLockClient(
+            DynamoDBLockClient(resource, table_name=os.environ["LOCK_TABLE_NAME"])
+        )
+
+    def provide_use_answer_lock(self):
+        return os.environ.get("ANSWER_LOCK_ENABLED", "false").lower() == "true"
 
 
 class StateMachineBindings(pinject.BindingSpec):
@@ -38,6 +99,9 @@ class StateMachineBindings(pinject.BindingSpec):
     def provide_state_machine_arn(self):
         return os.environ["START_GAME_STATE_MACHINE_ARN"]
 
+    def provide_cleanup_state_machine_arn(self):
+        return os.environ["CLEANUP_STATE_MACHINE_ARN"]
+
 
 class IDKBindings(pinject.BindingSpec):
     def configure(self, bind):
@@ -47,6 +111,7 @@ class IDKBindings(pinject.BindingSpec):
 ALL_BINDINGS = [
     TelegramBotBinding(),
     DynamoDBBinding(),
+    QuestionPackBinding(),
     LockClientBinding(),
     StateMachineBindings(),
 ]
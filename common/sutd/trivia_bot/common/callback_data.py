@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+
+from pydantic import BaseModel
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+# telegram rejects inline buttons whose callback_data is longer than this
+MAX_CALLBACK_DATA_LENGTH = 64
+SIGNATURE_LENGTH = 12
+SEPARATOR = ":"
+
+
+class CallbackToken(BaseModel):
+    question_id: str
+    answer_index: int
+    correct: bool
+
+
+class CallbackDataCodec:
+    """
+    Packs an MCQ answer button into its callback_data, so that nothing has to be
+    stored when a question is sent and nothing has to be read when a button is pressed.
+
+    The data looks like `<question_id>:<answer_index>:<signature>`. The signature is an
+    HMAC over the chat id, question id, answer index and whether the answer is correct,
+    keyed from the bot token. Players cannot forge buttons, or tell which button is the
+    correct one, but the bot can recover the verdict by checking both signatures.
+    """
+
+    def __init__(self, bot_token: str):
+        self.key = hmac.new(
+            bot_token.encode(), b"sutd-trivia-bot/callback-data", hashlib.sha256
+        ).digest()
+
+    def sign(
+        self,
+        chat_id: Union[str, int],
+        question_id: str,
+        answer_index: int,
+        correct: bool,
+    ) -> str:
+        message = SEPARATOR.join(
+            [str(chat_id), question_id, str(answer_index), "1" if correct else "0"]
+        )
+        digest = hmac.new(self.key, message.encode(), hashlib.sha256).digest()
+        return (
+            base64.urlsafe_b64encode(digest[:SIGNATURE_LENGTH]).decode().rstrip("=")
+        )
+
+    def encode(
+        self,
+        chat_id: Union[str, int],
+        question_id: str,
+        answer_index: int,
+        correct: bool,
+    ) -> str:
+        signature = self.sign(chat_id, question_id, answer_index, correct)
+        callback_data = SEPARATOR.join([question_id, str(answer_index), signature])
+        if len(callback_data.encode()) > MAX_CALLBACK_DATA_LENGTH:
+            raise ValueError(
+                f"Question id {question_id} is too long to fit in callback data"
+            )
+        return callback_data
+
+    def decode(
+        self, chat_id: Union[str, int], callback_data: str
+    ) -> Optional[CallbackToken]:
+        parts = callback_data.rsplit(SEPARATOR, 2)
+        if len(parts) != 3 or not parts[1].isdigit():
+            return None
+        question_id, answer_index, signature = parts
+        for correct in (True, False):
+            expected_signature = self.sign(
+                chat_id, question_id, int(answer_index), correct
+            )
+            if hmac.compare_digest(signature, expected_signature):
+                return CallbackToken(
+                    question_id=question_id,
+                    answer_index=int(answer_index),
+                    correct=correct,
+                )
+        return None
@@ -1,61 +1,658 @@
 from __future__ import annotations
 
-import string
+import copy
+import functools
 import random
 import json
 import logging
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 import pinject
 
-from sutd.trivia_bot.common.models import Question, QuestionMessage, GameInfo, Player
+from sutd.trivia_bot.common.items import (
+    question_to_item,
+    question_from_item,
+    question_message_to_item,
+    question_message_from_item,
+    game_info_to_item,
+    game_info_from_item,
+    player_to_item,
+    player_from_item,
+)
+from sutd.trivia_bot.common.metrics import (
+    instrumented,
+    untimed,
+    record_retry,
+    in_current_context,
+)
+from sutd.trivia_bot.common.models import (
+    AnswerAttempt,
+    Question,
+    QuestionBankImport,
+    QuestionBankSummary,
+    QuestionMessage,
+    GameInfo,
+    GameInfoTransition,
+    Player,
+)
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Optional, List, Tuple, Union, Set, Iterable
+    from typing import Optional, List, Tuple, Iterable, Dict, Callable
     from mypy_boto3_dynamodb.service_resource import Table
+    from sutd.trivia_bot.common.pack import QuestionPack
 
 logger = logging.getLogger()
 
+GLOBAL_SCOREBOARD_COMMIT_WORKERS = 8
+QUESTION_CACHE_SIZE = 1024
+BATCH_GET_ITEM_LIMIT = 100
+BATCH_GET_ITEM_MAX_ATTEMPTS = 5
+QUESTION_INDEX_BUCKET_SIZE = 64
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MAX_ATTEMPTS = 8
+LEADERBOARD_RETRY_BACKOFF_SECONDS = 0.02
+CONFLICT_MAX_ATTEMPTS = 5
+CONFLICT_RETRY_BACKOFF_SECONDS = 0.01
+# question messages, chat leaderboards and callbacks are left for the table's TTL to
+# delete through expires_at, this long after they were last written
+TRANSIENT_ITEM_TTL_SECONDS = 24 * 60 * 60
+# answers are only taken for questions sent after the game started, give or take
+# the difference between our clock and Telegram's
+GAME_START_CLOCK_SKEW_SECONDS = 5
+# changing this moves players between shards, see utils/.../data/shard_global_scores.py
+GLOBAL_SCORE_SHARDS = 8
+QUESTION_IMPORT_WORKERS = 8
+# hex digits of the content hash kept in imported question ids, which have to fit in
+# callback data, see callback_data.MAX_CALLBACK_DATA_LENGTH
+QUESTION_CONTENT_ID_LENGTH = 16
 
+DESERIALIZER = TypeDeserializer()
+
+# results of the reads made within coalesced_reads(), by method and arguments
+current_read_cache: ContextVar[Optional[dict]] = ContextVar(
+    "current_read_cache", default=None
+)
+
+
+def query_all(table: Table, **kwargs) -> Iterable[dict]:
+    # follow LastEvaluatedKey so that results past the 1 MB page are not dropped
+    while True:
+        response = table.query(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def batch_get_all(table: Table, keys: List[dict]) -> Iterable[dict]:
+    # BatchGetItem through the client, retrying unprocessed keys with backoff
+    client = table.meta.client
+    for i in range(0, len(keys), BATCH_GET_ITEM_LIMIT):
+        request_items = {table.name: {"Keys": keys[i : i + BATCH_GET_ITEM_LIMIT]}}
+        for attempt in range(BATCH_GET_ITEM_MAX_ATTEMPTS):
+            if attempt > 0:
+                # back off before retrying throttled keys
+                record_retry()
+                time.sleep(0.05 * 2 ** attempt)
+            response = client.batch_get_item(RequestItems=request_items)
+            yield from response["Responses"].get(table.name, [])
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+        else:
+            raise RuntimeError(
+                f"Could not read {len(request_items[table.name]['Keys'])} items after {BATCH_GET_ITEM_MAX_ATTEMPTS} attempts"
+            )
+
+
+def question_content_id(question: Question) -> str:
+    """
+    The id a question is imported under, a hash of everything but its id. A stored
+    question never changes, an edited one is imported as a new question.
+    """
+    content = question_to_item(question)
+    del content["id"]
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+    return f"{question.type.value}_{digest[:QUESTION_CONTENT_ID_LENGTH]}"
+
+
+def is_transaction_conflict(ex: ClientError) -> bool:
+    # lost to a concurrent transaction on the same item, rather than failing a condition
+    code = ex.response["Error"]["Code"]
+    if code == "TransactionConflictException":
+        return True
+    if code != "TransactionCanceledException":
+        return False
+    reasons = {reason.get("Code") for reason in ex.response["CancellationReasons"]}
+    return "TransactionConflict" in reasons and "ConditionalCheckFailed" not in reasons
+
+
+def retry_on_conflict(write: Callable[..., dict], **kwargs) -> dict:
+    # conflicts are retried with jittered backoff, so that the writers racing each
+    # other do not collide again, every other error is left to the caller
+    for attempt in range(CONFLICT_MAX_ATTEMPTS):
+        if attempt > 0:
+            record_retry()
+            time.sleep(random.uniform(0, CONFLICT_RETRY_BACKOFF_SECONDS * 2 ** attempt))
+        try:
+            return write(**kwargs)
+        except ClientError as ex:
+            if not is_transaction_conflict(ex) or attempt + 1 == CONFLICT_MAX_ATTEMPTS:
+                raise ex
+            logger.info(f"{ex.response['Error']['Code']} on attempt {attempt + 1}, retrying")
+
+
+@contextmanager
+def coalesced_reads():
+    """
+    Reads marked @coalesced that repeat within are served from the first one, until a
+    write marked @invalidates_coalesced. Meant for a run of updates of one chat, see
+    bot/sutd/trivia_bot/bot/batch.py, writes made by other processes in the meantime
+    are not seen.
+    """
+    token = current_read_cache.set(dict())
+    try:
+        yield
+    finally:
+        current_read_cache.reset(token)
+
+
+def coalesced(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = current_read_cache.get()
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        # callers change what they read before writing it back
+        return copy.deepcopy(cache[key])
+
+    return wrapper
+
+
+def invalidates_coalesced(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = current_read_cache.get()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if cache is not None:
+                cache.clear()
+
+    return wrapper
+
+
+class QuestionCache:
+    """
+    Process wide LRU cache of parsed questions. Entries are stamped with the question
+    bank version they were read at, and the whole cache is dropped when a newer bank
+    version is seen.
+    """
+
+    def __init__(self, max_size: int = QUESTION_CACHE_SIZE):
+        self.max_size = max_size
+        self.bank_version: Optional[int] = None
+        self.questions: OrderedDict[str, Question] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __observe_version(self, bank_version: int):
+        if self.bank_version is None or bank_version > self.bank_version:
+            self.bank_version = bank_version
+            self.questions.clear()
+
+    def get(self, question_id: str, bank_version: Optional[int]) -> Optional[Question]:
+        if bank_version is None:
+            return None
+        with self.lock:
+            self.__observe_version(bank_version)
+            if bank_version != self.bank_version:
+                return None
+            question = self.questions.get(question_id)
+            if question is not None:
+                self.questions.move_to_end(question_id)
+            return question
+
+    def put(self, question: Question, bank_version: Optional[int]):
+        if bank_version is None:
+            return
+        with self.lock:
+            self.__observe_version(bank_version)
+            if bank_version != self.bank_version:
+                return
+            self.questions[question.id] = question
+            self.questions.move_to_end(question.id)
+            while len(self.questions) > self.max_size:
+                self.questions.popitem(last=False)
+
+
+@instrumented
 class QuestionRepository:
-    def __init__(self, table: Table):
+    """
+    Questions are stored as TRIVIA/QUESTION#<id> items. Each question is also given a
+    dense ordinal, and the id is written into slot `ordinal % QUESTION_INDEX_BUCKET_SIZE`
+    of the TRIVIA/BANK#<index_version>#<ordinal // QUESTION_INDEX_BUCKET_SIZE> bucket
+    item, so that sampling k questions only reads the summary and at most k small
+    buckets.
+
+    import_bank writes every version of the index anew and then swaps the summary over
+    to it, a bank created one question at a time with create() is version 0 and kept
+    in the TRIVIA/INDEX#<bucket> items it has always been in.
+    """
+
+    def __init__(self, table: Table, question_cache: QuestionCache):
         self.table = table
+        self.question_cache = question_cache
+
+    @staticmethod
+    def index_prefix(index_version: int) -> str:
+        return "INDEX#" if index_version == 0 else f"BANK#{index_version:08d}#"
+
+    @classmethod
+    def index_key(cls, ordinal: int, index_version: int = 0) -> dict:
+        return {
+            "pk": "TRIVIA",
+            "sk": f"{cls.index_prefix(index_version)}{ordinal // QUESTION_INDEX_BUCKET_SIZE:08d}",
+        }
+
+    @staticmethod
+    def index_slot(ordinal: int) -> str:
+        return f"slot_{ordinal % QUESTION_INDEX_BUCKET_SIZE}"
 
     def create(self, question: Question):
+        response = self.table.get_item(
+            Key={"pk": "TRIVIA", "sk": f"QUESTION#{question.id}"},
+            ProjectionExpression="ordinal",
+        )
+        ordinal = response.get("Item", dict()).get("ordinal")
+        if ordinal is None:
+            response = self.table.update_item(
+                Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+                UpdateExpression="ADD question_count :one, bank_version :one",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="ALL_NEW",
+            )
+            ordinal = int(response["Attributes"]["question_count"]) - 1
+        else:
+            ordinal = int(ordinal)
+            response = self.table.update_item(
+                Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+                UpdateExpression="ADD bank_version :one",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="ALL_NEW",
+            )
+        index_version = int(response["Attributes"].get("index_version", 0))
         self.table.put_item(
-            Item={"pk": "TRIVIA", "sk": f"QUESTION#{question.id}", **question.dict()}
+            Item={
+                "pk": "TRIVIA",
+                "sk": f"QUESTION#{question.id}",
+                **question_to_item(question),
+                "ordinal": ordinal,
+            }
         )
         self.table.update_item(
-            Key={"pk": "TRIVIA", "sk": "SUMMARY"},
-            UpdateExpression="ADD question_ids :q",
-            ExpressionAttributeValues={":q": {question.id}},
+            Key=self.index_key(ordinal, index_version),
+            UpdateExpression="SET #slot = :question_id",
+            ExpressionAttributeNames={"#slot": self.index_slot(ordinal)},
+            ExpressionAttributeValues={":question_id": question.id},
         )
 
-    def find(self, question_id: int) -> Question:
+    def find(self, question_id: str, bank_version: Optional[int] = None) -> Question:
+        question = self.question_cache.get(question_id, bank_version)
+        if question is not None:
+            return question
         response = self.table.get_item(
             Key={"pk": "TRIVIA", "sk": f"QUESTION#{question_id}"}
         )
-        return Question(**response["Item"])
+        question = question_from_item(response["Item"])
+        self.question_cache.put(question, bank_version)
+        return question
+
+    def find_many(
+        self, question_ids: List[str], bank_version: Optional[int] = None
+    ) -> List[Question]:
+        """
+        Returns the questions that exist, in the order of question_ids. Questions that
+        are not cached are read with as few BatchGetItem calls as possible.
+        """
+        questions = dict()
+        missing_ids = []
+        for question_id in question_ids:
+            question = self.question_cache.get(question_id, bank_version)
+            if question is not None:
+                questions[question_id] = question
+            elif question_id not in missing_ids:
+                missing_ids.append(question_id)
+        for item in batch_get_all(
+            self.table,
+            [
+                {"pk": "TRIVIA", "sk": f"QUESTION#{question_id}"}
+                for question_id in missing_ids
+            ],
+        ):
+            question = question_from_item(item)
+            questions[question.id] = question
+            self.question_cache.put(question, bank_version)
+        return [
+            questions[question_id]
+            for question_id in question_ids
+            if question_id in questions
+        ]
+
+    def get_summary(self, consistent_read: bool = False) -> QuestionBankSummary:
+        response = self.table.get_item(
+            Key={"pk": "TRIVIA", "sk": "SUMMARY"}, ConsistentRead=consistent_read
+        )
+        return QuestionBankSummary(**response.get("Item", dict()))
+
+    def sample_ids(self, count: int, summary: QuestionBankSummary) -> List[str]:
+        """
+        Picks up to `count` distinct question ids uniformly at random, reading only
+        the index buckets that hold the chosen ordinals.
+        """
+        tried_ordinals = set()
+        question_ids: List[str] = []
+        while (
+            len(question_ids) < count
+            and len(tried_ordinals) < summary.question_count
+        ):
+            ordinals = []
+            while len(ordinals) < min(
+                count - len(question_ids),
+                summary.question_count - len(tried_ordinals),
+            ):
+                ordinal = random.randrange(summary.question_count)
+                if ordinal not in tried_ordinals:
+                    tried_ordinals.add(ordinal)
+                    ordinals.append(ordinal)
+            keys = {
+                ordinal: self.index_key(ordinal, summary.index_version)
+                for ordinal in ordinals
+            }
+            buckets = {
+                item["sk"]: item
+                for item in batch_get_all(
+                    self.table, list({key["sk"]: key for key in keys.values()}.values())
+                )
+            }
+            for ordinal in ordinals:
+                bucket = buckets.get(keys[ordinal]["sk"], dict())
+                # slots can be briefly empty while a question is being created
+                question_id = bucket.get(self.index_slot(ordinal))
+                if question_id is not None and question_id not in question_ids:
+                    question_ids.append(question_id)
+        return question_ids
 
-    def list_ids(self) -> Iterable[str]:
-        response = self.table.get_item(Key={"pk": "TRIVIA", "sk": "SUMMARY"})
-        return response["Item"]["question_ids"]
+    def list_ids(self, summary: QuestionBankSummary) -> Iterable[str]:
+        for bucket in query_all(
+            self.table,
+            KeyConditionExpression=Key("pk").eq("TRIVIA")
+            & Key("sk").begins_with(self.index_prefix(summary.index_version)),
+        ):
+            for slot in range(QUESTION_INDEX_BUCKET_SIZE):
+                question_id = bucket.get(f"slot_{slot}")
+                if question_id is not None:
+                    yield question_id
 
     def truncate(self):
         with self.table.batch_writer() as batch:
-            # noinspection PyTypeChecker
-            response = self.table.query(
+            for item in query_all(
+                self.table,
                 KeyConditionExpression=Key("pk").eq("TRIVIA"),
                 ProjectionExpression="pk, sk",
+            ):
+                if item["sk"] != "SUMMARY":
+                    batch.delete_item(Key=item)
+        # keep the summary so that the bank version keeps increasing
+        self.table.update_item(
+            Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+            UpdateExpression="REMOVE question_ids, question_count, index_version ADD bank_version :one",
+            ExpressionAttributeValues={":one": 1},
+        )
+
+    def import_bank(
+        self, questions: List[Question], workers: int = QUESTION_IMPORT_WORKERS
+    ) -> QuestionBankImport:
+        """
+        Makes `questions` the bank, writing only the questions that are not stored yet.
+        Questions have to be under their question_content_id, so stored ones never
+        change. The new index is written in full under a version of its own, and
+        swapped in with a single conditional update of the summary, games sample from
+        the old index until then and never see a bank halfway imported.
+
+        Questions no longer in the bank are left for the table's TTL, for the games
+        still asking them, and the index before the previous one is deleted. Run one
+        import at a time, a concurrent one fails the swap.
+        """
+        for question in questions:
+            if question.id != question_content_id(question):
+                raise ValueError(f"Question {question.id} is not under its content id")
+        new_questions = {question.id: question for question in questions}
+        summary = self.get_summary(consistent_read=True)
+        live_ids = {
+            item["sk"][len("QUESTION#") :]
+            for item in query_all(
+                self.table,
+                KeyConditionExpression=Key("pk").eq("TRIVIA")
+                & Key("sk").begins_with("QUESTION#"),
+                ProjectionExpression="sk, expires_at",
+                ConsistentRead=True,
+            )
+            # removed by an earlier import
+            if "expires_at" not in item
+        }
+        # written again if they had been removed, which clears expires_at
+        added_ids = [
+            question_id for question_id in new_questions if question_id not in live_ids
+        ]
+        removed_ids = [
+            question_id for question_id in live_ids if question_id not in new_questions
+        ]
+        if (
+            not added_ids
+            and not removed_ids
+            and summary.question_count == len(new_questions)
+        ):
+            return QuestionBankImport(
+                added=0,
+                removed=0,
+                unchanged=len(new_questions),
+                bank_version=summary.bank_version,
+                index_version=summary.index_version,
             )
-            for item in response.get("Items", []):
-                batch.delete_item(Key=item)
 
+        # a version for the new index that no other import has
+        response = self.table.update_item(
+            Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+            UpdateExpression="ADD bank_version :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        index_version = int(response["Attributes"]["bank_version"])
+        self.__write_all(
+            workers,
+            items=[
+                {
+                    "pk": "TRIVIA",
+                    "sk": f"QUESTION#{question_id}",
+                    **question_to_item(new_questions[question_id]),
+                }
+                for question_id in added_ids
+            ],
+        )
+        ordered_ids = list(new_questions)
+        self.__write_all(
+            workers,
+            items=[
+                {
+                    **self.index_key(start, index_version),
+                    **{
+                        self.index_slot(ordinal): ordered_ids[ordinal]
+                        for ordinal in range(
+                            start,
+                            min(start + QUESTION_INDEX_BUCKET_SIZE, len(ordered_ids)),
+                        )
+                    },
+                }
+                for start in range(0, len(ordered_ids), QUESTION_INDEX_BUCKET_SIZE)
+            ],
+        )
+
+        values = {
+            ":index_version": index_version,
+            ":question_count": len(ordered_ids),
+            ":one": 1,
+        }
+        if summary.index_version == 0:
+            condition = "attribute_not_exists(index_version)"
+        else:
+            condition = "index_version = :live_index_version"
+            values[":live_index_version"] = summary.index_version
+        try:
+            response = self.table.update_item(
+                Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+                UpdateExpression="SET index_version = :index_version, question_count = :question_count ADD bank_version :one",
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise ex
+            raise RuntimeError(
+                "The question bank was swapped by a concurrent import"
+            ) from ex
+        bank_version = int(response["Attributes"]["bank_version"])
+        logger.info(
+            f"Swapped in version {index_version} of the question bank, {len(added_ids)} added and {len(removed_ids)} removed"
+        )
+
+        # the low level client is thread safe, the Table resource is not
+        client = self.table.meta.client
+        expires_at = int(time.time()) + TRANSIENT_ITEM_TTL_SECONDS
 
+        def expire(question_id: str):
+            try:
+                client.update_item(
+                    TableName=self.table.name,
+                    Key={"pk": "TRIVIA", "sk": f"QUESTION#{question_id}"},
+                    UpdateExpression="SET expires_at = :expires_at",
+                    ConditionExpression="attribute_exists(pk)",
+                    ExpressionAttributeValues={":expires_at": expires_at},
+                )
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise ex
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # consume the iterator so that worker exceptions are raised here
+            list(executor.map(in_current_context(expire), removed_ids))
+        # samples still reading the previous index are left to finish
+        self.__write_all(
+            workers,
+            keys=[
+                {"pk": item["pk"], "sk": item["sk"]}
+                for prefix in ("INDEX#", "BANK#")
+                for item in query_all(
+                    self.table,
+                    KeyConditionExpression=Key("pk").eq("TRIVIA")
+                    & Key("sk").begins_with(prefix),
+                    ProjectionExpression="pk, sk",
+                )
+                if not any(
+                    item["sk"].startswith(self.index_prefix(kept))
+                    for kept in (index_version, summary.index_version)
+                )
+            ],
+        )
+        return QuestionBankImport(
+            added=len(added_ids),
+            removed=len(removed_ids),
+            unchanged=len(ordered_ids) - len(added_ids),
+            bank_version=bank_version,
+            index_version=index_version,
+        )
+
+    def __write_all(
+        self, workers: int, items: Iterable[dict] = (), keys: Iterable[dict] = ()
+    ):
+        # every worker has a batch writer of its own, over a share of the writes
+        requests = [(True, item) for item in items] + [(False, key) for key in keys]
+
+        def write_share(share: List[Tuple[bool, dict]]):
+            with self.table.batch_writer() as batch:
+                for is_put, request in share:
+                    if is_put:
+                        batch.put_item(Item=request)
+                    else:
+                        batch.delete_item(Key=request)
+
+        shares = [requests[i::workers] for i in range(workers) if requests[i::workers]]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # consume the iterator so that worker exceptions are raised here
+            list(executor.map(in_current_context(write_share), shares))
+
+
+@instrumented
+class PackedQuestionRepository:
+    """
+    The questions of the pack built into the layer, see pack.py, in place of
+    QuestionRepository for the quiz flow. Nothing is read from the table, and a question
+    is found by its id or ordinal in constant time. Bank versions are the pack's.
+    """
+
+    def __init__(self, question_pack: QuestionPack):
+        self.question_pack = question_pack
+
+    def get_summary(self) -> QuestionBankSummary:
+        return QuestionBankSummary(
+            bank_version=self.question_pack.bank_version,
+            question_count=self.question_pack.question_count,
+        )
+
+    def sample_ids(self, count: int, summary: QuestionBankSummary) -> List[str]:
+        ordinals = random.sample(
+            range(self.question_pack.question_count),
+            min(count, self.question_pack.question_count),
+        )
+        return [self.question_pack.id_at(ordinal) for ordinal in ordinals]
+
+    def find(self, question_id: str, bank_version: Optional[int] = None) -> Question:
+        question = self.question_pack.find(question_id)
+        if question is None:
+            raise KeyError(question_id)
+        return question
+
+    def find_by_ordinal(self, ordinal: int) -> Question:
+        return self.question_pack.question_at(ordinal)
+
+    def find_many(
+        self, question_ids: List[str], bank_version: Optional[int] = None
+    ) -> List[Question]:
+        """
+        Returns the questions that exist, in the order of question_ids
+        """
+        questions = [
+            self.question_pack.find(question_id) for question_id in question_ids
+        ]
+        return [question for question in questions if question is not None]
+
+
+@instrumented
 class QuestionMessageRepository:
     def __init__(self, table: Table):
         self.table = table
@@ -69,90 +666,193 @@ class QuestionMessageRepository:
             Item={
                 "pk": f"CHAT#{question_message.chat_id}",
                 "sk": f"MESSAGE#{question_message.message_id}",
-                **json.loads(question_message.json(exclude_none=True)),
+                **question_message_to_item(question_message),
                 "gsi_current_active_question": question_message.step_function_execution_arn,
+                "expires_at": int(question_message.sent_at.timestamp())
+                + TRANSIENT_ITEM_TTL_SECONDS,
             },
             ConditionExpression="attribute_not_exists(pk)",
         )
 
-    def attempt(
+    def commit_answer(
         self,
         chat_id: str,
         message_id: str,
-        answer: str,
+        user_id: str,
+        user_data: dict,
+        award_points: int,
+        answer: Optional[str],
         answer_time: int,
+        question_sent_at: int,
         user_display_name: str,
         no_retries: bool,
-    ) -> Union[Tuple[bool, int, str], Tuple[bool, Set[str], bool]]:
+        answer_index: Optional[int] = None,
+        question_id: Optional[str] = None,
+    ) -> Optional[AnswerAttempt]:
+        """
+        Solves the question and awards the player on the chat leaderboard in a single
+        transaction, provided the chat's game is running and started before the
+        question was sent. A typed answer has to be one of the message's accepted
+        answers exactly. A wrong answer writes nothing, and gets the question message
+        back from the failed condition check instead. Returns None if the question
+        message does not exist or belongs to a game that is over.
+        """
+        no_retry_condition_clause = (
+            "AND (attribute_not_exists(wrong_users) OR NOT contains(wrong_users, :user_display_name))"
+            if no_retries
+            else ""
+        )
+        if answer_index is not None:
+            # mcq buttons carry the index of the chosen option
+            correct_answer_condition_clause = (
+                "correct_option = :answer_index AND question_id = :question_id"
+            )
+            correct_answer_values = {
+                ":answer_index": int(answer_index),
+                ":question_id": question_id,
+            }
+        else:
+            # messages sent before accepted answers were stored only have the
+            # lowercased correct answer
+            correct_answer_condition_clause = "(contains(accepted_answers, :attempted_answer) OR question_data.correct_answer = :attempted_answer)"
+            correct_answer_values = {":attempted_answer": answer}
         try:
-            no_retry_condition_clause = (
-                "AND (attribute_not_exists(wrong_users) OR NOT contains(wrong_users, :user_display_name))"
-                if no_retries
-                else ""
+            # the client takes the same native types as the table resource. The loser
+            # of a conflict with another answer sees solved_at when it retries
+            retry_on_conflict(
+                self.table.meta.client.transact_write_items,
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": {
+                                "pk": f"CHAT#{chat_id}",
+                                "sk": f"MESSAGE#{message_id}",
+                            },
+                            # the execution arn is kept for whoever stops the execution
+                            "UpdateExpression": "SET solved_at = :answer_time REMOVE gsi_current_active_question",
+                            "ConditionExpression": f"{correct_answer_condition_clause} AND attribute_not_exists(solved_at) {no_retry_condition_clause}",
+                            "ExpressionAttributeValues": {
+                                ":answer_time": int(answer_time),
+                                **correct_answer_values,
+                                **(
+                                    {":user_display_name": user_display_name}
+                                    if no_retries
+                                    else dict()
+                                ),
+                            },
+                            "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                        }
+                    },
+                    {
+                        "Update": ScoreRepository.leaderboard_update(
+                            table_name=self.table.name,
+                            chat_id=chat_id,
+                            user_id=user_id,
+                            award_points=award_points,
+                            user_data=user_data,
+                            answer_time=answer_time,
+                        )
+                    },
+                    {
+                        # question messages of earlier games are not deleted when
+                        # they end, only left to expire
+                        "ConditionCheck": {
+                            "TableName": self.table.name,
+                            "Key": {"pk": f"CHAT#{chat_id}", "sk": "GAMEINFO"},
+                            "ConditionExpression": "game_state = :running AND (attribute_not_exists(started_at) OR started_at <= :latest_start)",
+                            "ExpressionAttributeValues": {
+                                ":running": GameInfo.GameState.RUNNING.value,
+                                ":latest_start": int(question_sent_at)
+                                + GAME_START_CLOCK_SKEW_SECONDS,
+                            },
+                        }
+                    },
+                ]
             )
-            response = self.table.update_item(
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] != "TransactionCanceledException":
+                raise ex
+            question_message_reason, _, game_reason = ex.response["CancellationReasons"]
+            if game_reason.get("Code") == "ConditionalCheckFailed":
+                # the game the question was asked in is over
+                return None
+            if question_message_reason.get("Code") != "ConditionalCheckFailed":
+                raise ex
+            if "Item" not in question_message_reason:
+                # question message has already been cleaned up
+                return None
+            # wrong answer
+            old_item = {
+                k: DESERIALIZER.deserialize(v)
+                for k, v in question_message_reason["Item"].items()
+            }
+            previous_wrong_users = old_item.get("wrong_users", set())
+            return AnswerAttempt(
+                correct=False,
+                question_message=question_message_from_item(old_item),
+                wrong_users=previous_wrong_users,
+                rejected_before=user_display_name in previous_wrong_users,
+            )
+        return AnswerAttempt(correct=True)
+
+    def record_wrong_answer(
+        self, chat_id: str, message_id: str, user_display_name: str
+    ) -> Optional[AnswerAttempt]:
+        try:
+            # conflicts with a correct answer being committed to the same message
+            response = retry_on_conflict(
+                self.table.update_item,
                 Key={"pk": f"CHAT#{chat_id}", "sk": f"MESSAGE#{message_id}",},
-                UpdateExpression="SET solved_at = :answer_time REMOVE step_function_execution_arn, gsi_current_active_question",
-                ConditionExpression=f"question_data.correct_answer = :attempted_answer AND attribute_not_exists(solved_at) {no_retry_condition_clause}",
-                ExpressionAttributeValues={
-                    ":answer_time": int(answer_time),
-                    ":attempted_answer": answer.lower(),
-                    **(
-                        {":user_display_name": user_display_name}
-                        if no_retries
-                        else dict()
-                    ),
-                },
+                UpdateExpression="ADD wrong_users :w",
+                ConditionExpression="attribute_exists(pk)",
+                ExpressionAttributeValues={":w": {user_display_name}},
                 ReturnValues="ALL_OLD",
             )
-            return (
-                True,
-                int(answer_time - response["Attributes"]["sent_at"]),
-                response["Attributes"]["question_data"]["correct_answer"],
-            )
         except ClientError as ex:
             if ex.response["Error"]["Code"] == "ConditionalCheckFailedException":
-                # wrong answer
-                response = self.table.update_item(
-                    Key={"pk": f"CHAT#{chat_id}", "sk": f"MESSAGE#{message_id}",},
-                    UpdateExpression="ADD wrong_users :w",
-                    ExpressionAttributeValues={":w": {user_display_name}},
-                    ReturnValues="ALL_OLD",
-                )
-                if "Attributes" not in response:
-                    logging.warn("For some reason, attributes are epty")
-                return (
-                    False,
-                    {user_display_name}.union(
-                        response.get("Attributes", dict()).get("wrong_users", {})
-                    ),
-                    user_display_name
-                    in response.get("Attributes", dict()).get("wrong_users", {}),
-                )
-            else:
-                raise ex
-
-    def mark_as_inactive(self, chat_id: str, message_id: str):
-        self.table.update_item(
-            Key={"pk": f"CHAT#{chat_id}", "sk": f"MESSAGE#{message_id}"},
-            UpdateExpression="REMOVE step_function_execution_arn, gsi_current_active_question",
-            ConditionExpression="attribute_not_exists(solved_at)",
+                # question message has already been cleaned up
+                return None
+            raise ex
+        previous_wrong_users = response["Attributes"].get("wrong_users", set())
+        return AnswerAttempt(
+            correct=False,
+            question_message=question_message_from_item(response["Attributes"]),
+            wrong_users={user_display_name}.union(previous_wrong_users),
+            rejected_before=user_display_name in previous_wrong_users,
         )
 
+    def mark_as_inactive(self, chat_id: str, message_id: str) -> bool:
+        """
+        Returns False if the question was solved first or has already been cleaned up
+        """
+        try:
+            self.table.update_item(
+                Key={"pk": f"CHAT#{chat_id}", "sk": f"MESSAGE#{message_id}"},
+                UpdateExpression="REMOVE step_function_execution_arn, gsi_current_active_question",
+                # without attribute_exists the update would recreate a bare item
+                ConditionExpression="attribute_exists(pk) AND attribute_not_exists(solved_at)",
+            )
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise ex
+        return True
+
     def find(self, chat_id: str, message_id: str) -> Optional[QuestionMessage]:
         response = self.table.get_item(
             Key={"pk": f"CHAT#{chat_id}", "sk": f"MESSAGE#{message_id}"}
         )
         if response.get("Item") is None:
             return None
-        return QuestionMessage(**response["Item"])
+        return question_message_from_item(response["Item"])
 
     def get_questions_in_group(self, chat_id: str) -> List[QuestionMessage]:
         response = self.table.query(
             KeyConditionExpression=Key("pk").eq(f"CHAT#{chat_id}")
             & Key("sk").begins_with("MESSAGE#")
         )
-        return [QuestionMessage(**item) for item in response.get("Items", [])]
+        return [question_message_from_item(item) for item in response.get("Items", [])]
 
     def get_current_active_question(self, chat_id: str) -> Optional[QuestionMessage]:
         response = self.table.query(
@@ -162,140 +862,254 @@ class QuestionMessageRepository:
         )
         if len(response.get("Items")) == 0:
             return None
-        return QuestionMessage(**response["Items"][0])
-
-    def cleanup_questions(self, chat_id: str):
-        with self.table.batch_writer() as batch:
-            # noinspection PyTypeChecker
-            response = self.table.query(
-                KeyConditionExpression=Key("pk").eq(f"CHAT#{chat_id}")
-                & Key("sk").begins_with("MESSAGE#"),
-                ProjectionExpression="pk, sk",
-            )
-            for item in response.get("Items", []):
-                batch.delete_item(Key=item)
+        return question_message_from_item(response["Items"][0])
 
 
+@instrumented
 class ScoreRepository:
-    def __init__(self, table: Table):
+    """
+    Scores in a running game are kept in the CHAT#<id>/LEADERBOARD item, every player's
+    in a score_<user> attribute, so that the scoreboard is a single read. They are
+    summed into GLOBAL_SCORE#<shard>/<user> rows when the game ends, and the item is
+    deleted.
+
+    Global scores are spread over global_score_shards partitions by a hash of the user
+    id, so that games ending together do not all write to one key. Each shard keeps
+    its top LEADERBOARD_SIZE players, in order, in a LEADERBOARD#<shard>/GLOBAL item,
+    its own partition like the scores, and the all time scoreboard merges those.
+    """
+
+    def __init__(self, table: Table, global_score_shards: int = GLOBAL_SCORE_SHARDS):
         self.table = table
+        self.global_score_shards = global_score_shards
 
-    def award_points(
-        self, chat_id: str, user_id: str, award_points: int, user_data: dict
-    ) -> int:
-        response = self.table.update_item(
-            Key={"pk": f"CHAT#{chat_id}", "sk": f"SCORE#{user_id}"},
-            UpdateExpression="SET score = if_not_exists(score, :zero) + :award_points, user_data = :user_data, user_id = :user_id",
-            ExpressionAttributeValues={
-                ":zero": 0,
+    @untimed
+    def global_score_shard(self, user_id: str) -> int:
+        # a stable digest rather than hash(), which is salted per process, and not
+        # crc32, whose low bits barely change between similar numeric user ids
+        digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.global_score_shards
+
+    @staticmethod
+    def global_leaderboard_key(shard: int) -> dict:
+        return {"pk": f"LEADERBOARD#{shard}", "sk": "GLOBAL"}
+
+    @staticmethod
+    def leaderboard_update(
+        table_name: str,
+        chat_id: str,
+        user_id: str,
+        award_points: int,
+        user_data: dict,
+        answer_time: int,
+    ) -> dict:
+        """
+        The update that adds the points to the chat leaderboard, in the form a
+        transaction takes it
+        """
+        return {
+            "TableName": table_name,
+            "Key": {"pk": f"CHAT#{chat_id}", "sk": "LEADERBOARD"},
+            "UpdateExpression": "ADD #score :award_points SET #user_data = :user_data, expires_at = :expires_at",
+            "ExpressionAttributeNames": {
+                "#score": f"score_{user_id}",
+                "#user_data": f"user_data_{user_id}",
+            },
+            "ExpressionAttributeValues": {
                 ":award_points": int(award_points),
                 ":user_data": user_data,
-                ":user_id": user_id,
+                ":expires_at": int(answer_time) + TRANSIENT_ITEM_TTL_SECONDS,
             },
-            ReturnValues="ALL_NEW",
-        )
-        return response["Attributes"]["score"]
+        }
 
-    def commit_to_global_scoreboard(self, chat_id: str):
-        response = self.table.query(
-            IndexName="ScoreBoard",
-            KeyConditionExpression=Key("pk").eq(f"CHAT#{chat_id}"),
+    @staticmethod
+    def rank(players: Iterable[Player], count: int) -> List[Player]:
+        return sorted(players, key=lambda player: (-player.score, player.user_id))[
+            :count
+        ]
+
+    def commit_to_global_scoreboard(self, chat_id: str, game_ended_at: int) -> int:
+        """
+        Adds the scores of the chat's game that ended at game_ended_at to the global
+        scores. Every global score row remembers the last game of each chat it was
+        committed from, so that committing the same game again, after a failure
+        halfway or concurrently, skips the players already committed.
+        """
+        players = self.get_local_players(chat_id)
+        # the low level client is thread safe, the Table resource is not
+        client = self.table.meta.client
+
+        def commit(player: Player) -> Optional[Player]:
+            try:
+                response = client.update_item(
+                    TableName=self.table.name,
+                    Key={
+                        "pk": f"GLOBAL_SCORE#{self.global_score_shard(player.user_id)}",
+                        "sk": player.user_id,
+                    },
+                    UpdateExpression="SET score = if_not_exists(score, :zero) + :award_points, user_data = :user_data, user_id = :user_id, #committed = :game_ended_at",
+                    ConditionExpression="attribute_not_exists(#committed) OR #committed < :game_ended_at",
+                    ExpressionAttributeNames={"#committed": f"committed_{chat_id}"},
+                    ExpressionAttributeValues={
+                        ":zero": 0,
+                        ":award_points": int(player.score),
+                        ":user_data": player.user_data,
+                        ":user_id": player.user_id,
+                        ":game_ended_at": int(game_ended_at),
+                    },
+                    ReturnValues="ALL_NEW",
+                )
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise ex
+                # committed by an earlier attempt
+                return None
+            return player_from_item(response["Attributes"])
+
+        with ThreadPoolExecutor(
+            max_workers=GLOBAL_SCOREBOARD_COMMIT_WORKERS
+        ) as executor:
+            # consume the iterator so that worker exceptions are raised here
+            global_standings = [
+                player
+                for player in executor.map(in_current_context(commit), players)
+                if player is not None
+            ]
+        self.table.delete_item(Key={"pk": f"CHAT#{chat_id}", "sk": "LEADERBOARD"})
+        logger.info(
+            f"Committed {len(global_standings)} of {len(players)} players of chat {chat_id} to the global scoreboard"
         )
-        if response.get("Items") is None:
-            return
-        players = [Player(**item) for item in response["Items"]]
-        for player in players:
-            self.table.update_item(
-                Key={"pk": "GLOBAL_SCORE", "sk": player.user_id},
-                UpdateExpression="SET score = if_not_exists(score, :zero) + :award_points, user_data = :user_data, user_id = :user_id",
-                ExpressionAttributeValues={
-                    ":zero": 0,
-                    ":award_points": int(player.score),
-                    ":user_data": player.user_data,
-                    ":user_id": player.user_id,
-                },
+        try:
+            self.merge_into_global_leaderboard(global_standings)
+        except (RuntimeError, ClientError) as ex:
+            # the scores are committed, and a retry would skip them. Players missing
+            # from the leaderboard are merged with their next game, or by
+            # shard_global_scores.
+            logger.warning(f"Could not update the all time leaderboard: {ex}")
+        return len(players)
+
+    def merge_into_global_leaderboard(self, global_standings: List[Player]):
+        shards: Dict[int, List[Player]] = dict()
+        for player in global_standings:
+            shards.setdefault(self.global_score_shard(player.user_id), []).append(
+                player
             )
-        with self.table.batch_writer() as batch:
-            # noinspection PyTypeChecker
-            response = self.table.query(
-                KeyConditionExpression=Key("pk").eq(f"CHAT#{chat_id}")
-                & Key("sk").begins_with("SCORE#"),
-                ProjectionExpression="pk, sk",
+        for shard, players in shards.items():
+            self.merge_into_shard_leaderboard(shard, players)
+
+    def merge_into_shard_leaderboard(self, shard: int, global_standings: List[Player]):
+        """
+        Merges new all time totals into a shard's leaderboard. Totals only ever go up,
+        so each player keeps the highest total seen, whichever order games end up
+        merging in. Concurrent merges are detected with the item's version and retried.
+        """
+        key = self.global_leaderboard_key(shard)
+        for attempt in range(LEADERBOARD_MAX_ATTEMPTS):
+            if attempt > 0:
+                # jittered, so that games ending together do not collide again
+                record_retry()
+                time.sleep(
+                    random.uniform(0, LEADERBOARD_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                )
+            item = self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if item is not None:
+                standings = {
+                    player["user_id"]: player_from_item(player)
+                    for player in item["players"]
+                }
+            else:
+                # first merge, seed the leaderboard from the shard's global scores
+                response = self.table.query(
+                    IndexName="ScoreBoard",
+                    KeyConditionExpression=Key("pk").eq(f"GLOBAL_SCORE#{shard}"),
+                    ScanIndexForward=False,
+                    Limit=LEADERBOARD_SIZE,
+                )
+                standings = {
+                    row["user_id"]: player_from_item(row)
+                    for row in response.get("Items", [])
+                }
+            for player in global_standings:
+                known = standings.get(player.user_id)
+                if known is None or player.score > known.score:
+                    standings[player.user_id] = player
+            top_players = self.rank(standings.values(), LEADERBOARD_SIZE)
+            try:
+                self.table.put_item(
+                    Item={
+                        **key,
+                        "version": item["version"] + 1 if item is not None else 1,
+                        "players": [player_to_item(player) for player in top_players],
+                    },
+                    **(
+                        dict(
+                            ConditionExpression="version = :version",
+                            ExpressionAttributeValues={":version": item["version"]},
+                        )
+                        if item is not None
+                        else dict(ConditionExpression="attribute_not_exists(pk)")
+                    ),
+                )
+                return
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise ex
+                logger.info(f"Leaderboard of shard {shard} changed while merging, retrying")
+        raise RuntimeError(
+            f"Could not merge into the leaderboard of shard {shard} after {LEADERBOARD_MAX_ATTEMPTS} attempts"
+        )
+
+    def get_local_players(self, chat_id: str) -> List[Player]:
+        item = self.table.get_item(
+            Key={"pk": f"CHAT#{chat_id}", "sk": "LEADERBOARD"}, ConsistentRead=True
+        ).get("Item", dict())
+        return [
+            player_from_item(
+                {
+                    "user_id": attribute[len("score_") :],
+                    "score": score,
+                    "user_data": item.get(
+                        f"user_data_{attribute[len('score_'):]}", dict()
+                    ),
+                }
             )
-            for item in response.get("Items", []):
-                batch.delete_item(Key=item)
+            for attribute, score in item.items()
+            if attribute.startswith("score_")
+        ]
 
     def get_local_top_players(self, chat_id: str, count: int = 3) -> List[Player]:
-        response = self.table.query(
-            IndexName="ScoreBoard",
-            KeyConditionExpression=Key("pk").eq(f"CHAT#{chat_id}"),
-            Limit=count,
-            ScanIndexForward=True,
-        )
-        if response.get("Items") is None:
-            return []
-        return [Player(**item) for item in response["Items"]]
+        return self.rank(self.get_local_players(chat_id), count)
 
     def get_global_top_players(self, count: int = 3) -> List[Player]:
-        response = self.table.query(
-            IndexName="ScoreBoard",
-            KeyConditionExpression=Key("pk").eq("GLOBAL_SCORE"),
-            Limit=count,
-            ScanIndexForward=True,
-        )
-        if response.get("Items") is None:
-            return []
-        return [Player(**item) for item in response["Items"]]
+        """
+        Gathers every shard's leaderboard in one BatchGetItem and merges them. Shards
+        that no game has ended in yet have no leaderboard and are skipped, this only
+        reads. The first commit into a shard seeds its leaderboard, and
+        shard_global_scores rebuilds them all.
+        """
+        keys = [
+            self.global_leaderboard_key(shard)
+            for shard in range(self.global_score_shards)
+        ]
+        players = [
+            player_from_item(player)
+            for item in batch_get_all(self.table, keys)
+            for player in item["players"]
+        ]
+        return self.rank(players, count)
 
 
+@instrumented
 class CallbackRepository:
+    """
+    Buttons of questions sent before their callback data was signed, see
+    callback_data.py. Nothing writes these anymore, they are read until they expire.
+    """
+
     def __init__(self, table: Table):
         self.table = table
 
-    def __validate_value(self, key: str, value):
-        if type(value) is float:
-            raise TypeError(f"Float not supported, use Decimal! At {key}")
-        if type(value) not in (str, int, bool):
-            raise TypeError(f"Unexpected type at {key}")
-
-    def __validate_list(self, key: str, data: list):
-        for i, value in enumerate(data):
-            self.__validate_value(key=str(i), value=value)
-
-    def __validate_dict(self, key: str, data: dict):
-        for k, value in data.items():
-            _key = f"{key}.{k}"
-            if type(value) is dict:
-                self.__validate_dict(key=_key, data=value)
-            elif type(value) is list:
-                self.__validate_list(key=_key, data=value)
-            else:
-                self.__validate_value(key=_key, value=value)
-
-    def __validate_item(self, data: dict):
-        self.__validate_dict(key="", data=data)
-
-    def create(self, chat_id: str, callback_data: dict) -> str:
-        self.__validate_item(callback_data)
-        callback_id = "".join([random.choice(string.ascii_letters) for _ in range(64)])
-        callback_data["callback_id"] = callback_id
-        try:
-            self.table.put_item(
-                Item={
-                    "pk": f"CALLBACK#{chat_id}",
-                    "sk": callback_id,
-                    "callback_info": callback_data,
-                    "gsi_callback_question_id": callback_data["question_id"],
-                },
-                ConditionExpression="attribute_not_exists(pk)",
-            )
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-                return self.create(chat_id, callback_data)
-            else:
-                raise e
-        return callback_id
-
+    @coalesced
     def retrieve(self, callback_id: str, chat_id: str) -> Optional[dict]:
         response = self.table.get_item(
             Key={"pk": f"CALLBACK#{chat_id}", "sk": callback_id}
@@ -304,53 +1118,48 @@ class CallbackRepository:
             return None
         return response["Item"]["callback_info"]
 
-    def find_by_question_id(self, chat_id: str, question_id: str) -> List[dict]:
-        response = self.table.query(
-            IndexName="CallbacksByQuestionId",
-            KeyConditionExpression=Key("pk").eq(f"CALLBACK#{chat_id}")
-            & Key("sk").eq(question_id),
-        )
-
-        return [item["callback_info"] for item in response["Items"]]
-
-    def delete_by_question_id(self, chat_id: str, question_id: str):
-        with self.table.batch_writer() as batch:
-            # noinspection PyTypeChecker
-            response = self.table.query(
-                KeyConditionExpression=Key("pk").eq(f"CALLBACK#{chat_id}"),
-                ProjectionExpression="pk, sk",
-                FilterExpression="callback_data.question_id = :question_id",
-                ExpressionAttributeValues={":question_id": question_id},
-            )
-            for item in response.get("Items", []):
-                batch.delete_item(Key=item)
-
-    def delete(self, chat_id: str):
-        with self.table.batch_writer() as batch:
-            # noinspection PyTypeChecker
-            response = self.table.query(
-                KeyConditionExpression=Key("pk").eq(f"CALLBACK#{chat_id}"),
-                ProjectionExpression="pk, sk",
-            )
-            for item in response.get("Items", []):
-                batch.delete_item(Key=item)
-
 
+@instrumented
 class GameInfoRepository:
     def __init__(self, table: Table):
         self.table = table
 
+    @coalesced
     def get(self, chat_id: str) -> GameInfo:
         response = self.table.get_item(Key={"pk": f"CHAT#{chat_id}", "sk": "GAMEINFO"})
         if response.get("Item") is None:
             return GameInfo(chat_id=chat_id, game_state=GameInfo.GameState.IDLE)
-        return GameInfo(**response["Item"],)
+        return game_info_from_item(response["Item"])
 
-    def put(self, game_info: GameInfo):
-        response = self.table.put_item(
-            Item={
-                "pk": f"CHAT#{game_info.chat_id}",
-                "sk": "GAMEINFO",
-                **json.loads(game_info.json(exclude_none=True)),
-            }
-        )
+    @invalidates_coalesced
+    def transition(self, game_info: GameInfo) -> GameInfoTransition:
+        """
+        Writes game_info, as changed from the one read, only if the stored one is still
+        at the version read. Game commands decide from what they read and use this in
+        place of a lock, deciding again from the returned game info when rejected.
+        """
+        new_game_info = game_info.copy(update={"version": game_info.version + 1})
+        try:
+            self.table.put_item(
+                Item={
+                    "pk": f"CHAT#{game_info.chat_id}",
+                    "sk": "GAMEINFO",
+                    **game_info_to_item(new_game_info),
+                },
+                # game info that was never written, or written before versions were
+                # kept, reads as version 0
+                ConditionExpression="attribute_not_exists(#version) OR #version = :version",
+                ExpressionAttributeNames={"#version": "version"},
+                ExpressionAttributeValues={":version": game_info.version},
+            )
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise ex
+            response = self.table.get_item(
+                Key={"pk": f"CHAT#{game_info.chat_id}", "sk": "GAMEINFO"},
+                ConsistentRead=True,
+            )
+            return GameInfoTransition(
+                applied=False, game_info=game_info_from_item(response["Item"])
+            )
+        return GameInfoTransition(applied=True, game_info=new_game_info)
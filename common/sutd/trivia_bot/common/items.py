@@ -0,0 +1,147 @@
+"""
+Maps the models to and from the attribute dicts of DynamoDB items.
+
+Items are written the way `json.loads(model.json(exclude_none=True))` would have them,
+with datetimes as epoch seconds and unset fields left out, and read back into models
+without validation. Numbers come back from DynamoDB as Decimal and are turned into
+int, and attributes that are not fields of the model, like pk and sk, are dropped.
+Items are trusted to have been written by these, anything else should go through the
+model's own validation.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sutd.trivia_bot.common.models import Question, QuestionMessage, GameInfo, Player
+
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from decimal import Decimal
+    from typing import Optional, Type, Union
+
+Model = TypeVar("Model")
+
+
+def to_epoch(value: Optional[datetime]) -> Optional[int]:
+    return None if value is None else int(value.timestamp())
+
+
+def from_epoch(value: Optional[Union[Decimal, int]]) -> Optional[datetime]:
+    return None if value is None else datetime.fromtimestamp(int(value), timezone.utc)
+
+
+def to_int(value: Optional[Union[Decimal, int]]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def unvalidated(model_class: Type[Model], **fields) -> Model:
+    # BaseModel.construct, less the defaults, every field is passed
+    model = model_class.__new__(model_class)
+    object.__setattr__(model, "__dict__", fields)
+    object.__setattr__(model, "__fields_set__", set(fields))
+    return model
+
+
+def without_none(attributes: dict) -> dict:
+    return {name: value for name, value in attributes.items() if value is not None}
+
+
+def question_to_item(question: Question) -> dict:
+    return without_none(
+        {
+            "id": question.id,
+            "type": question.type.value,
+            "correct_answer": question.correct_answer,
+            "question": question.question,
+            "other_answers": question.other_answers,
+            "aliases": question.aliases,
+        }
+    )
+
+
+def question_from_item(item: dict) -> Question:
+    return unvalidated(
+        Question,
+        id=item["id"],
+        type=Question.QuestionType(item["type"]),
+        correct_answer=item["correct_answer"],
+        question=item["question"],
+        other_answers=item.get("other_answers"),
+        aliases=item.get("aliases"),
+    )
+
+
+def question_message_to_item(question_message: QuestionMessage) -> dict:
+    return without_none(
+        {
+            "message_id": question_message.message_id,
+            "chat_id": question_message.chat_id,
+            "question_id": question_message.question_id,
+            "question_data": question_to_item(question_message.question_data),
+            "sent_at": to_epoch(question_message.sent_at),
+            "callback_infos_json": question_message.callback_infos_json,
+            "correct_option": question_message.correct_option,
+            "accepted_answers": question_message.accepted_answers,
+            "solved_at": to_epoch(question_message.solved_at),
+            "step_function_execution_arn": question_message.step_function_execution_arn,
+        }
+    )
+
+
+def question_message_from_item(item: dict) -> QuestionMessage:
+    return unvalidated(
+        QuestionMessage,
+        message_id=item["message_id"],
+        chat_id=item["chat_id"],
+        question_id=item["question_id"],
+        question_data=question_from_item(item["question_data"]),
+        sent_at=from_epoch(item["sent_at"]),
+        callback_infos_json=item.get("callback_infos_json"),
+        correct_option=to_int(item.get("correct_option")),
+        accepted_answers=item.get("accepted_answers"),
+        solved_at=from_epoch(item.get("solved_at")),
+        step_function_execution_arn=item.get("step_function_execution_arn"),
+    )
+
+
+def game_info_to_item(game_info: GameInfo) -> dict:
+    return without_none(
+        {
+            "step_function_execution_arn": game_info.step_function_execution_arn,
+            "chat_id": game_info.chat_id,
+            "game_state": game_info.game_state.value,
+            "started_at": to_epoch(game_info.started_at),
+            "ended_at": to_epoch(game_info.ended_at),
+            "version": game_info.version,
+        }
+    )
+
+
+def game_info_from_item(item: dict) -> GameInfo:
+    return unvalidated(
+        GameInfo,
+        step_function_execution_arn=item.get("step_function_execution_arn"),
+        chat_id=item["chat_id"],
+        game_state=GameInfo.GameState(item["game_state"]),
+        started_at=from_epoch(item.get("started_at")),
+        ended_at=from_epoch(item.get("ended_at")),
+        version=int(item.get("version", 0)),
+    )
+
+
+def player_to_item(player: Player) -> dict:
+    return {
+        "user_id": player.user_id,
+        "score": player.score,
+        "user_data": player.user_data,
+    }
+
+
+def player_from_item(item: dict) -> Player:
+    return unvalidated(
+        Player,
+        user_id=item["user_id"],
+        score=int(item["score"]),
+        user_data=item["user_data"],
+    )
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, FrozenSet, Tuple, Hashable
+    from sutd.trivia_bot.common.models import Question
+
+COMPILED_QUESTION_CACHE_SIZE = 1024
+QUESTION_MESSAGE_CACHE_SIZE = 4096
+
+NUMBER_WORDS = {
+    word: number
+    for number, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+        "fourteen fifteen sixteen seventeen eighteen nineteen".split()
+    )
+}
+TENS_WORDS = {
+    word: number * 10
+    for number, word in enumerate(
+        "twenty thirty forty fifty sixty seventy eighty ninety".split(), start=2
+    )
+}
+ARTICLES = {"a", "an", "the"}
+NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_answer(answer: str) -> str:
+    """
+    Lowercases the answer, strips accents and punctuation, collapses whitespace, drops
+    a leading article and spells numbers as digits, so that "The Five-Star " and
+    "5 star" both become "5 star".
+    """
+    answer = unicodedata.normalize("NFKD", answer)
+    answer = "".join(c for c in answer if not unicodedata.combining(c))
+    answer = answer.lower().replace("&", " and ").replace("'", "")
+    words = NON_ALPHANUMERIC.sub(" ", answer).split()
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    normalized = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in TENS_WORDS:
+            number = TENS_WORDS[word]
+            if i + 1 < len(words) and 0 < NUMBER_WORDS.get(words[i + 1], 0) < 10:
+                number += NUMBER_WORDS[words[i + 1]]
+                i += 1
+            normalized.append(str(number))
+        elif word in NUMBER_WORDS:
+            normalized.append(str(NUMBER_WORDS[word]))
+        else:
+            normalized.append(word)
+        i += 1
+    return " ".join(normalized)
+
+
+def edit_distance_within(a: str, b: str, max_distance: int) -> bool:
+    """
+    Whether the Levenshtein distance between a and b is at most max_distance, giving up
+    as soon as every cell of a row is over the limit
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if max_distance == 0:
+        return a == b
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+def typo_tolerance(accepted_answer: str) -> int:
+    # numbers have to be exact, and short words are too easy to hit by accident
+    if any(c.isdigit() for c in accepted_answer) or len(accepted_answer) < 5:
+        return 0
+    if len(accepted_answer) < 9:
+        return 1
+    return 2
+
+
+class CompiledQuestion:
+    """
+    The normalized forms of a question's correct answer and aliases
+    """
+
+    def __init__(self, question: Question):
+        self.source = self.source_of(question)
+        self.accepted_answers: FrozenSet[str] = frozenset(
+            filter(None, (normalize_answer(answer) for answer in self.source))
+        )
+        self.tolerances = {
+            accepted_answer: typo_tolerance(accepted_answer)
+            for accepted_answer in self.accepted_answers
+        }
+
+    @staticmethod
+    def source_of(question: Question) -> Tuple[str, ...]:
+        return (question.correct_answer, *(question.aliases or []))
+
+    def match(self, answer: str) -> Optional[str]:
+        """
+        Returns the accepted answer that the given answer matches, if any
+        """
+        normalized = normalize_answer(answer)
+        if normalized in self.accepted_answers:
+            return normalized
+        for accepted_answer, tolerance in self.tolerances.items():
+            if tolerance and edit_distance_within(
+                normalized, accepted_answer, tolerance
+            ):
+                return accepted_answer
+        return None
+
+
+class AnswerMatcher:
+    """
+    Process wide cache of compiled questions, by question id, and of which question a
+    question message asks and which execution is waiting on it, so that answers to a
+    message the process has seen before can be checked and the execution stopped
+    without going to the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.compiled_questions: OrderedDict[str, CompiledQuestion] = OrderedDict()
+        self.question_messages: OrderedDict[
+            Hashable, Tuple[CompiledQuestion, Optional[str]]
+        ] = OrderedDict()
+
+    @staticmethod
+    def __put(cache: OrderedDict, key: Hashable, value, max_size: int):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+    def compile(self, question: Question) -> CompiledQuestion:
+        with self.lock:
+            compiled = self.compiled_questions.get(question.id)
+            # recompile if the question was edited since it was cached
+            if compiled is None or compiled.source != CompiledQuestion.source_of(
+                question
+            ):
+                compiled = CompiledQuestion(question)
+            self.__put(
+                self.compiled_questions,
+                question.id,
+                compiled,
+                COMPILED_QUESTION_CACHE_SIZE,
+            )
+            return compiled
+
+    def learn(
+        self,
+        chat_id: str,
+        message_id: str,
+        question: Question,
+        step_function_execution_arn: Optional[str] = None,
+    ) -> CompiledQuestion:
+        compiled = self.compile(question)
+        key = (str(chat_id), str(message_id))
+        with self.lock:
+            if step_function_execution_arn is None and key in self.question_messages:
+                # keep the execution learnt from whoever sent the question
+                _, step_function_execution_arn = self.question_messages[key]
+            self.__put(
+                self.question_messages,
+                key,
+                (compiled, step_function_execution_arn),
+                QUESTION_MESSAGE_CACHE_SIZE,
+            )
+        return compiled
+
+    def recall(self, chat_id: str, message_id: str) -> Optional[CompiledQuestion]:
+        with self.lock:
+            learnt = self.question_messages.get((str(chat_id), str(message_id)))
+        return None if learnt is None else learnt[0]
+
+    def recall_execution_arn(self, chat_id: str, message_id: str) -> Optional[str]:
+        with self.lock:
+            learnt = self.question_messages.get((str(chat_id), str(message_id)))
+        return None if learnt is None else learnt[1]
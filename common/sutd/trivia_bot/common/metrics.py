@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, Dict, Callable, Iterator
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "TriviaBot")
+LOCK_OPERATION = "LockClient.acquire_lock"
+DYNAMODB_READ_OPERATIONS = {
+    "GetItem",
+    "BatchGetItem",
+    "Query",
+    "Scan",
+    "TransactGetItems",
+}
+DYNAMODB_CAPACITY_OPERATIONS = DYNAMODB_READ_OPERATIONS | {
+    "PutItem",
+    "UpdateItem",
+    "DeleteItem",
+    "BatchWriteItem",
+    "TransactWriteItems",
+}
+
+
+class OperationMetrics:
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.read_capacity_units = 0.0
+        self.write_capacity_units = 0.0
+        self.retries = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "Count": self.count,
+            "DurationMs": round(self.duration_ms, 2),
+            "ReadCapacityUnits": self.read_capacity_units,
+            "WriteCapacityUnits": self.write_capacity_units,
+            "Retries": self.retries,
+        }
+
+
+class InvocationMetrics:
+    """
+    What one invocation spent, per repository method, lock and DynamoDB API call.
+    Durations are inclusive of the operations called from within, consumed capacity
+    and retries are counted against the innermost operation only.
+    """
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.operations: Dict[str, OperationMetrics] = dict()
+
+    def update(self, name: str, **increments):
+        with self.lock:
+            operation = self.operations.setdefault(name, OperationMetrics())
+            for attribute, increment in increments.items():
+                setattr(operation, attribute, getattr(operation, attribute) + increment)
+
+    def emf(self, duration_ms: float) -> dict:
+        """
+        A CloudWatch embedded metric format record of the invocation
+        """
+        with self.lock:
+            operations = dict(sorted(self.operations.items()))
+        dynamodb_calls = {
+            name: operation
+            for name, operation in operations.items()
+            if name.startswith("DynamoDB.")
+        }
+        lock = operations.get(LOCK_OPERATION, OperationMetrics())
+        metrics = {
+            "Duration": (round(duration_ms, 2), "Milliseconds"),
+            "DynamoDBCalls": (
+                sum(operation.count for operation in dynamodb_calls.values()),
+                "Count",
+            ),
+            "ReadCapacityUnits": (
+                sum(op.read_capacity_units for op in dynamodb_calls.values()),
+                "Count",
+            ),
+            "WriteCapacityUnits": (
+                sum(op.write_capacity_units for op in dynamodb_calls.values()),
+                "Count",
+            ),
+            "Retries": (
+                sum(operation.retries for operation in operations.values()),
+                "Count",
+            ),
+            "LockWait": (round(lock.duration_ms, 2), "Milliseconds"),
+        }
+        return {
+            "_aws": {
+                "Timestamp": int(self.started_at * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["FunctionName"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit}
+                            for name, (_, unit) in metrics.items()
+                        ],
+                    }
+                ],
+            },
+            "FunctionName": self.function_name,
+            **{name: value for name, (value, _) in metrics.items()},
+            "Operations": {
+                name: operation.to_dict() for name, operation in operations.items()
+            },
+        }
+
+
+current_invocation: ContextVar[Optional[InvocationMetrics]] = ContextVar(
+    "current_invocation", default=None
+)
+current_operation: ContextVar[Optional[str]] = ContextVar(
+    "current_operation", default=None
+)
+
+
+@contextmanager
+def invocation_metrics(function_name: str) -> Iterator[InvocationMetrics]:
+    """
+    Collects the metrics of everything run within, and prints them as one EMF record
+    at the end, which CloudWatch picks up from the Lambda's log
+    """
+    invocation = InvocationMetrics(function_name)
+    token = current_invocation.set(invocation)
+    started = time.perf_counter()
+    try:
+        yield invocation
+    finally:
+        current_invocation.reset(token)
+        duration_ms = (time.perf_counter() - started) * 1000
+        # one line, EMF records cannot span log events
+        print(json.dumps(invocation.emf(duration_ms)), flush=True)
+
+
+def emits_metrics(handler):
+    """
+    Wraps a Lambda handler in invocation_metrics()
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        function_name = getattr(
+            context,
+            "function_name",
+            os.environ.get("AWS_LAMBDA_FUNCTION_NAME", handler.__module__),
+        )
+        with invocation_metrics(function_name):
+            return handler(event, context)
+
+    return wrapper
+
+
+@contextmanager
+def timed(name: str):
+    invocation = current_invocation.get()
+    if invocation is None:
+        yield
+        return
+    token = current_operation.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current_operation.reset(token)
+        invocation.update(
+            name, count=1, duration_ms=(time.perf_counter() - started) * 1000
+        )
+
+
+def record_retry():
+    """
+    Counts a retry made by the application, against the operation it is made in
+    """
+    invocation = current_invocation.get()
+    if invocation is not None:
+        invocation.update(current_operation.get() or "Unattributed", retries=1)
+
+
+def in_current_context(fn: Callable) -> Callable:
+    """
+    Carries the current invocation and operation into calls made on other threads,
+    which start with contexts of their own
+    """
+    invocation = current_invocation.get()
+    operation = current_operation.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        invocation_token = current_invocation.set(invocation)
+        operation_token = current_operation.set(operation)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            current_operation.reset(operation_token)
+            current_invocation.reset(invocation_token)
+
+    return wrapper
+
+
+def untimed(method):
+    """
+    Leaves a method that makes no calls out of @instrumented
+    """
+    method.untimed = True
+    return method
+
+
+def instrumented(cls):
+    """
+    Times every public method of a repository. Generators are left alone, since the
+    work happens while they are iterated.
+    """
+    for name, method in list(vars(cls).items()):
+        if (
+            name.startswith("_")
+            or not inspect.isfunction(method)
+            or inspect.isgeneratorfunction(method)
+            or getattr(method, "untimed", False)
+        ):
+            continue
+        setattr(cls, name, timed_method(f"{cls.__name__}.{name}", method))
+    return cls
+
+
+def timed_method(name: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed(name):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_dynamodb_client(client):
+    """
+    Asks DynamoDB for the capacity every call consumes, and records it with the
+    SDK's own retries against both the API call and the operation it was made in
+    """
+
+    def return_consumed_capacity(params: dict, model, **kwargs):
+        if model.name in DYNAMODB_CAPACITY_OPERATIONS:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+    def start_call(context: dict, **kwargs):
+        # the request context is handed to after-call as well
+        context["metrics_started"] = time.perf_counter()
+
+    def record_call(http_response, parsed: dict, model, context: dict, **kwargs):
+        invocation = current_invocation.get()
+        if invocation is None:
+            return
+        duration_ms = (time.perf_counter() - context["metrics_started"]) * 1000
+        consumed = parsed.get("ConsumedCapacity", [])
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        read_capacity_units = 0.0
+        write_capacity_units = 0.0
+        for capacity in consumed:
+            if "ReadCapacityUnits" in capacity or "WriteCapacityUnits" in capacity:
+                read_capacity_units += capacity.get("ReadCapacityUnits", 0.0)
+                write_capacity_units += capacity.get("WriteCapacityUnits", 0.0)
+            elif model.name in DYNAMODB_READ_OPERATIONS:
+                read_capacity_units += capacity.get("CapacityUnits", 0.0)
+            else:
+                write_capacity_units += capacity.get("CapacityUnits", 0.0)
+        retries = parsed.get("ResponseMetadata", dict()).get("RetryAttempts", 0)
+        invocation.update(
+            f"DynamoDB.{model.name}",
+            count=1,
+            duration_ms=duration_ms,
+            read_capacity_units=read_capacity_units,
+            write_capacity_units=write_capacity_units,
+            retries=retries,
+        )
+        if current_operation.get() is not None:
+            invocation.update(
+                current_operation.get(),
+                read_capacity_units=read_capacity_units,
+                write_capacity_units=write_capacity_units,
+            )
+
+    client.meta.events.register(
+        "provide-client-params.dynamodb", return_consumed_capacity
+    )
+    client.meta.events.register("before-call.dynamodb", start_call)
+    client.meta.events.register("after-call.dynamodb", record_call)
+    return client
+
+
+class InstrumentedLockClient:
+    """
+    Times how long acquiring each lock takes, otherwise the lock client it wraps
+    """
+
+    def __init__(self, lock_client):
+        self.lock_client = lock_client
+
+    def acquire_lock(self, *args, **kwargs):
+        with timed(LOCK_OPERATION):
+            return self.lock_client.acquire_lock(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.lock_client, name)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List, Union, Dict
+from typing import Optional, List, Union, Dict, Set
 from enum import Enum
 
 from pydantic import BaseModel, Json
@@ -18,6 +18,30 @@ class Question(BaseModel):
     correct_answer: str
     question: str
     other_answers: Optional[List[str]] = None
+    # other spellings of the correct answer that should also be accepted
+    aliases: Optional[List[str]] = None
+
+
+class QuestionBankSummary(BaseModel):
+    class Config:
+        extra = "ignore"
+
+    # bumped on every change to the question bank, used to invalidate cached questions
+    bank_version: int = 0
+    # number of ordinals handed out in the question index
+    question_count: int = 0
+    # the version of the index that questions are sampled from, 0 until a bank is
+    # imported, see QuestionRepository.import_bank
+    index_version: int = 0
+
+
+class QuestionBankImport(BaseModel):
+    added: int
+    removed: int
+    unchanged: int
+    # the bank as it is after the import, unchanged if nothing was written
+    bank_version: int
+    index_version: int
 
 
 class QuestionMessage(BaseModel):
@@ -27,6 +51,9 @@ class QuestionMessage(BaseModel):
     question_data: Question
     sent_at: datetime
     callback_infos_json: Optional[str] = None
+    correct_option: Optional[int] = None
+    # normalized forms of the correct answer, see matching.normalize_answer
+    accepted_answers: Optional[List[str]] = None
     solved_at: Optional[datetime] = None
     step_function_execution_arn: Optional[str] = None
 
@@ -37,9 +64,21 @@ class QuestionMessage(BaseModel):
         }
 
 
+class AnswerAttempt(BaseModel):
+    correct: bool
+    # the question message as it was just before the attempt was recorded, a committed
+    # transaction returns nothing so this is None for correct answers
+    question_message: Optional[QuestionMessage] = None
+    wrong_users: Set[str] = set()
+    rejected_before: bool = False
+
+
 class GameInfo(BaseModel):
     class Config:
         extra = "ignore"
+        json_encoders = {
+            datetime: lambda v: int(v.timestamp()),
+        }
 
     class GameState(Enum):
         IDLE = "IDLE"
@@ -49,6 +88,20 @@ class GameInfo(BaseModel):
     step_function_execution_arn: Optional[str] = None
     chat_id: str
     game_state: GameState
+    # answers are only taken for questions sent after this
+    started_at: Optional[datetime] = None
+    # when the game went into CLEANING_UP, and which scores have been committed
+    ended_at: Optional[datetime] = None
+    # bumped by every GameInfoRepository.transition, game info written before it was
+    # kept reads as 0
+    version: int = 0
+
+
+class GameInfoTransition(BaseModel):
+    # False if the game info was changed since it was read, game_info is then the
+    # current one, to decide again from
+    applied: bool
+    game_info: GameInfo
 
 
 class Player(BaseModel):
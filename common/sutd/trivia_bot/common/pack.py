@@ -0,0 +1,150 @@
+"""
+The question bank compiled into a read only file that ships in the Lambda layer, see
+utils/sutd/trivia_bot/data/build_pack.py.
+
+All numbers are little endian:
+
+    header   magic, bank version, question count, slot count
+    offsets  question count x u32, where the record of each ordinal starts
+    slots    slot count x u32, an open addressing table from the crc32 of an id to the
+             ordinal + 1 of its question, 0 for an empty slot
+    records  u16 id length, id, u32 body length, body
+
+Bodies are the question's item attributes as JSON, see items.py. The file is memory
+mapped and a question is found by its id or ordinal from a handful of reads, so only
+the pages that are used are ever loaded, however large the bank is.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from sutd.trivia_bot.common.items import question_to_item, question_from_item
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, List, Tuple
+    from sutd.trivia_bot.common.models import Question
+
+MAGIC = b"TQPACK01"
+HEADER = struct.Struct("<8sIII")
+OFFSET = struct.Struct("<I")
+SLOT = struct.Struct("<I")
+ID_LENGTH = struct.Struct("<H")
+BODY_LENGTH = struct.Struct("<I")
+DEFAULT_QUESTION_PACK_PATH = os.path.join(os.path.dirname(__file__), "questions.pack")
+
+
+def slot_count_for(question_count: int) -> int:
+    # at most half full, so that probes stay short
+    slot_count = 1
+    while slot_count < 2 * question_count:
+        slot_count *= 2
+    return slot_count
+
+
+def first_slot(question_id: bytes, slot_count: int) -> int:
+    return zlib.crc32(question_id) & (slot_count - 1)
+
+
+def write_question_pack(path: str, questions: List[Question], bank_version: int):
+    ids = [question.id.encode() for question in questions]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Question ids in a pack have to be unique")
+    slot_count = slot_count_for(len(questions))
+    slots = [0] * slot_count
+    for ordinal, question_id in enumerate(ids):
+        slot = first_slot(question_id, slot_count)
+        while slots[slot] != 0:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = ordinal + 1
+
+    records = []
+    offsets = []
+    offset = HEADER.size + OFFSET.size * len(questions) + SLOT.size * slot_count
+    for question, question_id in zip(questions, ids):
+        body = json.dumps(question_to_item(question), separators=(",", ":")).encode()
+        record = b"".join(
+            [
+                ID_LENGTH.pack(len(question_id)),
+                question_id,
+                BODY_LENGTH.pack(len(body)),
+                body,
+            ]
+        )
+        offsets.append(offset)
+        records.append(record)
+        offset += len(record)
+
+    # written next to the pack and moved over it, so a pack is never read half written
+    partial_path = f"{path}.partial"
+    with open(partial_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, bank_version, len(questions), slot_count))
+        file.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        file.write(b"".join(SLOT.pack(slot) for slot in slots))
+        file.write(b"".join(records))
+    os.replace(partial_path, path)
+
+
+class QuestionPack:
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            # the mapping stays open after the file is closed
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            self.bank_version,
+            self.question_count,
+            self.slot_count,
+        ) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a question pack")
+        self.offsets_start = HEADER.size
+        self.slots_start = self.offsets_start + OFFSET.size * self.question_count
+
+    def __record(self, ordinal: int) -> Tuple[bytes, int]:
+        """
+        Returns the id of the question at ordinal, and where its body starts
+        """
+        if not 0 <= ordinal < self.question_count:
+            raise IndexError(f"No question at ordinal {ordinal}")
+        (offset,) = OFFSET.unpack_from(
+            self.buffer, self.offsets_start + OFFSET.size * ordinal
+        )
+        (id_length,) = ID_LENGTH.unpack_from(self.buffer, offset)
+        id_start = offset + ID_LENGTH.size
+        return self.buffer[id_start : id_start + id_length], id_start + id_length
+
+    def id_at(self, ordinal: int) -> str:
+        return self.__record(ordinal)[0].decode()
+
+    def question_at(self, ordinal: int) -> Question:
+        _, body_start = self.__record(ordinal)
+        (body_length,) = BODY_LENGTH.unpack_from(self.buffer, body_start)
+        body_start += BODY_LENGTH.size
+        return question_from_item(
+            json.loads(self.buffer[body_start : body_start + body_length])
+        )
+
+    def ordinal_of(self, question_id: str) -> Optional[int]:
+        if self.question_count == 0:
+            return None
+        encoded_id = question_id.encode()
+        slot = first_slot(encoded_id, self.slot_count)
+        while True:
+            (entry,) = SLOT.unpack_from(
+                self.buffer, self.slots_start + SLOT.size * slot
+            )
+            if entry == 0:
+                return None
+            if self.__record(entry - 1)[0] == encoded_id:
+                return entry - 1
+            slot = (slot + 1) & (self.slot_count - 1)
+
+    def find(self, question_id: str) -> Optional[Question]:
+        ordinal = self.ordinal_of(question_id)
+        return None if ordinal is None else self.question_at(ordinal)
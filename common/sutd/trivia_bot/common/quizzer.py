@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import json
-from datetime import timedelta
-from random import shuffle
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from random import shuffle, random
 import time
 import traceback
 
 import pinject
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 
+from sutd.trivia_bot.common.matching import AnswerMatcher, normalize_answer
 from sutd.trivia_bot.common.models import Question, GameInfo, QuestionMessage
+from sutd.trivia_bot.common.sender import flushes_telegram_sender
 
 
 from typing import TYPE_CHECKING
@@ -20,16 +24,19 @@ if TYPE_CHECKING:
     from mypy_boto3_stepfunctions import Client as SFNClient
     from telegram.bot import Bot
     from telegram.message import Message
-    from datetime import datetime
     from sutd.trivia_bot.common.database import (
         GameInfoRepository,
         QuestionMessageRepository,
         ScoreRepository,
-        CallbackRepository,
     )
+    from sutd.trivia_bot.common.callback_data import CallbackDataCodec, CallbackToken
+    from sutd.trivia_bot.common.sender import TelegramSender
     from python_dynamodb_lock.python_dynamodb_lock import DynamoDBLockClient
 
 MAX_RESPONSE_TIME = 15
+QUESTION_LOCK_RETRY_PERIOD = timedelta(milliseconds=250)
+# a chat left cleaning up this long has lost its cleanup, /start starts another
+CLEANUP_RESUME_AFTER_SECONDS = 60
 
 
 class QuestionAsker:
@@ -39,13 +46,15 @@ class QuestionAsker:
         step_function_execution_arn: str,
         bot: Bot,
         question_message_repository: QuestionMessageRepository,
-        callback_repository: CallbackRepository,
+        callback_data_codec: CallbackDataCodec,
+        answer_matcher: AnswerMatcher,
     ):
         self.chat_id = chat_id
         self.step_function_execution_arn = step_function_execution_arn
         self.bot = bot
         self.question_message_repository = question_message_repository
-        self.callback_repository = callback_repository
+        self.callback_data_codec = callback_data_codec
+        self.answer_matcher = answer_matcher
 
     @classmethod
     def generate_question_message_text(cls, question: Question) -> str:
@@ -67,21 +76,32 @@ class QuestionAsker:
             answering_instructions = "Reply to this message to answer!"
             reply_markup = None
             callback_infos = None
+            correct_option = None
         elif question.type == Question.QuestionType.mcq:
             answering_instructions = "Press one of the buttons below!"
             keyboard: List[List[InlineKeyboardButton]] = []
-            answers: List[str] = [question.correct_answer] + question.other_answers
-            shuffle(answers)
+            options = [(question.correct_answer, True)] + [
+                (answer, False) for answer in question.other_answers
+            ]
+            shuffle(options)
             callback_infos = []
-            for answer in answers:
-                callback_data = {
-                    "chat_id": self.chat_id,
-                    "question_id": question.id,
-                    "answer": answer,
-                }
-                callback_infos.append(callback_data)
-                callback_id = self.callback_repository.create(
-                    chat_id=self.chat_id, callback_data=callback_data
+            correct_option = None
+            for answer_index, (answer, correct) in enumerate(options):
+                if correct:
+                    correct_option = answer_index
+                callback_id = self.callback_data_codec.encode(
+                    chat_id=self.chat_id,
+                    question_id=question.id,
+                    answer_index=answer_index,
+                    correct=correct,
+                )
+                callback_infos.append(
+                    {
+                        "chat_id": self.chat_id,
+                        "question_id": question.id,
+                        "answer": answer,
+                        "callback_id": callback_id,
+                    }
                 )
                 keyboard.append(
                     [InlineKeyboardButton(answer, callback_data=callback_id)]
@@ -110,6 +130,15 @@ class QuestionAsker:
             callback_infos_json=json.dumps(callback_infos)
             if question.type == question.QuestionType.mcq
             else None,
+            correct_option=correct_option,
+            accepted_answers=sorted(
+                self.answer_matcher.learn(
+                    chat_id=message.chat_id,
+                    message_id=message.message_id,
+                    question=question,
+                    step_function_execution_arn=self.step_function_execution_arn,
+                ).accepted_answers
+            ),
         )
         self.question_message_repository.create(question_message)
         return question_message
@@ -121,11 +150,13 @@ class QuestionAskerFactory:
         self,
         bot: Bot,
         question_message_repository: QuestionMessageRepository,
-        callback_repository: CallbackRepository,
+        callback_data_codec: CallbackDataCodec,
+        answer_matcher: AnswerMatcher,
     ):
         self.bot = bot
         self.question_message_repository = question_message_repository
-        self.callback_repository = callback_repository
+        self.callback_data_codec = callback_data_codec
+        self.answer_matcher = answer_matcher
 
     def create(self, chat_id: str, step_function_execution_arn: str) -> QuestionAsker:
         return QuestionAsker(
@@ -133,7 +164,8 @@ class QuestionAskerFactory:
             step_function_execution_arn=step_function_execution_arn,
             bot=self.bot,
             question_message_repository=self.question_message_repository,
-            callback_repository=self.callback_repository,
+            callback_data_codec=self.callback_data_codec,
+            answer_matcher=self.answer_matcher,
         )
 
 
@@ -143,129 +175,264 @@ class QuestionResponder:
         chat_id: str,
         message_id: str,
         bot: Bot,
+        telegram_sender: TelegramSender,
         sfn_client: SFNClient,
         score_repository: ScoreRepository,
-        callback_repository: CallbackRepository,
         question_message_repository: QuestionMessageRepository,
+        answer_matcher: AnswerMatcher,
         lock_client: DynamoDBLockClient,
+        use_answer_lock: bool = False,
     ):
         self.chat_id = chat_id
         self.message_id = message_id
         self.bot = bot
+        self.telegram_sender = telegram_sender
         self.sfn_client = sfn_client
         self.score_repository = score_repository
-        self.callback_repository = callback_repository
         self.question_message_repository = question_message_repository
+        self.answer_matcher = answer_matcher
         self.lock_client = lock_client
-
-    def fail(self):
+        self.use_answer_lock = use_answer_lock
+
+    @contextmanager
+    def question_lock(self, raise_context_exception: bool):
+        # the conditional writes in QuestionMessageRepository already decide who
+        # solved the question first, so the lock table is only used when opted in
+        if not self.use_answer_lock:
+            yield
+            return
         question_lock = f"chat.{self.chat_id}.message.{self.message_id}"
+        # the wait is recorded by the instrumented lock client, see metrics.py
         with self.lock_client.acquire_lock(
-            question_lock, retry_period=timedelta(0.25), raise_context_exception=False
+            question_lock,
+            retry_period=QUESTION_LOCK_RETRY_PERIOD,
+            raise_context_exception=raise_context_exception,
         ):
-            self.question_message_repository.mark_as_inactive(
+            yield
+
+    def fail(self):
+        with self.question_lock(raise_context_exception=False):
+            marked_as_inactive = self.question_message_repository.mark_as_inactive(
                 chat_id=self.chat_id, message_id=self.message_id
             )
+            if not marked_as_inactive:
+                # somebody answered correctly just before the timeout, or the game has
+                # already been cleaned up
+                return
             question_message = self.question_message_repository.find(
                 chat_id=self.chat_id, message_id=self.message_id
             )
+            if question_message is None:
+                return
             self.bot.send_message(
                 text=f"Too slow! The answer is {question_message.question_data.correct_answer}",
                 chat_id=self.chat_id,
             )
 
+    def stop_execution(self, step_function_execution_arn: Optional[str]):
+        # the question flow of a question whose execution is not known times out on
+        # its own
+        if step_function_execution_arn is not None:
+            self.sfn_client.stop_execution(
+                executionArn=step_function_execution_arn,
+                error="Answered",
+                cause="Question Answered",
+            )
+
+    @flushes_telegram_sender
     def attempt(
         self,
-        answer: str,
+        answer: Optional[str],
         answer_time: int,
         user_id: str,
         user_data: dict,
         answer_message_id: Optional[str] = None,
         answer_callback_query_id: Optional[str] = None,
+        callback_token: Optional[CallbackToken] = None,
+        question_sent_at: Optional[int] = None,
     ) -> bool:
         if answer_message_id is None and answer_callback_query_id is None:
             raise ValueError(
                 "Either answer_message_id or answer_callback_query_id must be present"
             )
+        if answer is None and callback_token is None:
+            raise ValueError("Either answer or callback_token must be present")
+        if question_sent_at is None:
+            raise ValueError("question_sent_at must be present")
 
         player_name = (
             user_data.get("first_name")
             or user_data.get("last_name")
             or user_data.get("username")
         )
-        question_lock = f"chat.{self.chat_id}.message.{self.message_id}"
-        _start = time.time()
-        with self.lock_client.acquire_lock(
-            question_lock, retry_period=timedelta(0.25), raise_context_exception=True
-        ):
-            _end = time.time()
-            print(f"It took {_end - _start} seconds to acquire the lock")
-            result = self.question_message_repository.attempt(
-                chat_id=self.chat_id,
-                message_id=self.message_id,
-                answer=answer,
-                answer_time=answer_time,
-                user_display_name=player_name,
-                no_retries=answer_message_id is None,
+        # calculate number of points to give
+        # constant 100 points for mcq questions
+        award_value = (
+            max(
+                10,
+                int(
+                    (
+                        abs(MAX_RESPONSE_TIME - (answer_time - question_sent_at))
+                        / MAX_RESPONSE_TIME
+                    )
+                    * 100
+                ),
             )
-            correct = result[0]
-        if correct:
-            _, time_delta, correct_answer = result
-            # calculate number of points to give
-            # constant 100 points for mcq questions
-            award_value = (
-                max(
-                    10,
-                    int(
-                        (abs(MAX_RESPONSE_TIME - time_delta) / MAX_RESPONSE_TIME) * 100
-                    ),
-                )
-                if answer_message_id is not None
-                else 100
+            if answer_message_id is not None
+            else 100
+        )
+        if answer_message_id is not None:
+            # typed answers are checked here first when this process has already seen
+            # the question, so that wrong guesses and typos cost no writes
+            compiled_question = self.answer_matcher.recall(
+                self.chat_id, self.message_id
             )
-            # award points
-            self.score_repository.award_points(
+            if compiled_question is not None:
+                accepted_answer = compiled_question.match(answer)
+                if accepted_answer is None:
+                    return False
+                answer = accepted_answer
+            else:
+                answer = normalize_answer(answer)
+        with self.question_lock(raise_context_exception=True):
+            if callback_token is not None and not callback_token.correct:
+                # the signed button already tells us the answer is wrong
+                answer_attempt = self.question_message_repository.record_wrong_answer(
+                    chat_id=self.chat_id,
+                    message_id=self.message_id,
+                    user_display_name=player_name,
+                )
+            else:
+                answer_attempt = self.question_message_repository.commit_answer(
+                    chat_id=self.chat_id,
+                    message_id=self.message_id,
+                    user_id=user_id,
+                    user_data=user_data,
+                    award_points=award_value,
+                    answer=answer,
+                    answer_time=answer_time,
+                    question_sent_at=question_sent_at,
+                    user_display_name=player_name,
+                    no_retries=answer_message_id is None,
+                    answer_index=callback_token.answer_index
+                    if callback_token is not None
+                    else None,
+                    question_id=callback_token.question_id
+                    if callback_token is not None
+                    else None,
+                )
+                if (
+                    answer_attempt is not None
+                    and not answer_attempt.correct
+                    and answer_message_id is not None
+                    and answer_attempt.question_message.solved_at is None
+                ):
+                    # only exact matches can be checked by the database, try again if
+                    # the answer is close enough to one of the accepted answers
+                    compiled_question = self.answer_matcher.learn(
+                        chat_id=self.chat_id,
+                        message_id=self.message_id,
+                        question=answer_attempt.question_message.question_data,
+                        step_function_execution_arn=answer_attempt.question_message.step_function_execution_arn,
+                    )
+                    accepted_answer = compiled_question.match(answer)
+                    if (
+                        accepted_answer is not None
+                        and accepted_answer != answer
+                        and answer_attempt.question_message.accepted_answers
+                    ):
+                        answer = accepted_answer
+                        answer_attempt = self.question_message_repository.commit_answer(
+                            chat_id=self.chat_id,
+                            message_id=self.message_id,
+                            user_id=user_id,
+                            user_data=user_data,
+                            award_points=award_value,
+                            answer=answer,
+                            answer_time=answer_time,
+                            question_sent_at=question_sent_at,
+                            user_display_name=player_name,
+                            no_retries=False,
+                        )
+                if (
+                    answer_attempt is not None
+                    and not answer_attempt.correct
+                    and callback_token is None
+                    and answer_callback_query_id is not None
+                    and answer_attempt.question_message.solved_at is None
+                    and not answer_attempt.rejected_before
+                ):
+                    # buttons without a signed verdict only find out the answer is
+                    # wrong from the failed commit
+                    answer_attempt = self.question_message_repository.record_wrong_answer(
+                        chat_id=self.chat_id,
+                        message_id=self.message_id,
+                        user_display_name=player_name,
+                    )
+        if answer_attempt is not None and answer_attempt.question_message is not None:
+            # every image a write hands back is remembered, along with the execution
+            # the next correct answer to this message stops
+            self.answer_matcher.learn(
                 chat_id=self.chat_id,
-                user_id=user_id,
-                award_points=award_value,
-                user_data=user_data,
+                message_id=self.message_id,
+                question=answer_attempt.question_message.question_data,
+                step_function_execution_arn=answer_attempt.question_message.step_function_execution_arn,
             )
-            # stop question step function execution
-            question_message = self.question_message_repository.find(
+        if answer_attempt is None:
+            # the question message no longer exists
+            if answer_callback_query_id is not None:
+                self.telegram_sender.send_later(
+                    "answer_callback_query",
+                    callback_query_id=answer_callback_query_id,
+                    text="Expired",
+                    cache_time=100,
+                )
+            return False
+        question_message = answer_attempt.question_message
+        if answer_attempt.correct:
+            # the committed answer returns nothing, the execution comes from the
+            # question this process sent or an image a write already handed back
+            step_function_execution_arn = self.answer_matcher.recall_execution_arn(
                 self.chat_id, self.message_id
             )
-            if question_message.step_function_execution_arn is not None:
-                self.sfn_client.stop_execution(
-                    executionArn=question_message.step_function_execution_arn,
-                    error="Answered",
-                    cause="Question Answered",
-                )
-            # give feedback
             if answer_callback_query_id is not None:
+                # let the player know straight away, before anything else is sent
+                feedback = self.telegram_sender.submit(
+                    "answer_callback_query",
+                    text="🎉 Correct!",
+                    callback_query_id=answer_callback_query_id,
+                )
                 # mcq feedback
-                mcq_extra_message = f"The answer is {correct_answer}. "
-                self.bot.send_message(
+                mcq_extra_message = f"The answer is {answer}. "
+                self.telegram_sender.send_later(
+                    "send_message",
+                    ordering_key=self.chat_id,
+                    after=[feedback],
                     text=f"🎉 Correct! {mcq_extra_message}{player_name} has been awarded {award_value} points.",
                     chat_id=self.chat_id,
                 )
-                self.bot.answer_callback_query(
-                    text="🎉 Correct!", callback_query_id=answer_callback_query_id
-                )
-                self.callback_repository.delete_by_question_id(
-                    chat_id=self.chat_id, question_id=question_message.question_id
-                )
             elif answer_message_id is not None:
-                self.bot.send_message(
+                self.telegram_sender.send_later(
+                    "send_message",
+                    ordering_key=self.chat_id,
                     text=f"🎉 Correct! {player_name} has been awarded {award_value} points.",
                     chat_id=self.chat_id,
                     reply_to_message_id=answer_message_id,
                 )
-        else:
-            _, wrong_users, rejected_before = result
+            # stop question step function execution while the feedback is being sent
+            self.stop_execution(step_function_execution_arn)
+        elif question_message.solved_at is not None:
+            # somebody else got there first
             if answer_callback_query_id is not None:
-                question_message = self.question_message_repository.find(
-                    self.chat_id, self.message_id
+                self.telegram_sender.send_later(
+                    "answer_callback_query",
+                    text="Too slow!",
+                    callback_query_id=answer_callback_query_id,
                 )
+        else:
+            wrong_users = answer_attempt.wrong_users
+            rejected_before = answer_attempt.rejected_before
+            if answer_callback_query_id is not None:
                 base_message_text = QuestionAsker.generate_question_message_text(
                     question_message.question_data
                 )
@@ -283,23 +450,28 @@ class QuestionResponder:
                         ]
                     )
                 if not rejected_before:
-                    self.bot.edit_message_text(
+                    self.telegram_sender.send_later(
+                        "edit_message_text",
+                        ordering_key=self.chat_id,
                         text=message_text,
                         parse_mode="HTML",
                         message_id=self.message_id,
                         chat_id=self.chat_id,
                         reply_markup=InlineKeyboardMarkup(keyboard),
                     )
-                    self.bot.answer_callback_query(
-                        text="❌ Wrong :(", callback_query_id=answer_callback_query_id
+                    self.telegram_sender.send_later(
+                        "answer_callback_query",
+                        text="❌ Wrong :(",
+                        callback_query_id=answer_callback_query_id,
                     )
                 else:
-                    self.bot.answer_callback_query(
+                    self.telegram_sender.send_later(
+                        "answer_callback_query",
                         text="You already chose the wrong answer!",
                         callback_query_id=answer_callback_query_id,
                     )
 
-        return correct
+        return answer_attempt.correct
 
 
 class QuestionResponderFactory:
@@ -307,29 +479,35 @@ class QuestionResponderFactory:
     def __init__(
         self,
         bot: Bot,
+        telegram_sender: TelegramSender,
         sfn_client: SFNClient,
         score_repository: ScoreRepository,
-        callback_repository: CallbackRepository,
         question_message_repository: QuestionMessageRepository,
+        answer_matcher: AnswerMatcher,
         lock_client: DynamoDBLockClient,
+        use_answer_lock: bool,
     ):
         self.bot = bot
+        self.telegram_sender = telegram_sender
         self.sfn_client = sfn_client
         self.score_repository = score_repository
-        self.callback_repository = callback_repository
         self.question_message_repository = question_message_repository
+        self.answer_matcher = answer_matcher
         self.lock_client = lock_client
+        self.use_answer_lock = use_answer_lock
 
     def create(self, chat_id: str, message_id: str) -> QuestionResponder:
         return QuestionResponder(
             chat_id=chat_id,
             message_id=message_id,
             bot=self.bot,
+            telegram_sender=self.telegram_sender,
             sfn_client=self.sfn_client,
             score_repository=self.score_repository,
-            callback_repository=self.callback_repository,
             question_message_repository=self.question_message_repository,
+            answer_matcher=self.answer_matcher,
             lock_client=self.lock_client,
+            use_answer_lock=self.use_answer_lock,
         )
 
 
@@ -338,120 +516,189 @@ class GameMaster:
         self,
         chat_id: str,
         bot: Bot,
+        telegram_sender: TelegramSender,
         table: Table,
         sfn_client: SFNClient,
         state_machine_arn: str,
-        lock_client: DynamoDBLockClient,
+        cleanup_state_machine_arn: str,
         score_repository: ScoreRepository,
-        callback_repository: CallbackRepository,
         game_info_repository: GameInfoRepository,
         question_message_repository: QuestionMessageRepository,
     ):
         self.chat_id = chat_id
         self.bot = bot
+        self.telegram_sender = telegram_sender
         self.table = table
         self.sfn_client = sfn_client
         self.state_machine_arn = state_machine_arn
-        self.lock_client = lock_client
+        self.cleanup_state_machine_arn = cleanup_state_machine_arn
         self.score_repository = score_repository
-        self.callback_repository = callback_repository
         self.game_info_repository = game_info_repository
         self.question_message_repository = question_message_repository
 
+    @flushes_telegram_sender
     def start_game(self, trigger_message_id: str = None):
-        gamestate_lock_name = f"chat.{self.chat_id}.gamestate"
-        with self.lock_client.acquire_lock(
-            gamestate_lock_name, raise_context_exception=True
-        ):
-            current_game_state = self.game_info_repository.get(self.chat_id)
-            if current_game_state.game_state == GameInfo.GameState.RUNNING:
-                self.bot.send_message(
+        current_game_info = self.game_info_repository.get(self.chat_id)
+        while True:
+            if current_game_info.game_state == GameInfo.GameState.RUNNING:
+                self.telegram_sender.send_later(
+                    "send_message",
                     text="A game is already in progress!",
                     reply_to_message_id=trigger_message_id,
                     chat_id=self.chat_id,
                 )
                 return
-            elif current_game_state.game_state == GameInfo.GameState.CLEANING_UP:
-                self.bot.send_message(
+            elif current_game_info.game_state == GameInfo.GameState.CLEANING_UP:
+                if (
+                    datetime.now(timezone.utc) - current_game_info.ended_at
+                ).total_seconds() > CLEANUP_RESUME_AFTER_SECONDS:
+                    # cleaning up is idempotent, whatever the last attempt got through
+                    # is skipped
+                    self.start_cleanup()
+                self.telegram_sender.send_later(
+                    "send_message",
                     text="Cleaning up the last game session, please wait a few seconds before trying again",
                     chat_id=self.chat_id,
                     reply_to_message_id=trigger_message_id,
                 )
                 return
-            else:
-                current_game_state.game_state = GameInfo.GameState.RUNNING
-                self.bot.send_message(text="Starting game!", chat_id=self.chat_id)
-                response = self.sfn_client.start_execution(
-                    stateMachineArn=self.state_machine_arn,
-                    input=json.dumps({"chat_id": self.chat_id}),
-                )
-                current_game_state.step_function_execution_arn = response[
-                    "executionArn"
-                ]
-                self.game_info_repository.put(current_game_state)
+            current_game_info.game_state = GameInfo.GameState.RUNNING
+            current_game_info.started_at = datetime.now(timezone.utc)
+            transition = self.game_info_repository.transition(current_game_info)
+            if transition.applied:
+                break
+            # started or ended by a concurrent command
+            current_game_info = transition.game_info
+        self.telegram_sender.send_later(
+            "send_message",
+            ordering_key=self.chat_id,
+            text="Starting game!",
+            chat_id=self.chat_id,
+        )
+        # the game is only started once it is ours, and its execution recorded after
+        response = self.sfn_client.start_execution(
+            stateMachineArn=self.state_machine_arn,
+            input=json.dumps({"chat_id": self.chat_id}),
+        )
+        current_game_info = transition.game_info
+        current_game_info.step_function_execution_arn = response["executionArn"]
+        if not self.game_info_repository.transition(current_game_info).applied:
+            # the game was ended before its execution could be recorded, and so
+            # could not be stopped with it
+            self.sfn_client.stop_execution(
+                executionArn=response["executionArn"],
+                error="GameEnded",
+                cause="The game ended as it was starting",
+            )
 
+    @flushes_telegram_sender
     def end_game(self):
-        gamestate_lock_name = f"chat.{self.chat_id}.gamestate"
-        with self.lock_client.acquire_lock(
-            gamestate_lock_name, raise_context_exception=True
-        ):
-            current_game_info = self.game_info_repository.get(self.chat_id)
-            if current_game_info.game_state != GameInfo.GameState.RUNNING:
-                raise ValueError("Game is not running")
-            # decide winners
-            self.announce_winners()
-            self.question_message_repository.cleanup_questions(chat_id=self.chat_id)
-            self.score_repository.commit_to_global_scoreboard(chat_id=self.chat_id)
-            self.callback_repository.delete(chat_id=self.chat_id)
-            # update game state
-            current_game_info.game_state = GameInfo.GameState.IDLE
-            current_game_info.step_function_execution_arn = None
-            self.game_info_repository.put(current_game_info)
-            # say goodbye
-            self.bot.send_message(
-                text="Thank you for playing. Please contribute trivia questions on our github if you can! It's as simple as editing a Python file. https://github.com/OpenSUTD/sutd-trivia-bot",
-                chat_id=self.chat_id,
-            )
+        current_game_info = self.game_info_repository.get(self.chat_id)
+        if self.finish_game(current_game_info) is None:
+            raise ValueError("Game is not running")
+        # say goodbye
+        self.telegram_sender.send_later(
+            "send_message",
+            ordering_key=self.chat_id,
+            text="Thank you for playing. Please contribute trivia questions on our github if you can! It's as simple as editing a Python file. https://github.com/OpenSUTD/sutd-trivia-bot",
+            chat_id=self.chat_id,
+        )
 
+    @flushes_telegram_sender
     def force_end_game(self, trigger_message_id: str):
-        gamestate_lock_name = f"chat.{self.chat_id}.gamestate"
-        with self.lock_client.acquire_lock(
-            gamestate_lock_name, raise_context_exception=True
-        ):
-            current_game_info = self.game_info_repository.get(self.chat_id)
-            if current_game_info.game_state != GameInfo.GameState.RUNNING:
-                self.bot.send_message(
-                    text="No game in progress!",
-                    reply_to_message_id=trigger_message_id,
-                    chat_id=self.chat_id,
-                )
-                return
-            # terminate existing step functions
+        current_game_info = self.game_info_repository.get(self.chat_id)
+        running_game_info = self.finish_game(current_game_info)
+        if running_game_info is None:
+            self.telegram_sender.send_later(
+                "send_message",
+                text="No game in progress!",
+                reply_to_message_id=trigger_message_id,
+                chat_id=self.chat_id,
+            )
+            return
+        # terminate existing step functions, unless the game has only just started
+        # and stops its own, see start_game
+        if running_game_info.step_function_execution_arn is not None:
             self.sfn_client.stop_execution(
-                executionArn=current_game_info.step_function_execution_arn
+                executionArn=running_game_info.step_function_execution_arn
             )
-            # terminate question step function
-            current_active_question = self.question_message_repository.get_current_active_question(
-                chat_id=self.chat_id
+        # terminate question step function
+        current_active_question = self.question_message_repository.get_current_active_question(
+            chat_id=self.chat_id
+        )
+        if current_active_question is not None:
+            current_question_step_function_execution_arn = (
+                current_active_question.step_function_execution_arn
             )
-            if current_active_question is not None:
-                current_question_step_function_execution_arn = (
-                    current_active_question.step_function_execution_arn
-                )
-                self.sfn_client.stop_execution(
-                    executionArn=current_question_step_function_execution_arn,
-                    error="GameEnded",
-                    cause="The user requested the game to end early",
-                )
-            # decide winners
-            self.announce_winners()
-            self.question_message_repository.cleanup_questions(chat_id=self.chat_id)
-            self.score_repository.commit_to_global_scoreboard(chat_id=self.chat_id)
-            self.callback_repository.delete(chat_id=self.chat_id)
-            # update game state
-            current_game_info.game_state = GameInfo.GameState.IDLE
+            self.sfn_client.stop_execution(
+                executionArn=current_question_step_function_execution_arn,
+                error="GameEnded",
+                cause="The user requested the game to end early",
+            )
+            # the stopped question is never failed, and would otherwise stay
+            # the chat's active question until it expires
+            self.question_message_repository.mark_as_inactive(
+                chat_id=self.chat_id, message_id=current_active_question.message_id
+            )
+
+    def finish_game(self, current_game_info: GameInfo) -> Optional[GameInfo]:
+        """
+        The part of ending a game that players wait for: the chat is left CLEANING_UP,
+        for clean_up() to finish in the background, and the winners are announced.
+        Returns the game info as it was while running, or None if the game is not
+        running.
+        """
+        while current_game_info.game_state == GameInfo.GameState.RUNNING:
+            running_game_info = current_game_info.copy()
+            current_game_info.game_state = GameInfo.GameState.CLEANING_UP
             current_game_info.step_function_execution_arn = None
-            self.game_info_repository.put(current_game_info)
+            current_game_info.ended_at = datetime.now(timezone.utc)
+            transition = self.game_info_repository.transition(current_game_info)
+            if transition.applied:
+                # decide winners, the announcement is sent while the rest goes on
+                self.announce_winners()
+                self.start_cleanup()
+                return running_game_info
+            # ended by a concurrent command, or its execution recorded
+            current_game_info = transition.game_info
+        return None
+
+    def start_cleanup(self):
+        self.sfn_client.start_execution(
+            stateMachineArn=self.cleanup_state_machine_arn,
+            input=json.dumps({"chat_id": self.chat_id}),
+        )
+
+    def clean_up(self):
+        """
+        The deferred part of ending a game: the scores are committed to the global
+        scoreboard and the chat goes back to IDLE. Every step can be run again, so a
+        cleanup that failed halfway is retried from the start, see
+        quizzer/cleanup_flow/statemachine.asl.json.
+        """
+        current_game_info = self.game_info_repository.get(self.chat_id)
+        if current_game_info.game_state != GameInfo.GameState.CLEANING_UP:
+            # cleaned up by an earlier attempt
+            return
+        # question messages and callbacks are left to expire, answers to them are
+        # refused once the game is no longer running
+        self.score_repository.commit_to_global_scoreboard(
+            chat_id=self.chat_id,
+            game_ended_at=int(current_game_info.ended_at.timestamp()),
+        )
+        ended_at = current_game_info.ended_at
+        # unless a concurrent attempt gets there first, and another game has ended
+        # since with scores of its own to commit
+        while (
+            current_game_info.game_state == GameInfo.GameState.CLEANING_UP
+            and current_game_info.ended_at == ended_at
+        ):
+            current_game_info.game_state = GameInfo.GameState.IDLE
+            current_game_info.started_at = None
+            current_game_info.ended_at = None
+            current_game_info = self.game_info_repository.transition(
+                current_game_info
+            ).game_info
 
     def announce_winners(self):
         players = self.score_repository.get_local_top_players(
@@ -471,9 +718,14 @@ class GameMaster:
             elif i == 2:
                 message_lines.append(f"🥉 {player.score} points: {player_name}")
             else:
-                message_lines.append(f"{player.score} points: player_name")
+                message_lines.append(f"{player.score} points: {player_name}")
         message_lines.append("\nOnly top 10 players shown")
-        self.bot.send_message(text="\n".join(message_lines), chat_id=self.chat_id)
+        self.telegram_sender.send_later(
+            "send_message",
+            ordering_key=self.chat_id,
+            text="\n".join(message_lines),
+            chat_id=self.chat_id,
+        )
 
 
 class GameMasterFactory:
@@ -481,22 +733,22 @@ class GameMasterFactory:
     def __init__(
         self,
         bot: Bot,
+        telegram_sender: TelegramSender,
         table: Table,
         sfn_client: SFNClient,
         state_machine_arn: str,
-        lock_client: DynamoDBLockClient,
+        cleanup_state_machine_arn: str,
         score_repository: ScoreRepository,
-        callback_repository: CallbackRepository,
         game_info_repository: GameInfoRepository,
         question_message_repository: QuestionMessageRepository,
     ):
         self.bot = bot
+        self.telegram_sender = telegram_sender
         self.table = table
         self.sfn_client = sfn_client
         self.state_machine_arn = state_machine_arn
-        self.lock_client = lock_client
+        self.cleanup_state_machine_arn = cleanup_state_machine_arn
         self.score_repository = score_repository
-        self.callback_repository = callback_repository
         self.game_info_repository = game_info_repository
         self.question_message_repository = question_message_repository
 
@@ -504,12 +756,100 @@ class GameMasterFactory:
         return GameMaster(
             chat_id=chat_id,
             bot=self.bot,
+            telegram_sender=self.telegram_sender,
             table=self.table,
             sfn_client=self.sfn_client,
             state_machine_arn=self.state_machine_arn,
-            lock_client=self.lock_client,
+            cleanup_state_machine_arn=self.cleanup_state_machine_arn,
             score_repository=self.score_repository,
-            callback_repository=self.callback_repository,
             game_info_repository=self.game_info_repository,
             question_message_repository=self.question_message_repository,
         )
+
+
+# https://stackoverflow.com/a/4322940
+def weighted_choice(choices):
+    values, weights = zip(*choices)
+    total = 0
+    cum_weights = []
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+    x = random() * total
+    i = bisect(cum_weights, x)
+    return values[i]
+
+
+class Intermission:
+    """
+    What is said between questions, if anything
+    """
+
+    @pinject.inject()
+    def __init__(self, bot: Bot, score_repository: ScoreRepository):
+        self.bot = bot
+        self.score_repository = score_repository
+
+    def run(self, chat_id: str, delay_seconds: int = 0) -> int:
+        """
+        Returns how long to pause before the next question, delay_seconds less the
+        whole seconds spent posting here
+        """
+        started = time.monotonic()
+        choice = weighted_choice(
+            [("PR", 2), ("LOCAL_SCORE", 2), ("GLOBAL_SCORE", 1), ("NOTHING", 8)]
+        )
+        if choice == "PR":
+            self.bot.send_message(
+                text="Did you know? You can contribute your own trivia questions! Just open a pull request on github here: https://github.com/OpenSUTD/sutd-trivia-bot",
+                chat_id=chat_id,
+            )
+        elif choice == "LOCAL_SCORE":
+            # show local scoreboards
+            top_players = self.score_repository.get_local_top_players(
+                chat_id=chat_id, count=10
+            )
+            message_header = "Current Scoreboard:\n"
+            message_lines = [message_header]
+            for i, player in enumerate(top_players):
+                player_name = (
+                    player.user_data.get("first_name")
+                    or player.user_data.get("last_name")
+                    or player.user_data.get("username")
+                )
+                if i == 0:
+                    message_lines.append(f"🥇 {player.score} points: {player_name}")
+                elif i == 1:
+                    message_lines.append(f"🥈 {player.score} points: {player_name}")
+                elif i == 2:
+                    message_lines.append(f"🥉 {player.score} points: {player_name}")
+                else:
+                    message_lines.append(f"{player.score} points: {player_name}")
+            message_lines.append("\nOnly top 10 players shown")
+            self.bot.send_message(text="\n".join(message_lines), chat_id=chat_id)
+        elif choice == "GLOBAL_SCORE":
+            # show global scoreboards
+            top_players = self.score_repository.get_global_top_players(count=10)
+            message_header = "Top players of all time:\n"
+            message_lines = [message_header]
+            for i, player in enumerate(top_players):
+                player_name = (
+                    player.user_data.get("first_name")
+                    or player.user_data.get("last_name")
+                    or player.user_data.get("username")
+                )
+                if i == 0:
+                    message_lines.append(f"🥇 {player.score} points: {player_name}")
+                elif i == 1:
+                    message_lines.append(f"🥈 {player.score} points: {player_name}")
+                elif i == 2:
+                    message_lines.append(f"🥉 {player.score} points: {player_name}")
+                else:
+                    message_lines.append(f"{player.score} points: {player_name}")
+            message_lines.append("\nOnly top 10 players shown")
+            self.bot.send_message(text="\n".join(message_lines), chat_id=chat_id)
+        elif choice == "NOTHING":
+            pass
+        else:
+            raise ValueError("Unexpected choice value")
+        return max(0, delay_seconds - int(time.monotonic() - started))
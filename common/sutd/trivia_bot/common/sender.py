@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+    from typing import Optional, List, Tuple, Dict, Hashable, Iterable
+    from telegram.bot import Bot
+
+logger = logging.getLogger()
+
+TELEGRAM_SENDER_WORKERS = 4
+# a few spare connections for calls made on the bot directly
+TELEGRAM_CONNECTION_POOL_SIZE = TELEGRAM_SENDER_WORKERS + 4
+
+
+class TelegramSender:
+    """
+    Makes Bot API calls from a small thread pool, so that independent calls run
+    concurrently over the bot's keep-alive connection pool.
+
+    Calls that share an ordering_key (usually the chat id) are made one after the
+    other, in the order they were submitted. Whatever a thread submits is waited for
+    by its next flush(), which handlers call before returning. A call can also be made
+    to wait for calls submitted before it, by passing their futures as `after`.
+    """
+
+    def __init__(self, bot: Bot, max_workers: int = TELEGRAM_SENDER_WORKERS):
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="telegram-sender"
+        )
+        self.lock = threading.Lock()
+        self.last_by_ordering_key: Dict[Hashable, Future] = dict()
+        self.local = threading.local()
+
+    def __pending(self) -> List[Tuple[str, Future]]:
+        if not hasattr(self.local, "pending"):
+            self.local.pending = []
+        return self.local.pending
+
+    def __call(self, method: str, waits_for: List[Future], kwargs: dict):
+        # only ever earlier submissions, which the pool picks up first
+        wait(waits_for)
+        _start = time.perf_counter()
+        try:
+            return getattr(self.bot, method)(**kwargs)
+        finally:
+            _end = time.perf_counter()
+            logger.info(f"Telegram {method} took {(_end - _start) * 1000:.1f} ms")
+
+    def submit(
+        self,
+        method: str,
+        ordering_key: Optional[Hashable] = None,
+        after: Iterable[Future] = (),
+        **kwargs,
+    ) -> Future:
+        with self.lock:
+            waits_for = list(after)
+            if ordering_key in self.last_by_ordering_key:
+                waits_for.append(self.last_by_ordering_key[ordering_key])
+            future = self.executor.submit(self.__call, method, waits_for, kwargs)
+            if ordering_key is not None:
+                self.last_by_ordering_key[ordering_key] = future
+        if ordering_key is not None:
+            # outside the lock, the callback runs right away if the call is done
+            future.add_done_callback(lambda f: self.__forget(ordering_key, f))
+        self.__pending().append((method, future))
+        return future
+
+    def __forget(self, ordering_key: Hashable, future: Future):
+        with self.lock:
+            if self.last_by_ordering_key.get(ordering_key) is future:
+                del self.last_by_ordering_key[ordering_key]
+
+    def send_later(
+        self,
+        method: str,
+        ordering_key: Optional[Hashable] = None,
+        after: Iterable[Future] = (),
+        **kwargs,
+    ):
+        """
+        Fire and forget, any error is raised by the next flush()
+        """
+        self.submit(method, ordering_key=ordering_key, after=after, **kwargs)
+
+    def flush(self):
+        pending = self.__pending()
+        self.local.pending = []
+        errors = []
+        for method, future in pending:
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Telegram {method} failed: {error}")
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+
+def flushes_telegram_sender(method):
+    """
+    Waits for everything the method queued on self.telegram_sender before returning
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.telegram_sender.flush()
+
+    return wrapper
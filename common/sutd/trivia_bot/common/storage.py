@@ -0,0 +1,1251 @@
+"""
+An in-memory stand in for the DynamoDB game table and lock table.
+
+The repositories in database.py talk to a boto3 Table resource. InMemoryTable implements
+the part of that interface they use, including its client's batch_get_item,
+transact_write_items and update_item, and evaluates condition, key, filter, projection
+and update expressions itself. Failed conditions and transactions raise the same
+ClientError codes DynamoDB does, so the repositories cannot tell the difference.
+
+Every operation takes a single table wide lock, which is plenty for load tests and
+simulations. Select it with STORAGE_ENGINE=memory.
+
+By default a transaction is applied the moment it is made, so it can never conflict
+with anything. Given a transaction_latency (STORAGE_TRANSACTION_LATENCY_MS from the
+bindings), a transaction stays pending for that long after its conditions pass, and
+like on DynamoDB a write to one of its items meanwhile fails with
+TransactionConflictException, or cancels another transaction with a
+TransactionConflict reason.
+"""
+from __future__ import annotations
+
+import copy
+import functools
+import re
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from python_dynamodb_lock.python_dynamodb_lock import DynamoDBLockError
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, List, Dict, Tuple, Any, Iterable
+    from datetime import timedelta
+
+# index name -> (hash key, range key), as in template.yaml
+GAME_TABLE_INDEXES = {
+    "ScoreBoard": ("pk", "score"),
+    "CurrentActiveQuestion": ("pk", "gsi_current_active_question"),
+    "CallbacksByQuestionId": ("pk", "gsi_callback_question_id"),
+}
+DEFAULT_LOCK_TIMEOUT_SECONDS = 20
+
+SERIALIZER = TypeSerializer()
+TOKEN = re.compile(
+    r"\s*(?:(?P<number>\d+)|(?P<name>[#:]?[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op><>|<=|>=|[=<>(),.\[\]+\-]))"
+)
+
+
+def client_error(code: str, message: str, operation: str, **extra) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}, **extra}, operation)
+
+
+def validation_error(message: str, operation: str) -> ClientError:
+    return client_error("ValidationException", message, operation)
+
+
+def to_stored(value, path: str = ""):
+    """
+    Copies a value the way DynamoDB would store it, numbers become Decimal
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, float):
+        raise TypeError(f"Float types are not supported. Use Decimal types instead. {path}")
+    if isinstance(value, (int, Decimal)):
+        return Decimal(value)
+    if isinstance(value, dict):
+        return {k: to_stored(v, f"{path}.{k}") for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_stored(v, path) for v in value]
+    if isinstance(value, (set, frozenset)):
+        if len(value) == 0:
+            raise validation_error(f"A set may not be empty {path}", "PutItem")
+        return {to_stored(v, path) for v in value}
+    raise TypeError(f"Unsupported type {type(value)} for value {value} {path}")
+
+
+# expressions are parsed into nested tuples, ("op", *operands), and cached by text
+
+
+def tokenize(expression: str) -> List[str]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise validation_error(
+                f"Invalid expression: unexpected token at {expression[position:]}",
+                "Expression",
+            )
+        tokens.append(match.group(match.lastgroup))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    COMPARATORS = {"=", "<>", "<", "<=", ">", ">="}
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Optional[str]:
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return None
+
+    def peek_keyword(self) -> Optional[str]:
+        token = self.peek()
+        return token.upper() if token is not None else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (
+            expected is not None and token.upper() != expected.upper()
+        ):
+            raise validation_error(
+                f"Invalid expression: expected {expected} in {self.expression}",
+                "Expression",
+            )
+        self.position += 1
+        return token
+
+    def done(self):
+        if self.peek() is not None:
+            raise validation_error(
+                f"Invalid expression: unexpected {self.peek()} in {self.expression}",
+                "Expression",
+            )
+
+    def path(self) -> tuple:
+        elements = [self.take()]
+        while self.peek() in (".", "["):
+            if self.take() == ".":
+                elements.append(self.take())
+            else:
+                elements.append(int(self.take()))
+                self.take("]")
+        return ("path", tuple(elements))
+
+    def operand(self) -> tuple:
+        token = self.peek()
+        if token.startswith(":"):
+            return ("value", self.take())
+        if token.lower() in ("if_not_exists", "list_append", "size") and self.peek(
+            1
+        ) == "(":
+            function = self.take().lower()
+            self.take("(")
+            arguments = [self.set_value() if function != "size" else self.path()]
+            while self.peek() == ",":
+                self.take(",")
+                arguments.append(self.set_value())
+            self.take(")")
+            return (function, *arguments)
+        return self.path()
+
+    # conditions
+
+    def condition(self) -> tuple:
+        node = self.conjunction()
+        while self.peek_keyword() == "OR":
+            self.take()
+            node = ("or", node, self.conjunction())
+        return node
+
+    def conjunction(self) -> tuple:
+        node = self.negation()
+        while self.peek_keyword() == "AND":
+            self.take()
+            node = ("and", node, self.negation())
+        return node
+
+    def negation(self) -> tuple:
+        if self.peek_keyword() == "NOT":
+            self.take()
+            return ("not", self.negation())
+        return self.predicate()
+
+    def predicate(self) -> tuple:
+        if self.peek() == "(":
+            self.take("(")
+            node = self.condition()
+            self.take(")")
+            return node
+        function = (self.peek() or "").lower()
+        if function in (
+            "attribute_exists",
+            "attribute_not_exists",
+            "attribute_type",
+            "begins_with",
+            "contains",
+        ):
+            self.take()
+            self.take("(")
+            arguments = [self.path()]
+            while self.peek() == ",":
+                self.take(",")
+                arguments.append(self.operand())
+            self.take(")")
+            return (function, *arguments)
+        left = self.operand()
+        keyword = self.peek_keyword()
+        if keyword == "BETWEEN":
+            self.take()
+            low = self.operand()
+            self.take("AND")
+            return ("between", left, low, self.operand())
+        if keyword == "IN":
+            self.take()
+            self.take("(")
+            options = [self.operand()]
+            while self.peek() == ",":
+                self.take(",")
+                options.append(self.operand())
+            self.take(")")
+            return ("in", left, *options)
+        comparator = self.take()
+        if comparator not in self.COMPARATORS:
+            raise validation_error(
+                f"Invalid expression: unknown comparator {comparator}", "Expression"
+            )
+        return (comparator, left, self.operand())
+
+    # updates
+
+    def set_value(self) -> tuple:
+        node = self.operand()
+        if self.peek() in ("+", "-"):
+            operator = self.take()
+            node = (operator, node, self.operand())
+        return node
+
+    def update(self) -> List[tuple]:
+        actions = []
+        while self.peek() is not None:
+            clause = self.take().upper()
+            if clause not in ("SET", "REMOVE", "ADD", "DELETE"):
+                raise validation_error(
+                    f"Invalid UpdateExpression: unknown clause {clause}", "UpdateItem"
+                )
+            while True:
+                path = self.path()
+                if clause == "SET":
+                    self.take("=")
+                    actions.append(("set", path, self.set_value()))
+                elif clause == "REMOVE":
+                    actions.append(("remove", path))
+                else:
+                    actions.append((clause.lower(), path, self.operand()))
+                if self.peek() != ",":
+                    break
+                self.take(",")
+        return actions
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_condition(expression: str) -> tuple:
+    parser = Parser(expression)
+    node = parser.condition()
+    parser.done()
+    return node
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_update(expression: str) -> List[tuple]:
+    return Parser(expression).update()
+
+
+@functools.lru_cache(maxsize=256)
+def parse_projection(expression: str) -> List[tuple]:
+    parser = Parser(expression)
+    paths = [parser.path()]
+    while parser.peek() == ",":
+        parser.take(",")
+        paths.append(parser.path())
+    parser.done()
+    return paths
+
+
+class Missing:
+    pass
+
+
+MISSING = Missing()
+
+
+class Evaluator:
+    """
+    Evaluates parsed expressions against an item, resolving #names and :values
+    """
+
+    def __init__(self, names: Optional[dict], values: Optional[dict], operation: str):
+        self.names = names or dict()
+        self.values = {k: to_stored(v) for k, v in (values or dict()).items()}
+        self.operation = operation
+
+    def name(self, element):
+        if isinstance(element, str) and element.startswith("#"):
+            if element not in self.names:
+                raise validation_error(
+                    f"An expression attribute name used in the document path is not defined; attribute name: {element}",
+                    self.operation,
+                )
+            return self.names[element]
+        return element
+
+    def resolve(self, item: dict, path: tuple):
+        value = item
+        for element in path[1]:
+            element = self.name(element)
+            if isinstance(element, int):
+                if not isinstance(value, list) or element >= len(value):
+                    return MISSING
+            elif not isinstance(value, dict) or element not in value:
+                return MISSING
+            value = value[element]
+        return value
+
+    def value(self, item: dict, node: tuple):
+        kind = node[0]
+        if kind == "value":
+            if node[1] not in self.values:
+                raise validation_error(
+                    f"An expression attribute value used in expression is not defined; attribute value: {node[1]}",
+                    self.operation,
+                )
+            return self.values[node[1]]
+        if kind == "path":
+            return self.resolve(item, node)
+        if kind == "size":
+            value = self.resolve(item, node[1])
+            return MISSING if value is MISSING else Decimal(len(value))
+        if kind == "if_not_exists":
+            value = self.resolve(item, node[1])
+            return self.value(item, node[2]) if value is MISSING else value
+        if kind == "list_append":
+            return list(self.value(item, node[1])) + list(self.value(item, node[2]))
+        if kind in ("+", "-"):
+            left, right = self.value(item, node[1]), self.value(item, node[2])
+            if not isinstance(left, Decimal) or not isinstance(right, Decimal):
+                raise validation_error(
+                    "An operand in the update expression has an incorrect data type",
+                    self.operation,
+                )
+            return left + right if kind == "+" else left - right
+        raise validation_error(f"Unsupported operand {kind}", self.operation)
+
+    @staticmethod
+    def comparable(left, right) -> bool:
+        if isinstance(left, bool) or isinstance(right, bool):
+            return isinstance(left, bool) and isinstance(right, bool)
+        return type(left) is type(right) or (
+            isinstance(left, (str, bytes)) and isinstance(right, (str, bytes))
+        )
+
+    def test(self, item: dict, node: tuple) -> bool:
+        kind = node[0]
+        if kind == "and":
+            return self.test(item, node[1]) and self.test(item, node[2])
+        if kind == "or":
+            return self.test(item, node[1]) or self.test(item, node[2])
+        if kind == "not":
+            return not self.test(item, node[1])
+        if kind == "attribute_exists":
+            return self.resolve(item, node[1]) is not MISSING
+        if kind == "attribute_not_exists":
+            return self.resolve(item, node[1]) is MISSING
+        if kind == "attribute_type":
+            value = self.resolve(item, node[1])
+            if value is MISSING:
+                return False
+            return SERIALIZER.serialize(value).keys() == {self.value(item, node[2])}
+        if kind == "begins_with":
+            value = self.resolve(item, node[1])
+            prefix = self.value(item, node[2])
+            return isinstance(value, (str, bytes)) and value.startswith(prefix)
+        if kind == "contains":
+            value = self.resolve(item, node[1])
+            operand = self.value(item, node[2])
+            if isinstance(value, str):
+                return isinstance(operand, str) and operand in value
+            if isinstance(value, (set, list)):
+                return operand in value
+            return False
+        if kind == "between":
+            value, low, high = (self.value(item, operand) for operand in node[1:])
+            if not (self.comparable(value, low) and self.comparable(value, high)):
+                return False
+            return low <= value <= high
+        if kind == "in":
+            value = self.value(item, node[1])
+            return value is not MISSING and any(
+                value == self.value(item, option) for option in node[2:]
+            )
+        left, right = self.value(item, node[1]), self.value(item, node[2])
+        if left is MISSING or right is MISSING:
+            return kind == "<>"
+        if not self.comparable(left, right):
+            return kind == "<>"
+        return {
+            "=": lambda: left == right,
+            "<>": lambda: left != right,
+            "<": lambda: left < right,
+            "<=": lambda: left <= right,
+            ">": lambda: left > right,
+            ">=": lambda: left >= right,
+        }[kind]()
+
+    # updates
+
+    def parent_of(self, item: dict, path: tuple):
+        container = item
+        elements = [self.name(element) for element in path[1]]
+        for element in elements[:-1]:
+            if isinstance(element, int):
+                if not isinstance(container, list) or element >= len(container):
+                    raise validation_error(
+                        "The document path provided in the update expression is invalid for update",
+                        self.operation,
+                    )
+            elif not isinstance(container, dict) or element not in container:
+                raise validation_error(
+                    "The document path provided in the update expression is invalid for update",
+                    self.operation,
+                )
+            container = container[element]
+        return container, elements[-1]
+
+    def apply(self, item: dict, actions: List[tuple]) -> set:
+        """
+        Applies the update actions to the item in place, returning the top level
+        attributes that were touched
+        """
+        # every operand is read from the item as it was before the update
+        original = copy.deepcopy(item)
+        updated = set()
+        for action in actions:
+            kind, path = action[0], action[1]
+            top_level = self.name(path[1][0])
+            updated.add(top_level)
+            if kind == "set":
+                value = copy.deepcopy(self.value(original, action[2]))
+                container, element = self.parent_of(item, path)
+                if isinstance(element, int) and element >= len(container):
+                    container.append(value)
+                else:
+                    container[element] = value
+            elif kind == "remove":
+                try:
+                    container, element = self.parent_of(item, path)
+                except ClientError:
+                    continue
+                if isinstance(element, int):
+                    if element < len(container):
+                        del container[element]
+                else:
+                    container.pop(element, None)
+            elif kind == "add":
+                operand = self.value(original, action[2])
+                container, element = self.parent_of(item, path)
+                current = container.get(element, MISSING)
+                if isinstance(operand, Decimal):
+                    if current is MISSING:
+                        current = Decimal(0)
+                    if not isinstance(current, Decimal):
+                        raise validation_error(
+                            "An operand in the update expression has an incorrect data type",
+                            self.operation,
+                        )
+                    container[element] = current + operand
+                elif isinstance(operand, set):
+                    if current is MISSING:
+                        current = set()
+                    if not isinstance(current, set):
+                        raise validation_error(
+                            "An operand in the update expression has an incorrect data type",
+                            self.operation,
+                        )
+                    container[element] = current | operand
+                else:
+                    raise validation_error(
+                        "Incorrect operand type for operator or function; operator: ADD",
+                        self.operation,
+                    )
+            elif kind == "delete":
+                operand = self.value(original, action[2])
+                container, element = self.parent_of(item, path)
+                current = container.get(element, MISSING)
+                if current is MISSING:
+                    continue
+                remaining = current - operand
+                if remaining:
+                    container[element] = remaining
+                else:
+                    # sets cannot be empty, so the attribute goes away
+                    del container[element]
+        return updated
+
+
+def project(item: dict, expression: Optional[str], names: Optional[dict]) -> dict:
+    if expression is None:
+        return item
+    evaluator = Evaluator(names, None, "Projection")
+    projected = dict()
+    for path in parse_projection(expression):
+        value = evaluator.resolve(item, path)
+        if value is MISSING:
+            continue
+        elements = [evaluator.name(element) for element in path[1]]
+        container = projected
+        for element in elements[:-1]:
+            container = container.setdefault(element, dict())
+        container[elements[-1]] = value
+    return projected
+
+
+def build_condition(
+    condition, names: Optional[dict], values: Optional[dict], is_key_condition: bool
+) -> Tuple[str, dict, dict]:
+    """
+    Turns boto3 condition objects into expression text, like the resource does
+    """
+    names = dict(names or dict())
+    values = dict(values or dict())
+    if isinstance(condition, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(
+            condition, is_key_condition=is_key_condition
+        )
+        names.update(built.attribute_name_placeholders)
+        values.update(built.attribute_value_placeholders)
+        condition = built.condition_expression
+    return condition, names, values
+
+
+class InMemoryBatchWriter:
+    def __init__(self, table: InMemoryTable):
+        self.table = table
+
+    def put_item(self, Item: dict):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key: dict):
+        self.table.delete_item(Key=Key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class InMemoryClient:
+    """
+    The low level client calls made through table.meta.client, taking and returning
+    native types like a client obtained from a boto3 resource
+    """
+
+    def __init__(self, table: InMemoryTable):
+        self.table = table
+
+    def __table(self, table_name: str, operation: str) -> InMemoryTable:
+        if table_name != self.table.name:
+            raise client_error(
+                "ResourceNotFoundException",
+                f"Requested resource not found: Table: {table_name} not found",
+                operation,
+            )
+        return self.table
+
+    def get_item(self, TableName: str, **kwargs) -> dict:
+        return self.__table(TableName, "GetItem").get_item(**kwargs)
+
+    def put_item(self, TableName: str, **kwargs) -> dict:
+        return self.__table(TableName, "PutItem").put_item(**kwargs)
+
+    def update_item(self, TableName: str, **kwargs) -> dict:
+        return self.__table(TableName, "UpdateItem").update_item(**kwargs)
+
+    def delete_item(self, TableName: str, **kwargs) -> dict:
+        return self.__table(TableName, "DeleteItem").delete_item(**kwargs)
+
+    def query(self, TableName: str, **kwargs) -> dict:
+        return self.__table(TableName, "Query").query(**kwargs)
+
+    def batch_get_item(self, RequestItems: dict) -> dict:
+        responses = dict()
+        for table_name, request in RequestItems.items():
+            table = self.__table(table_name, "BatchGetItem")
+            responses[table_name] = [
+                response["Item"]
+                for response in (
+                    table.get_item(
+                        Key=key,
+                        ProjectionExpression=request.get("ProjectionExpression"),
+                        ExpressionAttributeNames=request.get(
+                            "ExpressionAttributeNames"
+                        ),
+                    )
+                    for key in request["Keys"]
+                )
+                if "Item" in response
+            ]
+        return {"Responses": responses, "UnprocessedKeys": dict()}
+
+    def transact_write_items(self, TransactItems: List[dict], **kwargs) -> dict:
+        return self.table.transact_write_items(
+            [
+                (
+                    kind,
+                    self.__table(request["TableName"], "TransactWriteItems"),
+                    request,
+                )
+                for transact_item in TransactItems
+                for kind, request in transact_item.items()
+            ]
+        )
+
+
+class InMemoryTableMeta:
+    def __init__(self, client: InMemoryClient):
+        self.client = client
+
+
+class InMemoryTable:
+    """
+    Implements the parts of the boto3 Table resource that the repositories use
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hash_key: str = "pk",
+        range_key: Optional[str] = "sk",
+        indexes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+        transaction_latency: float = 0.0,
+    ):
+        self.name = self.table_name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes if indexes is not None else dict()
+        self.lock = threading.RLock()
+        # hash key value -> range key value -> item
+        self.partitions: Dict[Any, Dict[Any, dict]] = dict()
+        self.meta = InMemoryTableMeta(InMemoryClient(self))
+        self.transaction_latency = transaction_latency
+        # keys of items written by transactions that are still pending
+        self.in_transaction: Counter = Counter()
+
+    # helpers
+
+    def key_schema(self, index_name: Optional[str]) -> Tuple[str, Optional[str]]:
+        if index_name is None:
+            return self.hash_key, self.range_key
+        if index_name not in self.indexes:
+            raise validation_error(
+                f"The table does not have the specified index: {index_name}", "Query"
+            )
+        return self.indexes[index_name]
+
+    def key_of(self, key: dict, operation: str) -> Tuple[Any, Any]:
+        expected = {self.hash_key} | ({self.range_key} if self.range_key else set())
+        if set(key.keys()) != expected:
+            raise validation_error(
+                "The provided key element does not match the schema", operation
+            )
+        return (
+            to_stored(key[self.hash_key]),
+            to_stored(key[self.range_key]) if self.range_key else None,
+        )
+
+    def find(self, key: Tuple[Any, Any]) -> Optional[dict]:
+        return self.partitions.get(key[0], dict()).get(key[1])
+
+    def store(self, key: Tuple[Any, Any], item: Optional[dict]):
+        if item is None:
+            partition = self.partitions.get(key[0], dict())
+            partition.pop(key[1], None)
+            if not partition:
+                self.partitions.pop(key[0], None)
+        else:
+            self.partitions.setdefault(key[0], dict())[key[1]] = item
+
+    def check_not_in_transaction(self, key: Tuple[Any, Any], operation: str):
+        if self.in_transaction[key]:
+            raise client_error(
+                "TransactionConflictException",
+                "Transaction is ongoing for the item",
+                operation,
+            )
+
+    def check_condition(
+        self,
+        item: Optional[dict],
+        condition,
+        names: Optional[dict],
+        values: Optional[dict],
+        operation: str,
+    ) -> bool:
+        if condition is None:
+            return True
+        expression, names, values = build_condition(
+            condition, names, values, is_key_condition=False
+        )
+        return Evaluator(names, values, operation).test(
+            item or dict(), parse_condition(expression)
+        )
+
+    @staticmethod
+    def returned(item: Optional[dict], attributes: Optional[Iterable[str]] = None):
+        if not item:
+            return dict()
+        if attributes is not None:
+            item = {k: v for k, v in item.items() if k in attributes}
+            if not item:
+                return dict()
+        return {"Attributes": copy.deepcopy(item)}
+
+    def updated_item(
+        self,
+        key: Tuple[Any, Any],
+        raw_key: dict,
+        old: Optional[dict],
+        UpdateExpression: str,
+        names: Optional[dict],
+        values: Optional[dict],
+    ) -> Tuple[dict, set]:
+        new = copy.deepcopy(old) if old is not None else to_stored(dict(raw_key))
+        updated = Evaluator(names, values, "UpdateItem").apply(
+            new, parse_update(UpdateExpression)
+        )
+        if self.key_of(
+            {self.hash_key: new.get(self.hash_key), self.range_key: new.get(self.range_key)}
+            if self.range_key
+            else {self.hash_key: new.get(self.hash_key)},
+            "UpdateItem",
+        ) != key:
+            raise validation_error(
+                "Cannot update attribute. This attribute is part of the key",
+                "UpdateItem",
+            )
+        return new, updated
+
+    # item operations
+
+    def get_item(
+        self,
+        Key: dict,
+        ConsistentRead: bool = False,
+        ProjectionExpression: Optional[str] = None,
+        ExpressionAttributeNames: Optional[dict] = None,
+    ) -> dict:
+        with self.lock:
+            item = self.find(self.key_of(Key, "GetItem"))
+            if item is None:
+                return dict()
+            return {
+                "Item": copy.deepcopy(
+                    project(item, ProjectionExpression, ExpressionAttributeNames)
+                )
+            }
+
+    def put_item(
+        self,
+        Item: dict,
+        ConditionExpression=None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ReturnValues: str = "NONE",
+    ) -> dict:
+        item = to_stored(Item)
+        key = self.key_of(
+            {k: Item.get(k) for k in (self.hash_key, self.range_key) if k},
+            "PutItem",
+        )
+        with self.lock:
+            self.check_not_in_transaction(key, "PutItem")
+            old = self.find(key)
+            if not self.check_condition(
+                old,
+                ConditionExpression,
+                ExpressionAttributeNames,
+                ExpressionAttributeValues,
+                "PutItem",
+            ):
+                raise client_error(
+                    "ConditionalCheckFailedException",
+                    "The conditional request failed",
+                    "PutItem",
+                )
+            self.store(key, item)
+            return self.returned(old) if ReturnValues == "ALL_OLD" else dict()
+
+    def update_item(
+        self,
+        Key: dict,
+        UpdateExpression: str,
+        ConditionExpression=None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ReturnValues: str = "NONE",
+    ) -> dict:
+        key = self.key_of(Key, "UpdateItem")
+        with self.lock:
+            self.check_not_in_transaction(key, "UpdateItem")
+            old = self.find(key)
+            if not self.check_condition(
+                old,
+                ConditionExpression,
+                ExpressionAttributeNames,
+                ExpressionAttributeValues,
+                "UpdateItem",
+            ):
+                raise client_error(
+                    "ConditionalCheckFailedException",
+                    "The conditional request failed",
+                    "UpdateItem",
+                )
+            new, updated = self.updated_item(
+                key,
+                Key,
+                old,
+                UpdateExpression,
+                ExpressionAttributeNames,
+                ExpressionAttributeValues,
+            )
+            self.store(key, new)
+            return {
+                "NONE": lambda: dict(),
+                "ALL_OLD": lambda: self.returned(old),
+                "ALL_NEW": lambda: self.returned(new),
+                "UPDATED_OLD": lambda: self.returned(old, updated),
+                "UPDATED_NEW": lambda: self.returned(new, updated),
+            }[ReturnValues]()
+
+    def delete_item(
+        self,
+        Key: dict,
+        ConditionExpression=None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ReturnValues: str = "NONE",
+    ) -> dict:
+        key = self.key_of(Key, "DeleteItem")
+        with self.lock:
+            self.check_not_in_transaction(key, "DeleteItem")
+            old = self.find(key)
+            if not self.check_condition(
+                old,
+                ConditionExpression,
+                ExpressionAttributeNames,
+                ExpressionAttributeValues,
+                "DeleteItem",
+            ):
+                raise client_error(
+                    "ConditionalCheckFailedException",
+                    "The conditional request failed",
+                    "DeleteItem",
+                )
+            self.store(key, None)
+            return self.returned(old) if ReturnValues == "ALL_OLD" else dict()
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[List[str]] = None):
+        return InMemoryBatchWriter(self)
+
+    # reads over many items
+
+    def candidates(self, node: tuple, hash_key: str, evaluator: Evaluator) -> Iterable[dict]:
+        # use the partition when the key condition pins the table's hash key
+        equalities = []
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if current[0] == "and":
+                pending.extend(current[1:])
+            elif current[0] == "=" and current[1][0] == "path":
+                equalities.append(current)
+        for equality in equalities:
+            if (
+                hash_key == self.hash_key
+                and evaluator.name(equality[1][1][0]) == self.hash_key
+            ):
+                return list(
+                    self.partitions.get(evaluator.value(dict(), equality[2]), dict()).values()
+                )
+        return [item for partition in self.partitions.values() for item in partition.values()]
+
+    def read_many(
+        self,
+        items: List[dict],
+        index_name: Optional[str],
+        Limit: Optional[int],
+        ExclusiveStartKey: Optional[dict],
+        FilterExpression,
+        ProjectionExpression: Optional[str],
+        names: Optional[dict],
+        values: Optional[dict],
+        operation: str,
+    ) -> dict:
+        hash_key, range_key = self.key_schema(index_name)
+
+        def position(item: dict) -> tuple:
+            return tuple(
+                item.get(k)
+                for k in (hash_key, range_key, self.hash_key, self.range_key)
+                if k
+            )
+
+        if ExclusiveStartKey is not None:
+            start = position(to_stored(ExclusiveStartKey))
+            items = items[
+                next(
+                    (i + 1 for i, item in enumerate(items) if position(item) == start),
+                    len(items),
+                ) :
+            ]
+        last_evaluated_key = None
+        if Limit is not None and len(items) > Limit:
+            items = items[:Limit]
+            last = items[-1]
+            last_evaluated_key = {
+                k: copy.deepcopy(last[k])
+                for k in {hash_key, range_key, self.hash_key, self.range_key}
+                if k
+            }
+        scanned_count = len(items)
+        if FilterExpression is not None:
+            filter_expression, names, values = build_condition(
+                FilterExpression, names, values, is_key_condition=False
+            )
+            evaluator = Evaluator(names, values, operation)
+            node = parse_condition(filter_expression)
+            items = [item for item in items if evaluator.test(item, node)]
+        response = {
+            "Items": [
+                copy.deepcopy(project(item, ProjectionExpression, names))
+                for item in items
+            ],
+            "Count": len(items),
+            "ScannedCount": scanned_count,
+        }
+        if last_evaluated_key is not None:
+            response["LastEvaluatedKey"] = last_evaluated_key
+        return response
+
+    def query(
+        self,
+        KeyConditionExpression,
+        IndexName: Optional[str] = None,
+        Limit: Optional[int] = None,
+        ScanIndexForward: bool = True,
+        ExclusiveStartKey: Optional[dict] = None,
+        FilterExpression=None,
+        ProjectionExpression: Optional[str] = None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ConsistentRead: bool = False,
+        Select: Optional[str] = None,
+    ) -> dict:
+        hash_key, range_key = self.key_schema(IndexName)
+        key_expression, names, values = build_condition(
+            KeyConditionExpression,
+            ExpressionAttributeNames,
+            ExpressionAttributeValues,
+            is_key_condition=True,
+        )
+        evaluator = Evaluator(names, values, "Query")
+        node = parse_condition(key_expression)
+        with self.lock:
+            items = [
+                item
+                for item in self.candidates(node, hash_key, evaluator)
+                # items without the index keys are not in the index
+                if hash_key in item
+                and (range_key is None or range_key in item)
+                and evaluator.test(item, node)
+            ]
+            items.sort(
+                key=lambda item: tuple(
+                    item[k] for k in (range_key, self.range_key) if k
+                ),
+                reverse=not ScanIndexForward,
+            )
+            response = self.read_many(
+                items,
+                IndexName,
+                Limit,
+                ExclusiveStartKey,
+                FilterExpression,
+                ProjectionExpression,
+                names,
+                values,
+                "Query",
+            )
+        if Select == "COUNT":
+            del response["Items"]
+        return response
+
+    def scan(
+        self,
+        IndexName: Optional[str] = None,
+        Limit: Optional[int] = None,
+        ExclusiveStartKey: Optional[dict] = None,
+        FilterExpression=None,
+        ProjectionExpression: Optional[str] = None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ConsistentRead: bool = False,
+        Select: Optional[str] = None,
+    ) -> dict:
+        hash_key, range_key = self.key_schema(IndexName)
+        with self.lock:
+            items = [
+                item
+                for partition in self.partitions.values()
+                for item in partition.values()
+                if hash_key in item and (range_key is None or range_key in item)
+            ]
+            response = self.read_many(
+                items,
+                IndexName,
+                Limit,
+                ExclusiveStartKey,
+                FilterExpression,
+                ProjectionExpression,
+                ExpressionAttributeNames,
+                ExpressionAttributeValues,
+                "Scan",
+            )
+        if Select == "COUNT":
+            del response["Items"]
+        return response
+
+    # transactions
+
+    def transact_write_items(self, requests: List[Tuple[str, InMemoryTable, dict]]):
+        """
+        Checks every condition, then applies every write, under the locks of all the
+        tables involved. With a transaction_latency the writes are applied that much
+        later, and the items are marked as in a transaction until then.
+        """
+        tables = sorted({id(table): table for _, table, _ in requests}.values(), key=id)
+        writes = self.__prepare_transaction(tables, requests)
+        if self.transaction_latency:
+            time.sleep(self.transaction_latency)
+            self.__lock_all(tables)
+            try:
+                for table, key, item in writes:
+                    table.in_transaction[key] -= 1
+                    if not table.in_transaction[key]:
+                        del table.in_transaction[key]
+                    table.store(key, item)
+            finally:
+                self.__unlock_all(tables)
+        return dict()
+
+    @staticmethod
+    def __lock_all(tables: List[InMemoryTable]):
+        for table in tables:
+            table.lock.acquire()
+
+    @staticmethod
+    def __unlock_all(tables: List[InMemoryTable]):
+        for table in reversed(tables):
+            table.lock.release()
+
+    def __prepare_transaction(
+        self,
+        tables: List[InMemoryTable],
+        requests: List[Tuple[str, InMemoryTable, dict]],
+    ) -> List[Tuple[InMemoryTable, Tuple[Any, Any], Optional[dict]]]:
+        self.__lock_all(tables)
+        try:
+            seen_keys = set()
+            planned = []
+            reasons = []
+            for kind, table, request in requests:
+                raw_key = (
+                    request["Item"]
+                    if kind == "Put"
+                    else request["Key"]
+                )
+                key = table.key_of(
+                    {k: raw_key.get(k) for k in (table.hash_key, table.range_key) if k},
+                    "TransactWriteItems",
+                )
+                if (id(table), key) in seen_keys:
+                    raise validation_error(
+                        "Transaction request cannot include multiple operations on one item",
+                        "TransactWriteItems",
+                    )
+                seen_keys.add((id(table), key))
+                old = table.find(key)
+                if table.in_transaction[key]:
+                    reasons.append(
+                        {
+                            "Code": "TransactionConflict",
+                            "Message": "Transaction is ongoing for the item",
+                        }
+                    )
+                elif table.check_condition(
+                    old,
+                    request.get("ConditionExpression"),
+                    request.get("ExpressionAttributeNames"),
+                    request.get("ExpressionAttributeValues"),
+                    "TransactWriteItems",
+                ):
+                    reasons.append({"Code": "None"})
+                else:
+                    reason = {
+                        "Code": "ConditionalCheckFailed",
+                        "Message": "The conditional request failed",
+                    }
+                    if (
+                        old is not None
+                        and request.get("ReturnValuesOnConditionCheckFailure")
+                        == "ALL_OLD"
+                    ):
+                        # low level attribute values, like the real exception
+                        reason["Item"] = {
+                            k: SERIALIZER.serialize(v) for k, v in old.items()
+                        }
+                    reasons.append(reason)
+                planned.append((kind, table, request, key, old))
+            if any(reason["Code"] != "None" for reason in reasons):
+                codes = ", ".join(reason["Code"] for reason in reasons)
+                raise client_error(
+                    "TransactionCanceledException",
+                    f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                    "TransactWriteItems",
+                    CancellationReasons=reasons,
+                )
+            writes = []
+            for kind, table, request, key, old in planned:
+                if kind == "Put":
+                    writes.append((table, key, to_stored(request["Item"])))
+                elif kind == "Update":
+                    new, _ = table.updated_item(
+                        key,
+                        request["Key"],
+                        old,
+                        request["UpdateExpression"],
+                        request.get("ExpressionAttributeNames"),
+                        request.get("ExpressionAttributeValues"),
+                    )
+                    writes.append((table, key, new))
+                elif kind == "Delete":
+                    writes.append((table, key, None))
+            for table, key, item in writes:
+                if self.transaction_latency:
+                    table.in_transaction[key] += 1
+                else:
+                    table.store(key, item)
+            return writes
+        finally:
+            self.__unlock_all(tables)
+
+
+class InMemoryLock:
+    def __init__(self, lock: threading.Lock, raise_context_exception: bool):
+        self.lock = lock
+        self.raise_context_exception = raise_context_exception
+        self.released = False
+
+    def release(self, best_effort: bool = True):
+        if not self.released:
+            self.released = True
+            self.lock.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        # like DynamoDBLock, exceptions are swallowed unless asked for
+        if not self.raise_context_exception:
+            return True
+
+
+class InMemoryLockClient:
+    """
+    Process local replacement for DynamoDBLockClient.acquire_lock
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks: Dict[Tuple[str, str], threading.Lock] = dict()
+
+    def acquire_lock(
+        self,
+        partition_key: str,
+        sort_key: str = "-",
+        retry_period: Optional[timedelta] = None,
+        retry_timeout: Optional[timedelta] = None,
+        additional_attributes: Optional[dict] = None,
+        app_callback=None,
+        raise_context_exception: bool = False,
+    ) -> InMemoryLock:
+        with self.lock:
+            lock = self.locks.setdefault((partition_key, sort_key), threading.Lock())
+        timeout = (
+            retry_timeout.total_seconds()
+            if retry_timeout is not None
+            else DEFAULT_LOCK_TIMEOUT_SECONDS
+        )
+        if not lock.acquire(timeout=timeout):
+            raise DynamoDBLockError(
+                DynamoDBLockError.ACQUIRE_TIMEOUT,
+                f"acquire_lock() timed out: {partition_key}",
+            )
+        return InMemoryLock(lock, raise_context_exception)
+
+    def close(self):
+        pass
+
+
+SHARED_LOCK = threading.Lock()
+SHARED_TABLES: Dict[str, InMemoryTable] = dict()
+SHARED_LOCK_CLIENTS: Dict[str, InMemoryLockClient] = dict()
+
+
+def shared_table(name: str, transaction_latency: float = 0.0) -> InMemoryTable:
+    """
+    The process wide in-memory game table of that name, so that every object graph in
+    the process sees the same data. The transaction latency is the one it was first
+    asked for with.
+    """
+    with SHARED_LOCK:
+        if name not in SHARED_TABLES:
+            SHARED_TABLES[name] = InMemoryTable(
+                name,
+                indexes=GAME_TABLE_INDEXES,
+                transaction_latency=transaction_latency,
+            )
+        return SHARED_TABLES[name]
+
+
+def shared_lock_client(name: str) -> InMemoryLockClient:
+    with SHARED_LOCK:
+        if name not in SHARED_LOCK_CLIENTS:
+            SHARED_LOCK_CLIENTS[name] = InMemoryLockClient()
+        return SHARED_LOCK_CLIENTS[name]
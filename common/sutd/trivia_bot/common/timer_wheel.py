@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Callable, List
+
+TIMER_WHEEL_SLOTS = 64
+TIMER_WHEEL_LEVELS = 4
+
+
+class Timer:
+    def __init__(self, expires_at_tick: int, callback: Callable[[], None]):
+        self.expires_at_tick = expires_at_tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        # left in its slot, and dropped when the slot comes round
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel: scheduling and cancelling are O(1), and advancing costs
+    one slot per tick plus the timers that cascade down or expire. Level 0 has a slot
+    per tick, every level above has a slot per turn of the level below. Timers further
+    out than the top level wait in an overflow list until it turns.
+
+    Not thread safe, it is meant to be driven from a single event loop.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float,
+        now: float = 0.0,
+        slots: int = TIMER_WHEEL_SLOTS,
+        levels: int = TIMER_WHEEL_LEVELS,
+    ):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self.current_tick = int(now / tick_seconds)
+        self.wheels: List[List[List[Timer]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self.overflow: List[Timer] = []
+
+    def schedule(self, deadline: float, callback: Callable[[], None]) -> Timer:
+        """
+        Calls back on the first advance() to reach the deadline
+        """
+        timer = Timer(math.ceil(deadline / self.tick_seconds), callback)
+        # the current tick has been processed, anything already due expires on the next
+        self.__insert(timer, earliest_tick=self.current_tick + 1)
+        return timer
+
+    def __insert(self, timer: Timer, earliest_tick: int):
+        expires_at_tick = max(timer.expires_at_tick, earliest_tick)
+        delta = expires_at_tick - self.current_tick
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span:
+                slot = (expires_at_tick // (span // self.slots)) % self.slots
+                self.wheels[level][slot].append(timer)
+                return
+            span *= self.slots
+        self.overflow.append(timer)
+
+    def advance(self, now: float) -> List[Timer]:
+        """
+        Turns the wheel up to now, and returns the timers that expired on the way, in
+        the order they expired
+        """
+        expired = []
+        target_tick = int(now / self.tick_seconds)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            # cascade from the top, so that timers can fall through several levels
+            for level in reversed(range(1, self.levels + 1)):
+                span = self.slots ** level
+                if self.current_tick % span != 0:
+                    continue
+                if level == self.levels:
+                    cascading, self.overflow = self.overflow, []
+                else:
+                    slots = self.wheels[level]
+                    slot = (self.current_tick // span) % self.slots
+                    cascading, slots[slot] = slots[slot], []
+                for timer in cascading:
+                    if not timer.cancelled:
+                        # level 0 of this tick is processed right after
+                        self.__insert(timer, earliest_tick=self.current_tick)
+            slots = self.wheels[0]
+            slot = self.current_tick % self.slots
+            due, slots[slot] = slots[slot], []
+            expired.extend(timer for timer in due if not timer.cancelled)
+        return expired
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pinject
+
+from sutd.trivia_bot.common.bindings import question_repository_class
+from sutd.trivia_bot.common.database import QuestionRepository
+from sutd.trivia_bot.common.metrics import invocation_metrics
+from sutd.trivia_bot.common.quizzer import (
+    QuestionAskerFactory,
+    QuestionResponderFactory,
+    GameMasterFactory,
+    Intermission,
+    MAX_RESPONSE_TIME,
+)
+from sutd.trivia_bot.common.timer_wheel import TimerWheel
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional
+    from pinject.object_graph import ObjectGraph
+    from sutd.trivia_bot.common.models import Question
+
+logger = logging.getLogger()
+
+WORKER_STATE_MACHINE_ARN = "worker"
+WORKER_CLEANUP_STATE_MACHINE_ARN = "worker-cleanup"
+WORKER_TICK_SECONDS = 0.1
+WORKER_THREADS = 16
+# the same pacing as quizzer/quiz_flow/statemachine.asl.json
+QUESTIONS_PER_GAME = 10
+WAIT_AFTER_QUESTION_SECONDS = 2
+INTERMISSION_DELAY_SECONDS = 3
+# the same retries as quizzer/cleanup_flow/statemachine.asl.json
+CLEANUP_MAX_ATTEMPTS = 6
+CLEANUP_RETRY_SECONDS = 2
+
+
+class GameScheduler:
+    """
+    Plays games inside one asyncio process instead of on Step Functions: every game is
+    a task that runs the quiz flow, and every wait, including the timeout of the active
+    question, is a timer on one hierarchical timer wheel.
+
+    It stands in for the Step Functions client, so GameMaster and QuestionResponder
+    start and stop games and questions on it without knowing. Games in flight are lost
+    if the process stops, /end still resets them.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = WORKER_TICK_SECONDS,
+        max_workers: int = WORKER_THREADS,
+    ):
+        self.tick_seconds = tick_seconds
+        # game logic is blocking, it runs off the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="game"
+        )
+        self.execution_ids = itertools.count(1)
+        self.execution_ids_lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wheel: Optional[TimerWheel] = None
+        self.games: Dict[str, asyncio.Task] = dict()
+        self.questions: Dict[str, asyncio.Future] = dict()
+
+    def use(self, obj_graph: ObjectGraph):
+        # the object graph provides this scheduler as the sfn_client, so it is
+        # handed the graph once built
+        self.question_repository: QuestionRepository = obj_graph.provide(
+            question_repository_class()
+        )
+        self.question_asker_factory: QuestionAskerFactory = obj_graph.provide(
+            QuestionAskerFactory
+        )
+        self.question_responder_factory: QuestionResponderFactory = obj_graph.provide(
+            QuestionResponderFactory
+        )
+        self.game_master_factory: GameMasterFactory = obj_graph.provide(
+            GameMasterFactory
+        )
+        self.intermission: Intermission = obj_graph.provide(Intermission)
+
+    def __execution_arn(self, prefix: str) -> str:
+        with self.execution_ids_lock:
+            return f"{prefix}:{next(self.execution_ids)}"
+
+    # the part of the Step Functions client GameMaster and QuestionResponder use,
+    # called from the threads handling updates
+
+    def start_execution(self, stateMachineArn: str, input: str, **kwargs) -> dict:
+        chat_id = json.loads(input)["chat_id"]
+        if stateMachineArn == WORKER_CLEANUP_STATE_MACHINE_ARN:
+            execution_arn = self.__execution_arn(f"{stateMachineArn}:{chat_id}")
+            play = self.__clean_up
+        else:
+            execution_arn = self.__execution_arn(f"{stateMachineArn}:game:{chat_id}")
+            play = self.__play
+        self.loop.call_soon_threadsafe(self.__start_game, execution_arn, chat_id, play)
+        return {"executionArn": execution_arn}
+
+    def stop_execution(self, executionArn: str, **kwargs) -> dict:
+        self.loop.call_soon_threadsafe(self.__stop, executionArn)
+        return dict()
+
+    def __start_game(self, execution_arn: str, chat_id: str, play):
+        self.games[execution_arn] = self.loop.create_task(play(execution_arn, chat_id))
+
+    def __stop(self, execution_arn: str):
+        if execution_arn in self.games:
+            self.games[execution_arn].cancel()
+        elif execution_arn in self.questions:
+            # answered, the question is not failed
+            question = self.questions[execution_arn]
+            if not question.done():
+                question.set_result(False)
+
+    async def run(self):
+        """
+        Turns the timer wheel until cancelled
+        """
+        self.loop = asyncio.get_running_loop()
+        self.wheel = TimerWheel(self.tick_seconds, now=self.loop.time())
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            for timer in self.wheel.advance(self.loop.time()):
+                timer.callback()
+
+    def timeout(self, seconds: float, future: asyncio.Future):
+        """
+        Resolves the future with True after that many seconds, unless it is resolved or
+        cancelled first
+        """
+
+        def expire():
+            if not future.done():
+                future.set_result(True)
+
+        timer = self.wheel.schedule(self.loop.time() + seconds, expire)
+        future.add_done_callback(lambda _: timer.cancel())
+
+    async def sleep(self, seconds: float):
+        future = self.loop.create_future()
+        self.timeout(seconds, future)
+        await future
+
+    async def step(self, name: str, fn, *args, **kwargs):
+        return await self.loop.run_in_executor(
+            self.executor, functools.partial(self.__run_step, name, fn, *args, **kwargs)
+        )
+
+    @staticmethod
+    def __run_step(name: str, fn, *args, **kwargs):
+        with invocation_metrics(f"worker.{name}"):
+            return fn(*args, **kwargs)
+
+    async def __play(self, execution_arn: str, chat_id: str):
+        try:
+            questions = await self.step("sample_questions", self.sample_questions)
+            random.shuffle(questions)
+            while questions:
+                await self.ask(execution_arn, chat_id, questions.pop())
+                if not questions:
+                    break
+                await self.sleep(WAIT_AFTER_QUESTION_SECONDS)
+                delay_seconds = await self.step(
+                    "intermission",
+                    self.intermission.run,
+                    chat_id,
+                    delay_seconds=INTERMISSION_DELAY_SECONDS,
+                )
+                if delay_seconds:
+                    await self.sleep(delay_seconds)
+            await self.step("end_quiz", self.end_game, chat_id)
+        except asyncio.CancelledError:
+            logger.info(f"Game {execution_arn} was stopped")
+        except Exception:
+            # like a failed execution, the game is left for /end to reset
+            logger.exception(f"Game {execution_arn} failed")
+        finally:
+            del self.games[execution_arn]
+
+    async def __clean_up(self, execution_arn: str, chat_id: str):
+        try:
+            for attempt in range(CLEANUP_MAX_ATTEMPTS):
+                if attempt > 0:
+                    await self.sleep(CLEANUP_RETRY_SECONDS * 2 ** (attempt - 1))
+                try:
+                    await self.step("clean_up", self.clean_up, chat_id)
+                    return
+                except Exception:
+                    logger.exception(
+                        f"Cleanup {execution_arn} failed, attempt {attempt + 1}"
+                    )
+        except asyncio.CancelledError:
+            logger.info(f"Cleanup {execution_arn} was stopped")
+        finally:
+            del self.games[execution_arn]
+
+    async def ask(self, game_execution_arn: str, chat_id: str, question: Question):
+        question_execution_arn = self.__execution_arn(f"{game_execution_arn}:question")
+        # registered before the question is sent, it can be answered straight away
+        answered_or_timed_out = self.loop.create_future()
+        self.questions[question_execution_arn] = answered_or_timed_out
+        try:
+            message_id = await self.step(
+                "send_question",
+                self.send_question,
+                chat_id,
+                question_execution_arn,
+                question,
+            )
+            self.timeout(MAX_RESPONSE_TIME, answered_or_timed_out)
+            if await answered_or_timed_out:
+                await self.step("fail_question", self.fail_question, chat_id, message_id)
+        except Exception:
+            # a failed question flow moves on to the next question
+            logger.exception(f"Question {question_execution_arn} failed")
+        finally:
+            del self.questions[question_execution_arn]
+
+    def sample_questions(self) -> List[Question]:
+        summary = self.question_repository.get_summary()
+        sample_question_ids = self.question_repository.sample_ids(
+            QUESTIONS_PER_GAME, summary
+        )
+        return self.question_repository.find_many(
+            sample_question_ids, bank_version=summary.bank_version
+        )
+
+    def send_question(
+        self, chat_id: str, question_execution_arn: str, question: Question
+    ) -> str:
+        question_asker = self.question_asker_factory.create(
+            chat_id, step_function_execution_arn=question_execution_arn
+        )
+        return question_asker.ask(question).message_id
+
+    def fail_question(self, chat_id: str, message_id: str):
+        self.question_responder_factory.create(chat_id, message_id).fail()
+
+    def end_game(self, chat_id: str):
+        self.game_master_factory.create(chat_id).end_game()
+
+    def clean_up(self, chat_id: str):
+        self.game_master_factory.create(chat_id).clean_up()
+
+
+class GameSchedulerBindings(pinject.BindingSpec):
+    def __init__(self, game_scheduler: GameScheduler):
+        self.game_scheduler = game_scheduler
+
+    def provide_sfn_client(self):
+        return self.game_scheduler
+
+    def provide_state_machine_arn(self):
+        return WORKER_STATE_MACHINE_ARN
+
+    def provide_cleanup_state_machine_arn(self):
+        return WORKER_CLEANUP_STATE_MACHINE_ARN
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from sutd.trivia_bot.common.bindings import ALL_BINDINGS
+from sutd.trivia_bot.common.metrics import emits_metrics
+from sutd.trivia_bot.common.quizzer import GameMasterFactory
+import sutd.trivia_bot.common.database
+import sutd.trivia_bot.common.quizzer
+
+import pinject
+
+OBJ_GRAPH = pinject.new_object_graph(
+    modules=[sutd.trivia_bot.common.database, sutd.trivia_bot.common.quizzer],
+    binding_specs=ALL_BINDINGS,
+)
+
+
+@emits_metrics
+def lambda_handler(event, context):
+    chat_id = event["chat_id"]
+
+    gmf: GameMasterFactory = OBJ_GRAPH.provide(GameMasterFactory)
+    gm = gmf.create(chat_id)
+
+    # raises to have the state machine retry it
+    gm.clean_up()
@@ -8,6 +8,7 @@ if TYPE_CHECKING:
 from sutd.trivia_bot.common.models import Question
 from sutd.trivia_bot.common.quizzer import QuestionAskerFactory
 from sutd.trivia_bot.common.bindings import ALL_BINDINGS
+from sutd.trivia_bot.common.metrics import emits_metrics
 import sutd.trivia_bot.common.database
 import sutd.trivia_bot.common.quizzer
 
@@ -19,6 +20,7 @@ OBJ_GRAPH = pinject.new_object_graph(
 )
 
 
+@emits_metrics
 def lambda_handler(event, context):
     chat_id = event["chat_id"]
     execution_arn = event["execution_arn"]
@@ -5,13 +5,14 @@ import random
 import pinject
 from boto3.dynamodb.conditions import Key
 
-from sutd.trivia_bot.common.bindings import ALL_BINDINGS
+from sutd.trivia_bot.common.bindings import ALL_BINDINGS, question_repository_class
+from sutd.trivia_bot.common.metrics import emits_metrics
 from sutd.trivia_bot.common.database import QuestionRepository
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import List
+    from typing import List, Optional
 
 import sutd.trivia_bot.common.database
 import sutd.trivia_bot.common.quizzer
@@ -22,21 +23,30 @@ OBJ_GRAPH = pinject.new_object_graph(
 )
 
 
+@emits_metrics
 def lambda_handler(event, context):
     sample_question_ids: List[str] = event["sample_question_ids"]
     already_asked: List[str] = event["already_asked"]
+    bank_version: Optional[int] = event.get("bank_version")
 
     not_yet_asked = list(set(sample_question_ids) - set(already_asked))
 
-    question_repository: QuestionRepository = OBJ_GRAPH.provide(QuestionRepository)
+    question_repository: QuestionRepository = OBJ_GRAPH.provide(
+        question_repository_class()
+    )
 
-    question_id_to_ask = random.choice(not_yet_asked)
-
-    question_to_ask = question_repository.find(question_id_to_ask)
+    # warm containers answer this from the process wide question cache, cold ones
+    # read the rest of the game's questions in a single BatchGetItem
+    questions_not_yet_asked = question_repository.find_many(
+        not_yet_asked, bank_version=bank_version
+    )
+    question_to_ask = random.choice(questions_not_yet_asked)
+    question_id_to_ask = question_to_ask.id
 
     return {
         "sample_question_ids": list(sample_question_ids),
         "already_asked": list(already_asked) + [question_id_to_ask],
+        "bank_version": bank_version,
         "next_question": question_to_ask.dict(),
         "number_of_questions_remaining": len(sample_question_ids)
         - len(already_asked)
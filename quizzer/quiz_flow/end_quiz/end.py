@@ -1,9 +1,8 @@
 from __future__ import annotations
 
-from telegram import Bot
-
 from sutd.trivia_bot.common.bindings import ALL_BINDINGS
-from sutd.trivia_bot.common.quizzer import GameMaster, GameMasterFactory
+from sutd.trivia_bot.common.metrics import emits_metrics
+from sutd.trivia_bot.common.quizzer import GameMasterFactory
 
 from typing import TYPE_CHECKING
 
@@ -25,10 +24,10 @@ class NeedsTable:
         self.table = table
 
 
+@emits_metrics
 def lambda_handler(event, context):
     chat_id = event["chat_id"]
 
-    bot: Bot = OBJ_GRAPH.provide(Bot)
     gmf: GameMasterFactory = OBJ_GRAPH.provide(GameMasterFactory)
     gm = gmf.create(chat_id)
 
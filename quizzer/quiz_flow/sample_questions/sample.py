@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import random
-
 import pinject
 from boto3.dynamodb.conditions import Key
 
-from sutd.trivia_bot.common.bindings import ALL_BINDINGS
+from sutd.trivia_bot.common.bindings import ALL_BINDINGS, question_repository_class
+from sutd.trivia_bot.common.metrics import emits_metrics
 from sutd.trivia_bot.common.database import QuestionRepository
 
 from typing import TYPE_CHECKING
@@ -22,11 +21,22 @@ OBJ_GRAPH = pinject.new_object_graph(
 )
 
 
+@emits_metrics
 def lambda_handler(event, context):
     questions_to_ask = event.get("questions_to_ask")
-    question_repository: QuestionRepository = OBJ_GRAPH.provide(QuestionRepository)
-    all_question_ids = list(question_repository.list_ids())
-
-    sample_question_ids = random.sample(all_question_ids, questions_to_ask)
-
-    return {"sample_question_ids": list(sample_question_ids), "already_asked": []}
+    question_repository: QuestionRepository = OBJ_GRAPH.provide(
+        question_repository_class()
+    )
+    summary = question_repository.get_summary()
+
+    sample_question_ids = question_repository.sample_ids(questions_to_ask, summary)
+    # read every sampled question in one go, dropping any that no longer exist
+    sample_questions = question_repository.find_many(
+        sample_question_ids, bank_version=summary.bank_version
+    )
+
+    return {
+        "sample_question_ids": [question.id for question in sample_questions],
+        "already_asked": [],
+        "bank_version": summary.bank_version,
+    }
@@ -0,0 +1,119 @@
+"""
+Per-invocation overhead of the webhook entry point, with and without reusing the
+dispatcher across warm invocations.
+
+    python tests/benchmarks/dispatcher_benchmark.py [iterations]
+
+The update used matches no handler, so only the dispatcher setup and routing is timed.
+"""
+import os
+import sys
+import time
+import json
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, "common"), os.path.join(ROOT, "bot")]
+
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark-token-benchmark-token-00")
+os.environ.setdefault("TABLE_NAME", "benchmark")
+os.environ.setdefault("LOCK_TABLE_NAME", "benchmark-lock")
+os.environ.setdefault("START_GAME_STATE_MACHINE_ARN", "arn:benchmark")
+os.environ.setdefault("CLEANUP_STATE_MACHINE_ARN", "arn:benchmark:cleanup")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+
+from telegram import Bot, Update
+from telegram.ext import Dispatcher
+import pinject
+
+from sutd.trivia_bot.bot.dispatcher import build_dispatcher, error_callback
+from sutd.trivia_bot.bot.handlers import GameStateCommands, AnsweringHandlers
+from sutd.trivia_bot.common.bindings import (
+    DynamoDBBinding,
+    StateMachineBindings,
+    TelegramBotBinding,
+)
+import sutd.trivia_bot.common.database
+import sutd.trivia_bot.common.quizzer
+
+
+class BenchmarkBindings(pinject.BindingSpec):
+    def provide_lock_client(self):
+        # never used by an update that matches no handler
+        return object()
+
+    def provide_use_answer_lock(self):
+        return False
+
+
+def new_object_graph():
+    return pinject.new_object_graph(
+        modules=[sutd.trivia_bot.common.database, sutd.trivia_bot.common.quizzer],
+        binding_specs=[
+            TelegramBotBinding(),
+            DynamoDBBinding(),
+            StateMachineBindings(),
+            BenchmarkBindings(),
+        ],
+    )
+
+
+def make_event(update_id: int) -> dict:
+    body = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.utcnow().timestamp()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Benchmark"},
+            "text": "hello",
+        },
+    }
+    return {"body": json.dumps(body)}
+
+
+def cold_dispatch(obj_graph, event):
+    # what lambda_handler used to do on every invocation
+    bot: Bot = obj_graph.provide(Bot)
+    dispatcher = Dispatcher(bot, None, workers=0, use_context=True)
+    dispatcher.bot_data = {"event": event}
+    obj_graph.provide(GameStateCommands).register_handlers(dispatcher)
+    obj_graph.provide(AnsweringHandlers).register_handlers(dispatcher)
+    dispatcher.add_error_handler(error_callback)
+    dispatcher.process_update(Update.de_json(json.loads(event["body"]), bot))
+
+
+def warm_dispatch(dispatcher, event):
+    dispatcher.process_update(
+        Update.de_json(json.loads(event["body"]), dispatcher.bot)
+    )
+
+
+def measure(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(make_event(i))
+    return (time.perf_counter() - started) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    obj_graph = new_object_graph()
+    dispatcher = build_dispatcher(obj_graph)
+    # warm up both paths so imports and singletons are not counted
+    cold_dispatch(obj_graph, make_event(0))
+    warm_dispatch(dispatcher, make_event(0))
+
+    per_invocation = measure(lambda e: cold_dispatch(obj_graph, e), iterations)
+    reused = measure(lambda e: warm_dispatch(dispatcher, e), iterations)
+    print(
+        json.dumps(
+            {
+                "iterations": iterations,
+                "per_invocation_dispatcher_us": round(per_invocation * 1e6, 1),
+                "reused_dispatcher_us": round(reused * 1e6, 1),
+                "speedup": round(per_invocation / reused, 2),
+            },
+            indent=2,
+        )
+    )
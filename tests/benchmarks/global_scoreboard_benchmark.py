@@ -0,0 +1,146 @@
+"""
+Write throughput of commit_to_global_scoreboard as the number of global score shards
+changes, with many games ending at the same moment.
+
+    python tests/benchmarks/global_scoreboard_benchmark.py [--endpoint-url URL]
+        [--games 40] [--players 25] [--shards 1,2,4,8,16]
+
+Runs against a throwaway on-demand table, created and deleted by the benchmark, on
+DynamoDB Local (--endpoint-url http://localhost:8000) or the account in the
+environment. A single partition key takes at most about 1000 writes per second, so
+besides wall clock throughput the hottest key's share of the writes is reported.
+DynamoDB Local does not throttle, which makes that share the number to compare there.
+"""
+import argparse
+import os
+import sys
+import time
+import json
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+
+import boto3
+
+from sutd.trivia_bot.common.database import ScoreRepository
+
+PARTITION_WRITE_LIMIT = 1000
+
+
+def create_table(dynamodb, name: str):
+    table = dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[
+            {"AttributeName": "pk", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "sk", "AttributeType": "S"},
+            {"AttributeName": "score", "AttributeType": "N"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "ScoreBoard",
+                "KeySchema": [
+                    {"AttributeName": "pk", "KeyType": "HASH"},
+                    {"AttributeName": "score", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+    )
+    table.wait_until_exists()
+    return table
+
+
+def count_global_score_writes(table, counter: Counter):
+    def count(params, **kwargs):
+        pk = params.get("Key", dict()).get("pk", "")
+        if pk.startswith("GLOBAL_SCORE"):
+            counter[pk] += 1
+
+    table.meta.client.meta.events.register(
+        "provide-client-params.dynamodb.UpdateItem",
+        count,
+        unique_id="count-global-score-writes",
+    )
+
+
+def seed_games(score_repository: ScoreRepository, games: int, players: int):
+    chat_ids = [f"benchmark-{uuid.uuid4().hex[:8]}" for _ in range(games)]
+    for chat_id in chat_ids:
+        for player in range(players):
+            # players overlap between games, like regulars in several chats. Points
+            # are awarded the way answers commit them
+            score_repository.table.meta.client.update_item(
+                **ScoreRepository.leaderboard_update(
+                    table_name=score_repository.table.name,
+                    chat_id=chat_id,
+                    user_id=str(1000 + player * 7),
+                    award_points=10 + player,
+                    user_data={"first_name": f"Player {player}"},
+                    answer_time=int(time.time()),
+                )
+            )
+    return chat_ids
+
+
+def run(table, shards: int, games: int, players: int) -> dict:
+    score_repository = ScoreRepository(table, global_score_shards=shards)
+    chat_ids = seed_games(score_repository, games, players)
+    writes = Counter()
+    count_global_score_writes(table, writes)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=games) as executor:
+        list(
+            executor.map(
+                lambda chat_id: score_repository.commit_to_global_scoreboard(
+                    chat_id, game_ended_at=int(time.time())
+                ),
+                chat_ids,
+            )
+        )
+    elapsed = time.perf_counter() - started
+    table.meta.client.meta.events.unregister(
+        "provide-client-params.dynamodb.UpdateItem",
+        unique_id="count-global-score-writes",
+    )
+    total_writes = sum(writes.values())
+    hottest_key_writes = max(writes.values())
+    return {
+        "shards": shards,
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(total_writes / elapsed, 1),
+        "hottest_key_share": round(hottest_key_writes / total_writes, 3),
+        # the write rate the table can take before the hottest key throttles
+        "throttle_free_writes_per_second": round(
+            PARTITION_WRITE_LIMIT * total_writes / hottest_key_writes
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--shards", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource("dynamodb", endpoint_url=args.endpoint_url)
+    table = create_table(dynamodb, f"global-scoreboard-benchmark-{uuid.uuid4().hex[:8]}")
+    try:
+        results = [
+            run(table, int(shards), args.games, args.players)
+            for shards in args.shards.split(",")
+        ]
+    finally:
+        table.delete()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,116 @@
+"""
+Cost of turning the models into DynamoDB items and back, through the pydantic json
+round trip and validation the repositories used to do, and through
+sutd.trivia_bot.common.items.
+
+    python tests/benchmarks/items_benchmark.py [iterations]
+
+Items are read back the way boto3 returns them, with numbers as Decimal.
+"""
+import os
+import sys
+import time
+import json
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+from sutd.trivia_bot.common.items import (
+    question_to_item,
+    question_from_item,
+    question_message_to_item,
+    question_message_from_item,
+    game_info_to_item,
+    game_info_from_item,
+    player_to_item,
+    player_from_item,
+)
+from sutd.trivia_bot.common.models import Question, QuestionMessage, GameInfo, Player
+
+QUESTION = Question(
+    id="q1",
+    type="mcq",
+    correct_answer="Paris",
+    question="What is the capital of France?",
+    other_answers=["London", "Berlin", "Madrid"],
+)
+MODELS = {
+    "question": (QUESTION, question_to_item, question_from_item),
+    "question_message": (
+        QuestionMessage(
+            message_id="10",
+            chat_id="-100",
+            question_id="q1",
+            question_data=QUESTION,
+            sent_at=1700000000,
+            correct_option=2,
+            accepted_answers=["paris"],
+            step_function_execution_arn="arn:question",
+        ),
+        question_message_to_item,
+        question_message_from_item,
+    ),
+    "game_info": (
+        GameInfo(
+            chat_id="-100",
+            game_state=GameInfo.GameState.RUNNING,
+            step_function_execution_arn="arn:game",
+            started_at=1700000000,
+            version=3,
+        ),
+        game_info_to_item,
+        game_info_from_item,
+    ),
+    "player": (
+        Player(user_id="1", score=150, user_data={"first_name": "Benchmark"}),
+        player_to_item,
+        player_from_item,
+    ),
+}
+
+
+def as_read(value):
+    # what boto3 hands back for an item written with value
+    if isinstance(value, bool) or not isinstance(value, (int, dict, list)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, dict):
+        return {k: as_read(v) for k, v in value.items()}
+    return [as_read(v) for v in value]
+
+
+def measure(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = dict()
+    for name, (model, to_item, from_item) in MODELS.items():
+        model_class = type(model)
+        item = as_read(to_item(model))
+        assert json.loads(model.json(exclude_none=True)) == to_item(model)
+        assert model_class(**item) == from_item(item)
+        timings = {
+            "json_write_us": measure(
+                lambda: json.loads(model.json(exclude_none=True)), iterations
+            ),
+            "items_write_us": measure(lambda: to_item(model), iterations),
+            "validated_read_us": measure(lambda: model_class(**item), iterations),
+            "items_read_us": measure(lambda: from_item(item), iterations),
+        }
+        results[name] = {
+            **{key: round(value * 1e6, 2) for key, value in timings.items()},
+            "write_speedup": round(
+                timings["json_write_us"] / timings["items_write_us"], 2
+            ),
+            "read_speedup": round(
+                timings["validated_read_us"] / timings["items_read_us"], 2
+            ),
+        }
+    print(json.dumps({"iterations": iterations, "models": results}, indent=2))
@@ -0,0 +1,588 @@
+"""
+Synthetic load on the bot: whole games played by simulated players in many chats at
+once, driven through the real webhook and quizzer Lambda handlers.
+
+    python tests/benchmarks/load_benchmark.py [--chats 20] [--players 8]
+        [--questions-per-game 5] [--questions 200] [--mcq-share 0.5]
+        [--correct-share 0.3] [--telegram-latency-ms 0] [--seed 0]
+
+Everything runs in process: the deployed bindings are used with STORAGE_ENGINE=memory,
+so the game and lock tables are the in-memory storage engine, the Bot API is answered
+in process with realistic messages, and the Step Functions client only records its
+calls. The step functions are played by the
+benchmark itself, which invokes sample, choose, send, fail, intermission and end like
+the state machine would, interleaving the chats at random.
+
+Players either press an MCQ button or reply to an open question, depending on the
+question. For every kind of invocation, p50/p95/p99 handler latency and the number of
+DynamoDB and Telegram calls per invocation are printed as JSON, so that runs before
+and after a change can be compared. Acquiring and releasing a game state lock counts as
+the GetItem, PutItem and DeleteItem the DynamoDB lock client would make. Telegram calls
+cost nothing unless --telegram-latency-ms is given.
+"""
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import math
+import os
+import random
+import sys
+import threading
+import time
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, "common"), os.path.join(ROOT, "bot")]
+
+os.environ["STORAGE_ENGINE"] = "memory"
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark-token-benchmark-token-00")
+os.environ.setdefault("TABLE_NAME", "benchmark")
+os.environ.setdefault("LOCK_TABLE_NAME", "benchmark-lock")
+os.environ.setdefault("START_GAME_STATE_MACHINE_ARN", "arn:benchmark")
+os.environ.setdefault("CLEANUP_STATE_MACHINE_ARN", "arn:benchmark:cleanup")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+
+from telegram.utils.request import Request
+import pinject
+
+from sutd.trivia_bot.bot.dispatcher import build_dispatcher
+from sutd.trivia_bot.common.bindings import (
+    TelegramBotBinding,
+    DynamoDBBinding,
+    LockClientBinding,
+    StateMachineBindings,
+)
+from sutd.trivia_bot.common.database import QuestionRepository
+from sutd.trivia_bot.common.models import Question
+from sutd.trivia_bot.common.storage import (
+    InMemoryTable,
+    InMemoryLockClient,
+    shared_table,
+    shared_lock_client,
+)
+import sutd.trivia_bot.common.database
+import sutd.trivia_bot.common.quizzer
+
+import lambda_entry
+
+QUIZZER_LAMBDAS = {
+    "sample_questions": "quizzer/quiz_flow/sample_questions/sample.py",
+    "choose_question": "quizzer/quiz_flow/choose_question/choose.py",
+    "intermission": "quizzer/quiz_flow/intermission/intermission.py",
+    "end_quiz": "quizzer/quiz_flow/end_quiz/end.py",
+    "clean_up": "quizzer/cleanup_flow/clean_up/clean_up.py",
+    "send_question": "quizzer/question_flow/send_question/send.py",
+    "fail_question": "quizzer/question_flow/fail_question/fail.py",
+}
+WEBHOOK_KINDS = ["start_command", "mcq_click", "reply"]
+TABLE_OPERATIONS = {
+    "get_item": "GetItem",
+    "put_item": "PutItem",
+    "update_item": "UpdateItem",
+    "delete_item": "DeleteItem",
+    "query": "Query",
+}
+CLIENT_OPERATIONS = {
+    **TABLE_OPERATIONS,
+    "batch_get_item": "BatchGetItem",
+    "transact_write_items": "TransactWriteItems",
+}
+BATCH_WRITE_SIZE = 25
+
+
+class CallCounter:
+    """
+    Counts calls across every thread, since handlers make some of theirs from the
+    Telegram sender and task graph pools
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def add(self, operation: str, count: int = 1):
+        with self.lock:
+            self.counts[operation] += count
+
+    def total(self) -> int:
+        with self.lock:
+            return sum(self.counts.values())
+
+
+class CountedTable:
+    """
+    Counts the DynamoDB calls made on an in-memory table, as they would be made on a
+    real one: calls the table makes to itself while serving one are not counted, and a
+    batch writer makes one BatchWriteItem call per 25 requests.
+    """
+
+    def __init__(self, table: InMemoryTable, counter: CallCounter):
+        self.table = table
+        self.counter = counter
+        self.local = threading.local()
+        for method, operation in TABLE_OPERATIONS.items():
+            setattr(table, method, self.counted(getattr(table, method), operation))
+        client = table.meta.client
+        for method, operation in CLIENT_OPERATIONS.items():
+            setattr(client, method, self.counted(getattr(client, method), operation))
+        table.batch_writer = self.batch_writer(table.batch_writer)
+
+    @contextlib.contextmanager
+    def serving(self):
+        depth = getattr(self.local, "depth", 0)
+        self.local.depth = depth + 1
+        try:
+            yield depth == 0
+        finally:
+            self.local.depth = depth
+
+    def counted(self, method, operation: str):
+        def call(*args, **kwargs):
+            with self.serving() as outermost:
+                if outermost:
+                    self.counter.add(operation)
+                return method(*args, **kwargs)
+
+        return call
+
+    def batch_writer(self, batch_writer):
+        counted_table = self
+
+        @contextlib.contextmanager
+        def counted_batch_writer(*args, **kwargs):
+            requests = Counter()
+
+            class Writer:
+                def put_item(self, Item: dict):
+                    requests["BatchWriteItem"] += 1
+                    with counted_table.serving():
+                        writer.put_item(Item=Item)
+
+                def delete_item(self, Key: dict):
+                    requests["BatchWriteItem"] += 1
+                    with counted_table.serving():
+                        writer.delete_item(Key=Key)
+
+            with batch_writer(*args, **kwargs) as writer:
+                yield Writer()
+            counted_table.counter.add(
+                "BatchWriteItem",
+                math.ceil(requests["BatchWriteItem"] / BATCH_WRITE_SIZE),
+            )
+
+        return counted_batch_writer
+
+
+class CountedLockClient:
+    """
+    Counts the DynamoDB calls the lock client would make: a GetItem and a conditional
+    PutItem to acquire a lock, and a DeleteItem to release it
+    """
+
+    def __init__(self, lock_client: InMemoryLockClient, counter: CallCounter):
+        acquire_lock = lock_client.acquire_lock
+
+        def counted_acquire_lock(*args, **kwargs):
+            counter.add("GetItem")
+            counter.add("PutItem")
+            lock = acquire_lock(*args, **kwargs)
+            release = lock.release
+
+            def counted_release(*args, **kwargs):
+                if not lock.released:
+                    counter.add("DeleteItem")
+                release(*args, **kwargs)
+
+            lock.release = counted_release
+            return lock
+
+        lock_client.acquire_lock = counted_acquire_lock
+
+
+class FakeTelegramApi:
+    """
+    Answers Bot API calls in process with what Telegram would return, keeping the
+    messages the bot sent so that players can answer them. Installed on Request itself,
+    since handlers also provide(Bot), which builds a bot with a request of its own.
+    """
+
+    def __init__(self, bot_user: dict, counter: CallCounter, latency_seconds: float):
+        self.bot_user = bot_user
+        self.counter = counter
+        self.latency_seconds = latency_seconds
+        self.lock = threading.Lock()
+        self.message_ids = itertools.count(1)
+        self.messages = dict()
+
+    def install(self):
+        # nothing leaves the process
+        api = self
+        Request.post = lambda request, url, data, timeout=None: api.post(url, data)
+        Request.get = lambda request, url, timeout=None: api.post(url, dict())
+
+    def new_message_id(self) -> int:
+        with self.lock:
+            return next(self.message_ids)
+
+    def message(self, chat_id, message_id) -> dict:
+        with self.lock:
+            return self.messages[(int(chat_id), int(message_id))]
+
+    def post(self, url: str, data: dict):
+        method = url.rsplit("/", 1)[-1]
+        self.counter.add(method)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if method == "getMe":
+            return self.bot_user
+        if method == "getMyCommands":
+            return []
+        if method == "sendMessage":
+            message = {
+                "message_id": self.new_message_id(),
+                "date": int(datetime.utcnow().timestamp()),
+                "chat": {"id": int(data["chat_id"]), "type": "group"},
+                "from": self.bot_user,
+                "text": data["text"],
+            }
+        elif method in ("editMessageText", "editMessageReplyMarkup"):
+            message = dict(self.message(data["chat_id"], data["message_id"]))
+            message["text"] = data.get("text", message["text"])
+            message.pop("reply_markup", None)
+        else:
+            return True
+        if data.get("reply_markup"):
+            reply_markup = data["reply_markup"]
+            message["reply_markup"] = (
+                json.loads(reply_markup)
+                if isinstance(reply_markup, str)
+                else reply_markup
+            )
+        with self.lock:
+            self.messages[(message["chat"]["id"], message["message_id"])] = message
+        return message
+
+
+class FakeStepFunctions:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.execution_ids = itertools.count(1)
+        self.stopped = set()
+
+    def start_execution(self, stateMachineArn: str, input: str, **kwargs):
+        with self.lock:
+            return {"executionArn": f"{stateMachineArn}:{next(self.execution_ids)}"}
+
+    def stop_execution(self, executionArn: str, **kwargs):
+        with self.lock:
+            self.stopped.add(executionArn)
+        return dict()
+
+    def is_stopped(self, execution_arn: str) -> bool:
+        with self.lock:
+            return execution_arn in self.stopped
+
+
+class FakeStateMachineBindings(StateMachineBindings):
+    def __init__(self, sfn_client: FakeStepFunctions):
+        self.sfn_client = sfn_client
+
+    def provide_sfn_client(self):
+        return self.sfn_client
+
+
+def load_quizzer_lambda(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_questions(
+    question_repository: QuestionRepository, count: int, mcq_share: float
+):
+    for i in range(count):
+        if i < round(count * mcq_share):
+            question = Question(
+                id=f"load-mcq-{i}",
+                type=Question.QuestionType.mcq,
+                question=f"Which option is number {i}?",
+                correct_answer=f"Option {i}",
+                other_answers=[f"Option {i + j}" for j in range(1, 4)],
+            )
+        else:
+            question = Question(
+                id=f"load-open-{i}",
+                type=Question.QuestionType.open,
+                question=f"What is the name of landmark {i}?",
+                correct_answer=f"Landmark number {i}",
+                aliases=[f"Landmark {i}"],
+            )
+        question_repository.create(question)
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.dynamodb_calls = CallCounter()
+        self.telegram_calls = CallCounter()
+        bot_id = int(os.environ["BOT_TOKEN"].split(":")[0])
+        self.telegram_api = FakeTelegramApi(
+            {
+                "id": bot_id,
+                "is_bot": True,
+                "first_name": "Trivia",
+                "username": "trivia_bot",
+            },
+            self.telegram_calls,
+            args.telegram_latency_ms / 1000,
+        )
+        self.telegram_api.install()
+        self.sfn_client = FakeStepFunctions()
+        obj_graph = pinject.new_object_graph(
+            modules=[sutd.trivia_bot.common.database, sutd.trivia_bot.common.quizzer],
+            binding_specs=[
+                TelegramBotBinding(),
+                DynamoDBBinding(),
+                LockClientBinding(),
+                FakeStateMachineBindings(self.sfn_client),
+            ],
+        )
+        # the handlers are the deployed ones, only their object graphs are swapped
+        lambda_entry.OBJ_GRAPH = obj_graph
+        lambda_entry.DISPATCHER = build_dispatcher(obj_graph)
+        self.lambdas = dict()
+        for name, path in QUIZZER_LAMBDAS.items():
+            module = load_quizzer_lambda(name, path)
+            module.OBJ_GRAPH = obj_graph
+            self.lambdas[name] = module.lambda_handler
+        seed_questions(
+            obj_graph.provide(QuestionRepository),
+            max(args.questions, args.questions_per_game),
+            args.mcq_share,
+        )
+        # count from here, seeding the question bank is not part of the load. The
+        # bindings hand out the process wide table and lock client of these names
+        CountedTable(shared_table(os.environ["TABLE_NAME"]), self.dynamodb_calls)
+        CountedLockClient(
+            shared_lock_client(os.environ["LOCK_TABLE_NAME"]), self.dynamodb_calls
+        )
+        self.update_ids = itertools.count(1)
+        self.samples = defaultdict(list)
+
+    def measure(self, kind: str, handler, event: dict):
+        dynamodb_before = self.dynamodb_calls.total()
+        telegram_before = self.telegram_calls.total()
+        started = time.perf_counter()
+        result = handler(event, None)
+        elapsed = time.perf_counter() - started
+        self.samples[kind].append(
+            (
+                elapsed,
+                self.dynamodb_calls.total() - dynamodb_before,
+                self.telegram_calls.total() - telegram_before,
+            )
+        )
+        return result
+
+    def webhook(self, kind: str, update: dict):
+        update["update_id"] = next(self.update_ids)
+        self.measure(kind, lambda_entry.lambda_handler, {"body": json.dumps(update)})
+
+    def quizzer(self, name: str, event: dict):
+        return self.measure(name, self.lambdas[name], event)
+
+    def player(self, chat_id: int, player: int) -> dict:
+        return {
+            "id": chat_id * -1000 + player,
+            "is_bot": False,
+            "first_name": f"Player {player}",
+            "username": f"player_{-chat_id}_{player}",
+        }
+
+    def answer(
+        self, chat_id: int, player: int, question: Question, question_message: dict
+    ):
+        correct = self.random.random() < self.args.correct_share
+        if question.type == Question.QuestionType.mcq:
+            buttons = [
+                row[0] for row in question_message["reply_markup"]["inline_keyboard"]
+            ]
+            button = self.random.choice(
+                [
+                    b
+                    for b in buttons
+                    if (b["text"] == question.correct_answer) == correct
+                ]
+            )
+            self.webhook(
+                "mcq_click",
+                {
+                    "callback_query": {
+                        "id": str(self.telegram_api.new_message_id()),
+                        "from": self.player(chat_id, player),
+                        "message": question_message,
+                        "chat_instance": str(chat_id),
+                        "data": button["callback_data"],
+                    }
+                },
+            )
+        else:
+            self.webhook(
+                "reply",
+                {
+                    "message": {
+                        "message_id": self.telegram_api.new_message_id(),
+                        "date": int(datetime.utcnow().timestamp()),
+                        "chat": {"id": chat_id, "type": "group"},
+                        "from": self.player(chat_id, player),
+                        "text": question.correct_answer
+                        if correct
+                        else self.random.choice(["no idea", "pass", "something else"]),
+                        "reply_to_message": question_message,
+                    }
+                },
+            )
+
+    def game(self, chat_id: int):
+        """
+        One game in one chat, yielding whenever another chat may take a turn
+        """
+        self.webhook(
+            "start_command",
+            {
+                "message": {
+                    "message_id": self.telegram_api.new_message_id(),
+                    "date": int(datetime.utcnow().timestamp()),
+                    "chat": {"id": chat_id, "type": "group"},
+                    "from": self.player(chat_id, 0),
+                    "text": "/start",
+                    "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+                }
+            },
+        )
+        yield
+        state = self.quizzer(
+            "sample_questions", {"questions_to_ask": self.args.questions_per_game}
+        )
+        for question_number in itertools.count():
+            yield
+            state = self.quizzer("choose_question", state)
+            question = Question(**state["next_question"])
+            execution_arn = f"arn:benchmark:question:{chat_id}:{question_number}"
+            message_id = self.quizzer(
+                "send_question",
+                {
+                    "chat_id": chat_id,
+                    "execution_arn": execution_arn,
+                    "question": state["next_question"],
+                },
+            )["message_id"]
+            question_message = self.telegram_api.message(chat_id, message_id)
+            players = list(range(self.args.players))
+            self.random.shuffle(players)
+            for player in players:
+                yield
+                self.answer(chat_id, player, question, question_message)
+            yield
+            if not self.sfn_client.is_stopped(execution_arn):
+                # nobody got it, the question times out
+                self.quizzer(
+                    "fail_question", {"chat_id": chat_id, "message_id": message_id}
+                )
+            if state["number_of_questions_remaining"] <= 0:
+                break
+            self.quizzer(
+                "intermission",
+                {
+                    "chat_id": chat_id,
+                    "sample_question_ids": state["sample_question_ids"],
+                    "already_asked": state["already_asked"],
+                    "question_just_asked": state["next_question"],
+                    "number_of_questions_remaining": state[
+                        "number_of_questions_remaining"
+                    ],
+                },
+            )
+        yield
+        self.quizzer("end_quiz", {"chat_id": chat_id})
+        yield
+        self.quizzer("clean_up", {"chat_id": chat_id})
+
+    def run(self):
+        games = [self.game(-1000000 - chat) for chat in range(self.args.chats)]
+        while games:
+            game = self.random.choice(games)
+            try:
+                next(game)
+            except StopIteration:
+                games.remove(game)
+
+
+def percentile(sorted_values, share: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def summarize(samples) -> dict:
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    return {
+        "count": len(samples),
+        "latency_ms": {
+            name: round(percentile(latencies, share) * 1000, 2)
+            for name, share in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99)]
+        },
+        "dynamodb_calls_per_invocation": round(
+            sum(dynamodb for _, dynamodb, _ in samples) / len(samples), 2
+        ),
+        "telegram_calls_per_invocation": round(
+            sum(telegram for _, _, telegram in samples) / len(samples), 2
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--questions-per-game", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--mcq-share", type=float, default=0.5)
+    parser.add_argument("--correct-share", type=float, default=0.3)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    benchmark = Benchmark(args)
+    started = time.perf_counter()
+    # the handlers print and log as they would to CloudWatch, keep stdout for results
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        benchmark.run()
+    elapsed = time.perf_counter() - started
+    webhook_samples = [
+        sample for kind in WEBHOOK_KINDS for sample in benchmark.samples[kind]
+    ]
+    print(
+        json.dumps(
+            {
+                "chats": args.chats,
+                "players": args.players,
+                "questions_per_game": args.questions_per_game,
+                "mcq_share": args.mcq_share,
+                "telegram_latency_ms": args.telegram_latency_ms,
+                "seconds": round(elapsed, 3),
+                "updates": summarize(webhook_samples),
+                "by_kind": {
+                    kind: summarize(samples)
+                    for kind, samples in sorted(benchmark.samples.items())
+                },
+                "dynamodb_calls": dict(sorted(benchmark.dynamodb_calls.counts.items())),
+                "telegram_calls": dict(sorted(benchmark.telegram_calls.counts.items())),
+            },
+            indent=2,
+        )
+    )
@@ -0,0 +1,122 @@
+"""
+Batches of queued updates, see bot/sutd/trivia_bot/bot/batch.py.
+
+    python -m pytest tests/test_batch.py
+"""
+import json
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common"), os.path.join(ROOT, "bot")]
+
+from telegram import Bot
+from telegram.ext import Dispatcher, MessageHandler, Filters
+
+from sutd.trivia_bot.bot.batch import UpdateBatchProcessor
+from sutd.trivia_bot.bot.dispatcher import error_callback
+from sutd.trivia_bot.common.database import GameInfoRepository
+from sutd.trivia_bot.common.models import GameInfo
+from sutd.trivia_bot.common.storage import InMemoryTable, GAME_TABLE_INDEXES
+
+
+class OfflineBot(Bot):
+    def __init__(self):
+        super().__init__(token="123456:offline")
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class CountingTable(InMemoryTable):
+    def __init__(self):
+        super().__init__("batch-test", indexes=GAME_TABLE_INDEXES)
+        self.get_item_calls = 0
+
+    def get_item(self, **kwargs):
+        self.get_item_calls += 1
+        return super().get_item(**kwargs)
+
+
+def record(message_id: int, chat_id: int, text: str) -> dict:
+    update = {
+        "update_id": message_id,
+        "message": {
+            "message_id": message_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "group"},
+            "text": text,
+        },
+    }
+    return {"messageId": f"m{message_id}", "body": json.dumps(update)}
+
+
+def build(table: CountingTable):
+    game_info_repository = GameInfoRepository(table)
+    handled = []
+    handled_lock = threading.Lock()
+
+    def handle(update, context):
+        chat_id = str(update.effective_chat.id)
+        text = update.effective_message.text
+        game_info = game_info_repository.get(chat_id)
+        with handled_lock:
+            handled.append((chat_id, text, game_info.game_state))
+        if text == "fail":
+            raise RuntimeError("handler failed")
+        if text == "start":
+            game_info_repository.transition(
+                game_info.copy(update={"game_state": GameInfo.GameState.RUNNING})
+            )
+
+    dispatcher = Dispatcher(OfflineBot(), None, workers=0, use_context=True)
+    dispatcher.add_handler(MessageHandler(Filters.text, handle))
+    dispatcher.add_error_handler(error_callback)
+    return UpdateBatchProcessor(dispatcher, workers=4), handled
+
+
+def test_reports_failures_and_keeps_chats_in_order():
+    table = CountingTable()
+    processor, handled = build(table)
+    records = [
+        record(1, 10, "a"),
+        record(2, 20, "a"),
+        record(3, 10, "fail"),
+        record(4, 20, "b"),
+        record(5, 10, "b"),
+        {"messageId": "m6", "body": "not json"},
+        record(7, 20, "c"),
+    ]
+
+    failed = processor.process(records)
+
+    # the chat's update after the failed one is left for the retry, unprocessed
+    assert sorted(failed) == ["m3", "m5", "m6"]
+    assert [text for chat_id, text, _ in handled if chat_id == "10"] == ["a", "fail"]
+    assert [text for chat_id, text, _ in handled if chat_id == "20"] == ["a", "b", "c"]
+    # the error handler still tells the chat
+    assert [chat_id for chat_id, _ in processor.dispatcher.bot.sent] == [10]
+
+
+def test_coalesces_reads_until_written():
+    table = CountingTable()
+    processor, handled = build(table)
+    records = [
+        record(1, 10, "a"),
+        record(2, 10, "b"),
+        record(3, 10, "start"),
+        record(4, 10, "c"),
+        record(5, 10, "d"),
+        record(6, 20, "a"),
+    ]
+
+    assert processor.process(records) == []
+
+    # one read per chat, and one more after the write
+    assert table.get_item_calls == 3
+    states = {text: state for chat_id, text, state in handled if chat_id == "10"}
+    assert states["b"] == GameInfo.GameState.IDLE
+    assert states["c"] == GameInfo.GameState.RUNNING
+    assert states["d"] == GameInfo.GameState.RUNNING
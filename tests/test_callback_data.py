@@ -0,0 +1,74 @@
+"""
+Signed callback data of MCQ answer buttons, see
+common/sutd/trivia_bot/common/callback_data.py.
+
+    python -m pytest tests/test_callback_data.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+import pytest
+
+from sutd.trivia_bot.common.callback_data import (
+    CallbackDataCodec,
+    CallbackToken,
+    MAX_CALLBACK_DATA_LENGTH,
+    SEPARATOR,
+)
+
+CODEC = CallbackDataCodec("123456:bot-token")
+
+
+@pytest.mark.parametrize("correct", [True, False])
+def test_round_trip(correct):
+    callback_data = CODEC.encode(
+        chat_id=-100, question_id="mcq_0123456789abcdef", answer_index=2, correct=correct
+    )
+    assert len(callback_data.encode()) <= MAX_CALLBACK_DATA_LENGTH
+    assert CODEC.decode("-100", callback_data) == CallbackToken(
+        question_id="mcq_0123456789abcdef", answer_index=2, correct=correct
+    )
+
+
+def test_tampered_signature():
+    callback_data = CODEC.encode("1", "q1", 0, correct=False)
+    question_id, answer_index, signature = callback_data.split(SEPARATOR)
+    flipped = "A" if signature[0] != "A" else "B"
+    for tampered in (
+        SEPARATOR.join([question_id, answer_index, flipped + signature[1:]]),
+        SEPARATOR.join([question_id, answer_index, signature[:-1]]),
+        SEPARATOR.join([question_id, answer_index]),
+        f"{callback_data}{SEPARATOR}",
+        "",
+    ):
+        assert CODEC.decode("1", tampered) is None
+
+
+def test_bound_to_chat_question_and_option():
+    callback_data = CODEC.encode("1", "q1", 0, correct=True)
+    _, _, signature = callback_data.split(SEPARATOR)
+    assert CODEC.decode("2", callback_data) is None
+    assert CODEC.decode("1", SEPARATOR.join(["q2", "0", signature])) is None
+    assert CODEC.decode("1", SEPARATOR.join(["q1", "1", signature])) is None
+    # nor can it be replayed under another bot token
+    assert CallbackDataCodec("654321:other-token").decode("1", callback_data) is None
+
+
+def test_does_not_reveal_correct_option():
+    correct = CODEC.encode("1", "q1", 1, correct=True)
+    wrong = CODEC.encode("1", "q1", 1, correct=False)
+    # the verdict is only in the signature, which cannot be checked without the key
+    assert correct.split(SEPARATOR)[:2] == wrong.split(SEPARATOR)[:2] == ["q1", "1"]
+    assert len(correct) == len(wrong)
+    assert correct != wrong
+    buttons = [
+        CODEC.encode("1", "q1", answer_index, correct=answer_index == 2)
+        for answer_index in range(4)
+    ]
+    assert [button.split(SEPARATOR)[:2] for button in buttons] == [
+        ["q1", str(answer_index)] for answer_index in range(4)
+    ]
+    assert len({len(button) for button in buttons}) == 1
@@ -0,0 +1,120 @@
+"""
+The item codecs against the pydantic models they stand in for, see
+common/sutd/trivia_bot/common/items.py.
+
+    python -m pytest tests/test_items.py
+"""
+import json
+import os
+import sys
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+import pytest
+
+from sutd.trivia_bot.common.items import (
+    question_to_item,
+    question_from_item,
+    question_message_to_item,
+    question_message_from_item,
+    game_info_to_item,
+    game_info_from_item,
+    player_to_item,
+    player_from_item,
+)
+from sutd.trivia_bot.common.models import Question, QuestionMessage, GameInfo, Player
+
+OPEN_QUESTION = Question(id="q1", type="open", correct_answer="Paris", question="?")
+MCQ_QUESTION = Question(
+    id="q2",
+    type="mcq",
+    correct_answer="Paris",
+    question="?",
+    other_answers=["London", "Berlin"],
+    aliases=["paris"],
+)
+
+
+def as_read(value):
+    # numbers come back from boto3 as Decimal
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, dict):
+        return {k: as_read(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [as_read(v) for v in value]
+    return value
+
+
+@pytest.mark.parametrize(
+    "model, to_item, from_item",
+    [
+        (OPEN_QUESTION, question_to_item, question_from_item),
+        (MCQ_QUESTION, question_to_item, question_from_item),
+        (
+            QuestionMessage(
+                message_id="10",
+                chat_id="1",
+                question_id="q1",
+                question_data=OPEN_QUESTION,
+                sent_at=1700000000,
+                step_function_execution_arn="arn:question",
+            ),
+            question_message_to_item,
+            question_message_from_item,
+        ),
+        (
+            QuestionMessage(
+                message_id="11",
+                chat_id="1",
+                question_id="q2",
+                question_data=MCQ_QUESTION,
+                sent_at=1700000000,
+                callback_infos_json="[]",
+                correct_option=1,
+                accepted_answers=["paris"],
+                solved_at=1700000007,
+            ),
+            question_message_to_item,
+            question_message_from_item,
+        ),
+        (
+            GameInfo(chat_id="1", game_state=GameInfo.GameState.IDLE),
+            game_info_to_item,
+            game_info_from_item,
+        ),
+        (
+            GameInfo(
+                chat_id="1",
+                game_state=GameInfo.GameState.CLEANING_UP,
+                step_function_execution_arn="arn:game",
+                started_at=1700000000,
+                ended_at=1700000100,
+                version=4,
+            ),
+            game_info_to_item,
+            game_info_from_item,
+        ),
+        (
+            Player(user_id="1", score=50, user_data={"first_name": "Alice"}),
+            player_to_item,
+            player_from_item,
+        ),
+    ],
+)
+def test_matches_pydantic(model, to_item, from_item):
+    item = to_item(model)
+    assert item == json.loads(model.json(exclude_none=True))
+    # with the attributes around the model's that items also have
+    read = {"pk": "PK", "sk": "SK", "expires_at": 1, **as_read(item)}
+    decoded = from_item(read)
+    assert decoded == type(model)(**read)
+    assert decoded.json() == type(model)(**read).json()
+    assert decoded.copy(update={}) == model
+
+
+def test_game_info_written_before_versions():
+    item = {"pk": "CHAT#1", "sk": "GAMEINFO", "chat_id": "1", "game_state": "RUNNING"}
+    assert game_info_from_item(item).version == 0
@@ -0,0 +1,101 @@
+"""
+Normalizing and typo tolerant matching of typed answers, see
+common/sutd/trivia_bot/common/matching.py.
+
+    python -m pytest tests/test_matching.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+import pytest
+
+from sutd.trivia_bot.common.matching import (
+    AnswerMatcher,
+    CompiledQuestion,
+    edit_distance_within,
+    normalize_answer,
+)
+from sutd.trivia_bot.common.models import Question
+
+
+@pytest.mark.parametrize(
+    "answer, normalized",
+    [
+        ("PARIS", "paris"),
+        ("  New   York ", "new york"),
+        ("Café", "cafe"),
+        ("Señor Frog", "senor frog"),
+        ("l'Hôpital", "lhopital"),
+        ("Rock & Roll", "rock and roll"),
+        ("Washington, D.C.!", "washington d c"),
+        ("The Beatles", "beatles"),
+        ("an apple", "apple"),
+        # an article on its own is the whole answer
+        ("The", "the"),
+        ("The Five-Star ", "5 star"),
+        ("Twenty one", "21"),
+        ("ninety", "90"),
+        ("?!", ""),
+    ],
+)
+def test_normalize_answer(answer, normalized):
+    assert normalize_answer(answer) == normalized
+
+
+@pytest.mark.parametrize(
+    "a, b, max_distance, within",
+    [
+        ("paris", "paris", 0, True),
+        ("paris", "parus", 0, False),
+        ("paris", "parus", 1, True),
+        ("paris", "pxrxs", 1, False),
+        ("paris", "pxrxs", 2, True),
+        ("paris", "pxrxx", 2, False),
+        ("paris", "par", 2, True),
+        ("paris", "pa", 2, False),
+        ("kitten", "sitting", 3, True),
+        ("kitten", "sitting", 2, False),
+        ("", "", 0, True),
+        ("", "ab", 2, True),
+        ("", "abc", 2, False),
+        ("abc", "", 2, False),
+    ],
+)
+def test_edit_distance_within(a, b, max_distance, within):
+    assert edit_distance_within(a, b, max_distance) is within
+    assert edit_distance_within(b, a, max_distance) is within
+
+
+def test_typos_only_tolerated_in_longer_answers():
+    compiled = CompiledQuestion(
+        Question(
+            id="q1",
+            type="open",
+            correct_answer="Rome",
+            question="?",
+            aliases=["Constantinople", "1453"],
+        )
+    )
+    assert compiled.match("the rome") == "rome"
+    # short answers and numbers are matched exactly
+    assert compiled.match("Roma") is None
+    assert compiled.match("Rom") is None
+    assert compiled.match("1454") is None
+    assert compiled.match("Konstantinople") == "constantinople"
+    assert compiled.match("Constantinopel") == "constantinople"
+    assert compiled.match("Konstantinopel") is None
+
+
+def test_recalls_learnt_question_messages():
+    matcher = AnswerMatcher()
+    question = Question(id="q1", type="open", correct_answer="Paris", question="?")
+    assert matcher.recall("1", "10") is None
+    assert matcher.recall_execution_arn("1", "10") is None
+    matcher.learn(1, 10, question, step_function_execution_arn="arn:question")
+    assert matcher.recall("1", "10").match("paris") == "paris"
+    # learning the message again without an execution keeps the known one
+    matcher.learn("1", "10", question)
+    assert matcher.recall_execution_arn("1", "10") == "arn:question"
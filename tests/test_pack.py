@@ -0,0 +1,85 @@
+"""
+The question pack and the repository that reads from it, see
+common/sutd/trivia_bot/common/pack.py.
+
+    python -m pytest tests/test_pack.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+import pytest
+
+from sutd.trivia_bot.common.database import PackedQuestionRepository
+from sutd.trivia_bot.common.models import Question
+from sutd.trivia_bot.common.pack import QuestionPack, write_question_pack
+
+QUESTIONS = [
+    Question(id=f"open_{i}", type="open", correct_answer=f"{i}", question=f"{i}?")
+    for i in range(50)
+] + [
+    Question(
+        id="mcq_paris",
+        type="mcq",
+        correct_answer="Paris",
+        question="Capital of France?",
+        other_answers=["London", "Berlin"],
+        aliases=["paris"],
+    )
+]
+
+
+@pytest.fixture
+def question_pack(tmp_path):
+    path = str(tmp_path / "questions.pack")
+    write_question_pack(path, QUESTIONS, bank_version=7)
+    return QuestionPack(path)
+
+
+def test_finds_every_question(question_pack):
+    assert question_pack.bank_version == 7
+    assert question_pack.question_count == len(QUESTIONS)
+    for ordinal, question in enumerate(QUESTIONS):
+        assert question_pack.id_at(ordinal) == question.id
+        assert question_pack.question_at(ordinal) == question
+        assert question_pack.ordinal_of(question.id) == ordinal
+        assert question_pack.find(question.id) == question
+    assert question_pack.find("missing") is None
+    with pytest.raises(IndexError):
+        question_pack.question_at(len(QUESTIONS))
+
+
+def test_rejects_duplicate_ids(tmp_path):
+    with pytest.raises(ValueError):
+        write_question_pack(str(tmp_path / "questions.pack"), QUESTIONS * 2, 1)
+
+
+def test_empty_pack(tmp_path):
+    path = str(tmp_path / "questions.pack")
+    write_question_pack(path, [], bank_version=1)
+    repository = PackedQuestionRepository(QuestionPack(path))
+    assert repository.get_summary().question_count == 0
+    assert repository.sample_ids(5, repository.get_summary()) == []
+    assert repository.find_many(["open_1"]) == []
+
+
+def test_repository(question_pack):
+    repository = PackedQuestionRepository(question_pack)
+    summary = repository.get_summary()
+    assert (summary.bank_version, summary.question_count) == (7, len(QUESTIONS))
+
+    sampled = repository.sample_ids(10, summary)
+    assert len(set(sampled)) == 10
+    assert {question.id for question in QUESTIONS} >= set(sampled)
+    assert len(repository.sample_ids(100, summary)) == len(QUESTIONS)
+
+    assert repository.find("mcq_paris") == QUESTIONS[-1]
+    assert repository.find_by_ordinal(3) == QUESTIONS[3]
+    with pytest.raises(KeyError):
+        repository.find("missing")
+    assert repository.find_many(["open_2", "missing", "open_1"]) == [
+        QUESTIONS[2],
+        QUESTIONS[1],
+    ]
@@ -0,0 +1,724 @@
+"""
+The in-memory storage engine against moto, for the operations the repositories use,
+and the transaction conflicts it models.
+
+    python -m pytest tests/test_storage.py
+"""
+import os
+import sys
+import threading
+import time
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import boto3
+import pytest
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from sutd.trivia_bot.common.database import (
+    CallbackRepository,
+    GameInfoRepository,
+    QuestionCache,
+    QuestionMessageRepository,
+    QuestionRepository,
+    ScoreRepository,
+    question_content_id,
+    query_all,
+    batch_get_all,
+    DESERIALIZER,
+)
+from sutd.trivia_bot.common.models import GameInfo, Question, QuestionMessage
+from sutd.trivia_bot.common.storage import InMemoryTable, GAME_TABLE_INDEXES
+
+TABLE_NAME = "storage-test"
+
+
+def create_moto_table():
+    attribute_types = {
+        "pk": "S",
+        "sk": "S",
+        "score": "N",
+        "gsi_current_active_question": "S",
+        "gsi_callback_question_id": "S",
+    }
+    dynamodb = boto3.resource("dynamodb")
+    return dynamodb.create_table(
+        TableName=TABLE_NAME,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[
+            {"AttributeName": "pk", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": name, "AttributeType": attribute_type}
+            for name, attribute_type in attribute_types.items()
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": index_name,
+                "KeySchema": [
+                    {"AttributeName": hash_key, "KeyType": "HASH"},
+                    {"AttributeName": range_key, "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+            for index_name, (hash_key, range_key) in GAME_TABLE_INDEXES.items()
+        ],
+    )
+
+
+@pytest.fixture
+def tables():
+    with mock_aws():
+        yield create_moto_table(), InMemoryTable(TABLE_NAME, indexes=GAME_TABLE_INDEXES)
+
+
+def outcome(fn):
+    """
+    What a call returned, without response metadata, or the error it raised
+    """
+    try:
+        response = fn()
+    except ClientError as ex:
+        return (
+            "error",
+            ex.response["Error"]["Code"],
+            [reason["Code"] for reason in ex.response.get("CancellationReasons", [])],
+        )
+    if isinstance(response, dict):
+        response = {
+            k: v
+            for k, v in response.items()
+            if k
+            not in (
+                "ResponseMetadata",
+                "ConsumedCapacity",
+                "ScannedCount",
+                "ItemCollectionMetrics",
+            )
+        }
+    return response
+
+
+def scanned(table):
+    # scans are not ordered across partitions
+    return sorted(table.scan()["Items"], key=lambda item: (item["pk"], item["sk"]))
+
+
+def seed(table):
+    for user in range(6):
+        table.put_item(
+            Item={
+                "pk": "GLOBAL_SCORE#0",
+                "sk": f"user-{user}",
+                "user_id": f"user-{user}",
+                "score": user * 10,
+                "user_data": {"first_name": f"Player {user}"},
+            }
+        )
+    table.put_item(
+        Item={
+            "pk": "CHAT#1",
+            "sk": "MESSAGE#1",
+            "question_data": {"correct_answer": "paris"},
+            "accepted_answers": ["paris", "city of light"],
+            "gsi_current_active_question": "arn:1",
+        }
+    )
+    table.put_item(Item={"pk": "CHAT#1", "sk": "MESSAGE#2", "solved_at": 5})
+
+
+def item_operations(table):
+    seed(table)
+    key = {"pk": "CHAT#1", "sk": "MESSAGE#1"}
+    return [
+        outcome(lambda: table.get_item(Key=key)),
+        outcome(lambda: table.get_item(Key={"pk": "CHAT#1", "sk": "MESSAGE#9"})),
+        outcome(
+            lambda: table.get_item(
+                Key=key, ProjectionExpression="pk, question_data.correct_answer"
+            )
+        ),
+        outcome(
+            lambda: table.put_item(Item=key, ConditionExpression="attribute_not_exists(pk)")
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key=key,
+                UpdateExpression="ADD wrong_users :w",
+                ConditionExpression="attribute_exists(pk)",
+                ExpressionAttributeValues={":w": {"alice"}},
+                ReturnValues="ALL_OLD",
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key=key,
+                UpdateExpression="ADD wrong_users :w",
+                ExpressionAttributeValues={":w": {"bob"}},
+                ReturnValues="ALL_NEW",
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key=key,
+                UpdateExpression="SET solved_at = :t REMOVE gsi_current_active_question",
+                ConditionExpression="(contains(accepted_answers, :a) OR question_data.correct_answer = :a) AND attribute_not_exists(solved_at) AND (attribute_not_exists(wrong_users) OR NOT contains(wrong_users, :u))",
+                ExpressionAttributeValues={":t": 7, ":a": "lyon", ":u": "carol"},
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key=key,
+                UpdateExpression="SET solved_at = :t REMOVE gsi_current_active_question",
+                ConditionExpression="(contains(accepted_answers, :a) OR question_data.correct_answer = :a) AND attribute_not_exists(solved_at)",
+                ExpressionAttributeValues={":t": 7, ":a": "city of light"},
+                ReturnValues="ALL_NEW",
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key={"pk": "CHAT#1", "sk": "SCORE#alice"},
+                UpdateExpression="SET score = if_not_exists(score, :zero) + :p, user_data = :d",
+                ExpressionAttributeValues={":zero": 0, ":p": 30, ":d": {"a": "b"}},
+                ReturnValues="ALL_NEW",
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key={"pk": "CHAT#1", "sk": "LEADERBOARD"},
+                UpdateExpression="ADD #score :p SET #user_data = :d",
+                ExpressionAttributeNames={
+                    "#score": "score_alice",
+                    "#user_data": "user_data_alice",
+                },
+                ExpressionAttributeValues={":p": 30, ":d": {"first_name": "Alice"}},
+                ReturnValues="ALL_NEW",
+            )
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key={"pk": "TRIVIA", "sk": "SUMMARY"},
+                UpdateExpression="ADD question_count :one, bank_version :one",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="UPDATED_NEW",
+            )["Attributes"]["question_count"]
+        ),
+        outcome(
+            lambda: table.update_item(
+                Key={"pk": "CHAT#1", "sk": "MESSAGE#9"},
+                UpdateExpression="REMOVE step_function_execution_arn",
+                ConditionExpression="attribute_exists(pk) AND attribute_not_exists(solved_at)",
+            )
+        ),
+        outcome(
+            lambda: table.put_item(
+                Item={"pk": "LEADERBOARD#0", "sk": "GLOBAL", "version": 2},
+                ConditionExpression="version = :version",
+                ExpressionAttributeValues={":version": 1},
+            )
+        ),
+        outcome(
+            lambda: table.delete_item(
+                Key={"pk": "CHAT#1", "sk": "MESSAGE#2"}, ReturnValues="ALL_OLD"
+            )
+        ),
+        outcome(lambda: table.get_item(Key={"pk": "CHAT#1", "sk": "MESSAGE#2"})),
+    ]
+
+
+def query_operations(table):
+    seed(table)
+    return [
+        outcome(
+            lambda: list(
+                query_all(
+                    table,
+                    KeyConditionExpression=Key("pk").eq("GLOBAL_SCORE#0"),
+                    ConsistentRead=True,
+                    Limit=4,
+                )
+            )
+        ),
+        outcome(
+            lambda: table.query(
+                IndexName="ScoreBoard",
+                KeyConditionExpression=Key("pk").eq("GLOBAL_SCORE#0"),
+                ScanIndexForward=False,
+                Limit=3,
+            )["Items"]
+        ),
+        outcome(
+            lambda: table.query(
+                KeyConditionExpression=Key("pk").eq("CHAT#1")
+                & Key("sk").begins_with("MESSAGE#"),
+                ProjectionExpression="pk, sk",
+            )
+        ),
+        outcome(
+            lambda: table.query(
+                IndexName="CurrentActiveQuestion",
+                KeyConditionExpression=Key("pk").eq("CHAT#1"),
+                Limit=1,
+            )["Items"]
+        ),
+        outcome(
+            lambda: table.query(
+                KeyConditionExpression=Key("pk").eq("GLOBAL_SCORE#0"),
+                FilterExpression=Attr("score").gte(30),
+            )["Items"]
+        ),
+        outcome(
+            lambda: sorted(
+                batch_get_all(
+                    table,
+                    [
+                        {"pk": "GLOBAL_SCORE#0", "sk": f"user-{user}"}
+                        for user in range(0, 9, 2)
+                    ],
+                ),
+                key=lambda item: item["sk"],
+            )
+        ),
+    ]
+
+
+def write_operations(table):
+    seed(table)
+    client = table.meta.client
+    with table.batch_writer() as batch:
+        batch.delete_item(Key={"pk": "GLOBAL_SCORE#0", "sk": "user-0"})
+        batch.put_item(Item={"pk": "CALLBACK#1", "sk": "abc", "gsi_callback_question_id": "q1"})
+    observations = [
+        outcome(
+            lambda: client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": TABLE_NAME,
+                            "Key": {"pk": "GLOBAL_SCORE#1", "sk": "user-1"},
+                            "UpdateExpression": "SET score = if_not_exists(score, :zero) + :score",
+                            "ExpressionAttributeValues": {":zero": 0, ":score": 10},
+                        }
+                    },
+                    {
+                        "Delete": {
+                            "TableName": TABLE_NAME,
+                            "Key": {"pk": "GLOBAL_SCORE#0", "sk": "user-1"},
+                            "ConditionExpression": "attribute_exists(pk)",
+                        }
+                    },
+                ]
+            )
+        )
+    ]
+    try:
+        client.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": "CHAT#1", "sk": "MESSAGE#2"},
+                        "UpdateExpression": "SET solved_at = :t",
+                        "ConditionExpression": "attribute_not_exists(solved_at)",
+                        "ExpressionAttributeValues": {":t": 9},
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                    }
+                },
+                {
+                    "Update": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": "CHAT#1", "sk": "SCORE#bob"},
+                        "UpdateExpression": "ADD score :p",
+                        "ExpressionAttributeValues": {":p": 10},
+                    }
+                },
+            ]
+        )
+    except ClientError as ex:
+        reasons = ex.response["CancellationReasons"]
+        observations.append(
+            (
+                [reason["Code"] for reason in reasons],
+                {
+                    k: DESERIALIZER.deserialize(v)
+                    for k, v in reasons[0]["Item"].items()
+                },
+            )
+        )
+    observations.append(scanned(table))
+    return observations
+
+
+def repository_operations(table):
+    question_message_repository = QuestionMessageRepository(table)
+    score_repository = ScoreRepository(table, global_score_shards=2)
+    callback_repository = CallbackRepository(table)
+    game_info_repository = GameInfoRepository(table)
+    question = Question(
+        id="q1", type="open", correct_answer="Paris", question="?", aliases=["paris"]
+    )
+    game_info_repository.transition(
+        GameInfo(
+            chat_id="1", game_state=GameInfo.GameState.RUNNING, started_at=1699999990
+        )
+    )
+    for message_id, sent_at in (("10", 1700000000), ("3", 1699990000)):
+        # message 3 was asked in an earlier game, and left to expire
+        question_message_repository.create(
+            QuestionMessage(
+                chat_id="1",
+                message_id=message_id,
+                question_id="q1",
+                question_data=question,
+                sent_at=sent_at,
+                step_function_execution_arn=f"arn:question:{message_id}",
+                accepted_answers=["paris"],
+            )
+        )
+    for callback_id, question_id in (("a", "q1"), ("b", "q2"), ("c", "q1")):
+        table.put_item(
+            Item={
+                "pk": "CALLBACK#1",
+                "sk": callback_id,
+                "callback_info": {"callback_id": callback_id, "answer": "Paris"},
+                "gsi_callback_question_id": question_id,
+            }
+        )
+    arguments = dict(
+        chat_id="1",
+        message_id="10",
+        user_data={"first_name": "Alice"},
+        award_points=50,
+        answer_time=1700000005,
+        question_sent_at=1700000000,
+        no_retries=False,
+    )
+    observations = [
+        question_message_repository.commit_answer(
+            user_id="alice",
+            user_display_name="Alice",
+            answer="paris",
+            **{**arguments, "message_id": "3", "question_sent_at": 1699990000},
+        ),
+        question_message_repository.commit_answer(
+            user_id="alice", user_display_name="Alice", answer="lyon", **arguments
+        ),
+        question_message_repository.record_wrong_answer("1", "10", "Alice"),
+        question_message_repository.get_current_active_question("1"),
+        question_message_repository.commit_answer(
+            user_id="alice", user_display_name="Alice", answer="paris", **arguments
+        ),
+        question_message_repository.commit_answer(
+            user_id="bob", user_display_name="Bob", answer="paris", **arguments
+        ),
+        question_message_repository.mark_as_inactive("1", "10"),
+        question_message_repository.get_current_active_question("1"),
+        score_repository.get_local_top_players("1", 3),
+        score_repository.commit_to_global_scoreboard("1", game_ended_at=1700000100),
+        score_repository.get_global_top_players(3),
+        callback_repository.retrieve("a", "1"),
+        callback_repository.retrieve("d", "1"),
+    ]
+    # the same game committed again, as by a retried cleanup, adds nothing
+    table.meta.client.update_item(
+        **ScoreRepository.leaderboard_update(
+            table_name=table.name,
+            chat_id="1",
+            user_id="alice",
+            award_points=50,
+            user_data={"first_name": "Alice"},
+            answer_time=1700000005,
+        )
+    )
+    observations.append(
+        score_repository.commit_to_global_scoreboard("1", game_ended_at=1700000100)
+    )
+    observations.append(score_repository.get_global_top_players(3))
+    running = game_info_repository.get("1")
+    observations.append(
+        game_info_repository.transition(
+            running.copy(update={"game_state": GameInfo.GameState.CLEANING_UP})
+        )
+    )
+    # decided from the game info read before that transition
+    rejected = game_info_repository.transition(
+        running.copy(update={"game_state": GameInfo.GameState.IDLE})
+    )
+    observations.append(rejected)
+    observations.append(
+        game_info_repository.transition(
+            rejected.game_info.copy(update={"game_state": GameInfo.GameState.IDLE})
+        )
+    )
+    observations.append(game_info_repository.get("1"))
+    observations.append(
+        question_message_repository.commit_answer(
+            user_id="bob", user_display_name="Bob", answer="paris", **arguments
+        )
+    )
+    observations.append(scanned(table))
+    return observations
+
+
+def question_bank_operations(table):
+    question_repository = QuestionRepository(table, QuestionCache())
+    observations = []
+
+    def imported(*texts: str) -> list:
+        questions = [
+            Question(id="", type="open", correct_answer=text.lower(), question=text)
+            for text in texts
+        ]
+        return [
+            question.copy(update={"id": question_content_id(question)})
+            for question in questions
+        ]
+
+    def observe_bank():
+        summary = question_repository.get_summary()
+        observations.append(summary)
+        observations.append(sorted(question_repository.list_ids(summary)))
+        observations.append(sorted(question_repository.sample_ids(10, summary)))
+        observations.append(
+            [
+                (item["sk"], "expires_at" in item)
+                for item in scanned(table)
+                if item["pk"] == "TRIVIA" and item["sk"] != "SUMMARY"
+            ]
+        )
+
+    for question_id in ("legacy-1", "legacy-2"):
+        question_repository.create(
+            Question(id=question_id, type="open", correct_answer="a", question="?")
+        )
+    observe_bank()
+    observations.append(question_repository.import_bank(imported("A", "B", "C")))
+    observe_bank()
+    # games that sampled the bank before keep reading their questions
+    observations.append(question_repository.find_many(["legacy-1", "legacy-2"]))
+    observations.append(question_repository.import_bank(imported("C", "B", "A")))
+    observations.append(question_repository.import_bank(imported("A", "B2", "C", "D")))
+    observe_bank()
+    observations.append(question_repository.import_bank(imported("A", "B")))
+    observe_bank()
+    with pytest.raises(ValueError):
+        question_repository.import_bank(
+            [Question(id="q1", type="open", correct_answer="a", question="?")]
+        )
+    return observations
+
+
+@pytest.mark.parametrize(
+    "operations",
+    [
+        item_operations,
+        query_operations,
+        write_operations,
+        repository_operations,
+        question_bank_operations,
+    ],
+)
+def test_matches_moto(tables, operations):
+    moto_table, in_memory_table = tables
+    assert operations(in_memory_table) == operations(moto_table)
+
+
+def pending_transaction(table, latency: float) -> threading.Thread:
+    table.transaction_latency = latency
+    transaction = threading.Thread(
+        target=table.meta.client.transact_write_items,
+        kwargs=dict(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": "CHAT#1", "sk": "MESSAGE#1"},
+                        "UpdateExpression": "SET solved_at = :t",
+                        "ExpressionAttributeValues": {":t": 1},
+                    }
+                }
+            ]
+        ),
+    )
+    transaction.start()
+    # let it pass its conditions
+    time.sleep(latency / 5)
+    return transaction
+
+
+def test_writes_conflict_with_pending_transactions():
+    table = InMemoryTable(TABLE_NAME, indexes=GAME_TABLE_INDEXES)
+    seed(table)
+    transaction = pending_transaction(table, latency=0.5)
+    with pytest.raises(ClientError) as conflict:
+        table.update_item(
+            Key={"pk": "CHAT#1", "sk": "MESSAGE#1"},
+            UpdateExpression="ADD wrong_users :w",
+            ExpressionAttributeValues={":w": {"alice"}},
+        )
+    assert conflict.value.response["Error"]["Code"] == "TransactionConflictException"
+    with pytest.raises(ClientError) as cancelled:
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": "CHAT#1", "sk": "SCORE#bob"},
+                        "UpdateExpression": "ADD score :p",
+                        "ExpressionAttributeValues": {":p": 10},
+                    }
+                },
+                {
+                    "Delete": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": "CHAT#1", "sk": "MESSAGE#1"},
+                    }
+                },
+            ]
+        )
+    assert [
+        reason["Code"] for reason in cancelled.value.response["CancellationReasons"]
+    ] == ["None", "TransactionConflict"]
+    # reads see the item as it was until the transaction is applied
+    assert "solved_at" not in table.get_item(Key={"pk": "CHAT#1", "sk": "MESSAGE#1"})["Item"]
+    transaction.join()
+    assert table.get_item(Key={"pk": "CHAT#1", "sk": "MESSAGE#1"})["Item"][
+        "solved_at"
+    ] == Decimal(1)
+    assert table.get_item(Key={"pk": "CHAT#1", "sk": "SCORE#bob"}) == dict()
+
+
+def test_racing_answers_retry_conflicts():
+    table = InMemoryTable(TABLE_NAME, indexes=GAME_TABLE_INDEXES, transaction_latency=0.03)
+    question_message_repository = QuestionMessageRepository(table)
+    GameInfoRepository(table).transition(
+        GameInfo(chat_id="1", game_state=GameInfo.GameState.RUNNING)
+    )
+    question = Question(
+        id="q1", type="open", correct_answer="Paris", question="?", aliases=["paris"]
+    )
+    question_message_repository.create(
+        QuestionMessage(
+            chat_id="1",
+            message_id="10",
+            question_id="q1",
+            question_data=question,
+            sent_at=1700000000,
+            step_function_execution_arn="arn:question",
+            accepted_answers=["paris"],
+        )
+    )
+    attempts = dict()
+
+    def answer(user_id: str):
+        attempts[user_id] = question_message_repository.commit_answer(
+            chat_id="1",
+            message_id="10",
+            user_id=user_id,
+            user_data={"first_name": user_id},
+            award_points=50,
+            answer="paris",
+            answer_time=1700000005,
+            question_sent_at=1700000000,
+            user_display_name=user_id,
+            no_retries=False,
+        )
+
+    winner = threading.Thread(target=answer, args=("alice",))
+    winner.start()
+    time.sleep(0.01)
+    answer("bob")
+    attempts["carol"] = question_message_repository.record_wrong_answer("1", "10", "carol")
+    winner.join()
+    assert attempts["alice"].correct
+    # the loser retried and found the question solved, so gets "Too slow!"
+    assert not attempts["bob"].correct
+    assert attempts["bob"].question_message.solved_at is not None
+    assert attempts["carol"].wrong_users == {"carol"}
+    leaderboard = table.get_item(Key={"pk": "CHAT#1", "sk": "LEADERBOARD"})["Item"]
+    assert "score_alice" in leaderboard and "score_bob" not in leaderboard
+
+
+def test_transition(tables):
+    for table in tables:
+        game_info_repository = GameInfoRepository(table)
+        idle = game_info_repository.get("1")
+        assert idle.version == 0
+        started = game_info_repository.transition(
+            idle.copy(update={"game_state": GameInfo.GameState.RUNNING})
+        )
+        assert started.applied
+        assert started.game_info.version == 1
+        assert game_info_repository.get("1") == started.game_info
+        # a second /start decided from the same idle game info
+        conflict = game_info_repository.transition(
+            idle.copy(update={"game_state": GameInfo.GameState.RUNNING})
+        )
+        assert not conflict.applied
+        assert conflict.game_info == started.game_info
+        ended = game_info_repository.transition(
+            conflict.game_info.copy(update={"game_state": GameInfo.GameState.IDLE})
+        )
+        assert ended.applied and ended.game_info.version == 2
+        stale = game_info_repository.transition(
+            started.game_info.copy(
+                update={"game_state": GameInfo.GameState.CLEANING_UP}
+            )
+        )
+        assert not stale.applied
+        assert stale.game_info.game_state == GameInfo.GameState.IDLE
+        assert stale.game_info.version == 2
+
+        # game info written before versions were kept reads as version 0
+        table.put_item(
+            Item={
+                "pk": "CHAT#2",
+                "sk": "GAMEINFO",
+                "chat_id": "2",
+                "game_state": "RUNNING",
+            }
+        )
+        legacy = game_info_repository.get("2")
+        assert legacy.version == 0
+        assert game_info_repository.transition(
+            legacy.copy(update={"game_state": GameInfo.GameState.IDLE})
+        ).applied
+        assert game_info_repository.get("2").version == 1
+
+
+def test_racing_transitions_apply_once():
+    table = InMemoryTable(TABLE_NAME, indexes=GAME_TABLE_INDEXES)
+    game_info_repository = GameInfoRepository(table)
+    idle = game_info_repository.get("1")
+    transitions = []
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        transitions.append(
+            game_info_repository.transition(
+                idle.copy(update={"game_state": GameInfo.GameState.RUNNING})
+            )
+        )
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [transition.applied for transition in transitions].count(True) == 1
+    # the others are told what they lost to
+    assert all(
+        transition.game_info.game_state == GameInfo.GameState.RUNNING
+        and transition.game_info.version == 1
+        for transition in transitions
+    )
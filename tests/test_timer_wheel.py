@@ -0,0 +1,46 @@
+"""
+python -m pytest tests/test_timer_wheel.py
+"""
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "common")]
+
+from sutd.trivia_bot.common.timer_wheel import TimerWheel
+
+
+def turn(wheel: TimerWheel, until_tick: int, fired: dict):
+    while wheel.current_tick < until_tick:
+        for timer in wheel.advance(wheel.current_tick + 1):
+            fired[timer.callback()] = wheel.current_tick
+
+
+def test_timers_expire_on_their_tick_across_levels():
+    # small wheels, so that most timers cascade through several levels or overflow
+    rng = random.Random(0)
+    wheel = TimerWheel(1.0, now=12345, slots=4, levels=3)
+    expected = dict()
+    fired = dict()
+    for i in range(500):
+        now = wheel.current_tick
+        deadline = now + rng.uniform(-3, 200)
+        timer = wheel.schedule(deadline, lambda i=i: i)
+        if rng.random() < 0.1:
+            timer.cancel()
+        else:
+            expected[i] = max(math.ceil(deadline), now + 1)
+        if rng.random() < 0.5:
+            turn(wheel, now + rng.randrange(30), fired)
+    turn(wheel, wheel.current_tick + 1000, fired)
+    assert fired == expected
+
+
+def test_advance_returns_timers_in_expiry_order():
+    wheel = TimerWheel(0.1)
+    for deadline in [15.0, 2.0, 0.05, 7.3]:
+        wheel.schedule(deadline, lambda deadline=deadline: deadline)
+    assert [timer.callback() for timer in wheel.advance(10.0)] == [0.05, 2.0, 7.3]
+    assert [timer.callback() for timer in wheel.advance(20.0)] == [15.0]
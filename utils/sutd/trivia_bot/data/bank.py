@@ -0,0 +1,47 @@
+# The questions in mcq.py and open.py, under the ids they are stored and packed with.
+from typing import List
+
+from sutd.trivia_bot.common.models import Question
+from sutd.trivia_bot.common.database import question_content_id
+from sutd.trivia_bot.data.mcq import questions as mcq_questions
+from sutd.trivia_bot.data.open import questions as open_questions
+
+
+def with_content_id(question: Question) -> Question:
+    return question.copy(update={"id": question_content_id(question)})
+
+
+def load_questions() -> List[Question]:
+    questions = []
+    for i, mcq_question in enumerate(mcq_questions):
+        if "question" not in mcq_question:
+            raise ValueError(f"question attribute missing in index {i}")
+        if "correct_answer" not in mcq_question:
+            raise ValueError(f"correct_answer attribute missing in index {i}")
+        if "wrong_answers" not in mcq_question:
+            raise ValueError(f"wrong_answers attribute missing in index {i}")
+        question = Question(
+            id="",
+            question=mcq_question["question"],
+            correct_answer=mcq_question["correct_answer"].lower(),
+            other_answers=[a.lower() for a in mcq_question["wrong_answers"]],
+            aliases=[a.lower() for a in mcq_question.get("aliases", [])],
+            type=Question.QuestionType.mcq,
+        )
+        questions.append(with_content_id(question))
+
+    for i, open_question in enumerate(open_questions):
+        if "question" not in open_question:
+            raise ValueError(f"question attribute missing in index {i}")
+        if "answer" not in open_question:
+            raise ValueError(f"answer attribute missing in index {i}")
+        question = Question(
+            id="",
+            question=open_question["question"],
+            correct_answer=open_question["answer"].lower(),
+            aliases=[a.lower() for a in open_question.get("aliases", [])],
+            type=Question.QuestionType.open,
+        )
+        questions.append(with_content_id(question))
+    # a question contributed twice is kept once
+    return list({question.id: question for question in questions}.values())
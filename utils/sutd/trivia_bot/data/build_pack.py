@@ -0,0 +1,34 @@
+# Compiles the questions in mcq.py and open.py into the question pack that ships in the
+# CommonLayer, see sutd.trivia_bot.common.pack. Run it before `sam build`, from the
+# repository root:
+#
+#   PYTHONPATH=common:utils python -m sutd.trivia_bot.data.build_pack [--output PATH]
+#
+# The Lambdas only read the pack with QUESTION_SOURCE=pack, the QuestionSource
+# parameter of template.yaml. Its bank version is the time it was built at, so that a
+# newer pack always has a higher one.
+import argparse
+import time
+
+from sutd.trivia_bot.common.pack import (
+    DEFAULT_QUESTION_PACK_PATH,
+    QuestionPack,
+    write_question_pack,
+)
+from sutd.trivia_bot.data.bank import load_questions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=DEFAULT_QUESTION_PACK_PATH)
+    args = parser.parse_args()
+
+    questions = load_questions()
+    write_question_pack(args.output, questions, bank_version=int(time.time()))
+    question_pack = QuestionPack(args.output)
+    for ordinal, question in enumerate(questions):
+        if question_pack.find(question.id) != question:
+            raise RuntimeError(f"Question {question.id} did not survive packing")
+        if question_pack.id_at(ordinal) != question.id:
+            raise RuntimeError(f"Question {question.id} is not at ordinal {ordinal}")
+    print(f"Packed {len(questions)} questions into {args.output}")
@@ -2,6 +2,7 @@
 # question: (str) Question Text
 # correct_answer: (str) The correct answer
 # wrong_answers: (List[str]) the other wrong answers to present to the user. Buttons are randomised.
+# aliases: (List[str], optional) other spellings of the correct answer, for players who reply with text.
 
 questions = [
     {
@@ -12,11 +13,13 @@ questions = [
     {
         "question": "Buildings 1 and 2 were built to look like number 8's, because of:",
         "correct_answer": "Fengshui",
+        "aliases": ["Feng Shui"],
         "wrong_answers": ["Open air architecture", "Coincidence"],
     },
     {
         "question": "There's a piano in the campus centre. What brand is it?",
         "correct_answer": "Burger and Jacobi",
+        "aliases": ["Burger Jacobi"],
         "wrong_answers": ["Yamaha", "Steinway & Sons", "Kawai"],
     },
 ]
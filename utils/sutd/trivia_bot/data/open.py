@@ -1,6 +1,8 @@
 # Each open ended question is a dictionary, containing three items:
 # question: (str) Question Text
 # answer: (str) The correct answer. Case Insensitive.
+# aliases: (List[str], optional) Other spellings of the answer to accept. Case,
+#   punctuation, spacing, number words and small typos are already forgiven.
 
 questions = [
     {"question": "Grumpy is an SUTD animal. What is he?", "answer": "Cat"},
@@ -28,6 +30,7 @@ questions = [
     {
         "question": """The "Chinese Structure" in hostel grounds is donated by a famous movie actor:""",
         "answer": "Jackie Chan",
+        "aliases": ["Chan Kong-sang", "Cheng Long"],
     },
     {
         "question": "In the old days freshmore students used to build cannons to launch projectiles into NUS as part of their physics 1D project. What projectile was fired?",
@@ -36,5 +39,6 @@ questions = [
     {
         "question": """In outreach workshops, the Office of Marketing often sells the "hacker culture" in SUTD by showing a historical photograph of students placing a certain object on the root. What was it?""",
         "answer": "Police Car",
+        "aliases": ["Police Cruiser", "Cop Car"],
     },
 ]
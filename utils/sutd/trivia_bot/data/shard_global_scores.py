@@ -0,0 +1,102 @@
+# Moves global scores into the shard partitions that ScoreRepository now writes to, and
+# rebuilds the shard leaderboards. Stop games from ending while this runs.
+#
+#   python -m sutd.trivia_bot.data.shard_global_scores [--from-shards N]
+#
+# --from-shards is the shard count the scores were written with, 0 (the default) for
+# the old unsharded GLOBAL_SCORE partition. Moving a row is a transaction, so the
+# migration can be re-run safely if it is interrupted.
+import argparse
+
+from boto3.dynamodb.conditions import Key
+import pinject
+
+from sutd.trivia_bot.common.database import ScoreRepository, query_all
+from sutd.trivia_bot.common.bindings import ALL_BINDINGS
+from sutd.trivia_bot.common.items import player_from_item
+import sutd.trivia_bot.common.database
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from-shards", type=int, default=0)
+    args = parser.parse_args()
+
+    OBJ_GRAPH = pinject.new_object_graph(
+        modules=[sutd.trivia_bot.common.database], binding_specs=ALL_BINDINGS
+    )
+    score_repository: ScoreRepository = OBJ_GRAPH.provide(ScoreRepository)
+    table = score_repository.table
+    client = table.meta.client
+
+    source_partitions = (
+        [f"GLOBAL_SCORE#{shard}" for shard in range(args.from_shards)]
+        if args.from_shards > 0
+        else ["GLOBAL_SCORE"]
+    )
+    moved = 0
+    for source_partition in source_partitions:
+        for row in list(
+            query_all(
+                table,
+                KeyConditionExpression=Key("pk").eq(source_partition),
+                ConsistentRead=True,
+            )
+        ):
+            player = player_from_item(row)
+            target_partition = (
+                f"GLOBAL_SCORE#{score_repository.global_score_shard(player.user_id)}"
+            )
+            if target_partition == source_partition:
+                continue
+            client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": table.name,
+                            "Key": {"pk": target_partition, "sk": row["sk"]},
+                            "UpdateExpression": "SET score = if_not_exists(score, :zero) + :score, user_data = :user_data, user_id = :user_id",
+                            "ExpressionAttributeValues": {
+                                ":zero": 0,
+                                ":score": player.score,
+                                ":user_data": player.user_data,
+                                ":user_id": player.user_id,
+                            },
+                        }
+                    },
+                    {
+                        "Delete": {
+                            "TableName": table.name,
+                            "Key": {"pk": source_partition, "sk": row["sk"]},
+                            "ConditionExpression": "attribute_exists(pk)",
+                        }
+                    },
+                ]
+            )
+            moved += 1
+    print(f"Moved {moved} players into {score_repository.global_score_shards} shards")
+
+    # rebuild every leaderboard from the consistent shard partitions
+    with table.batch_writer() as batch:
+        batch.delete_item(Key={"pk": "LEADERBOARD", "sk": "GLOBAL"})
+        for shard in range(
+            max(args.from_shards, score_repository.global_score_shards)
+        ):
+            # shard leaderboards used to share the LEADERBOARD partition
+            batch.delete_item(Key={"pk": "LEADERBOARD", "sk": f"GLOBAL#{shard}"})
+            batch.delete_item(Key=score_repository.global_leaderboard_key(shard))
+    for shard in range(score_repository.global_score_shards):
+        score_repository.merge_into_shard_leaderboard(
+            shard,
+            [
+                player_from_item(row)
+                for row in query_all(
+                    table,
+                    KeyConditionExpression=Key("pk").eq(f"GLOBAL_SCORE#{shard}"),
+                    ConsistentRead=True,
+                )
+            ],
+        )
+    print(
+        f"Rebuilt the leaderboards, top players: {score_repository.get_global_top_players(3)}"
+    )